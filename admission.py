@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+# @File    : admission.py
+# @Time    : 2026/10/18
+# 准入控制：限制同时处理的上传请求数（全局并发上限、每个会话的并发上限、在途字节数上限），
+# 无法立即进入时按到达顺序短暂等待，超时后拒绝，由调用方返回429和Retry-After；
+# 另按成绩文件大小估算一次分析的峰值内存，供任务队列按内存预算调度（见jobs.JobQueue）
+# 占用的名额记录在准入账本中：默认只在进程内计数，多个工作进程部署时使用共用的SQLite账本，
+# 各项限制在所有工作进程间共同计算，已退出的进程占用的名额自动释放
+
+import contextlib
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from metrics import ADMISSION_DECISIONS, ADMISSION_WAIT_SECONDS
+
+# 一次分析的峰值内存估算：固定开销 + 成绩文件大小 × 系数
+# （xlsx解压并展开为DataFrame后的内存约为文件大小的40倍，见benchmarks/bench_memory.py）
+ANALYSIS_MEMORY_BASE = 32 * 1024 * 1024
+DEFAULT_ANALYSIS_MEMORY_FACTOR = 40
+
+# 拒绝原因
+REASON_BUSY = 'busy'
+REASON_SESSION = 'session'
+REASON_QUEUE = 'queue'
+
+SESSION_FULL_MESSAGE = '该会话正在处理的请求数已达上限，请等待当前请求完成'
+BUSY_MESSAGE = '服务器繁忙，请稍后重试'
+
+# 等待超过此时间（秒）后进入的请求计为queued，否则计为admitted
+QUEUED_THRESHOLD = 0.01
+# Retry-After的取值范围（秒）
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+
+# 名额状态：处理中（上传请求、运行中的任务）、排队中（任务）
+LEASE_ACTIVE = 'active'
+LEASE_QUEUED = 'queued'
+# 使用共用账本时，等待中的请求和排队的任务检查其他进程是否释放名额的间隔（秒）
+SHARED_POLL_INTERVAL = 0.2
+
+
+def estimate_analysis_memory(file_sizes, factor=DEFAULT_ANALYSIS_MEMORY_FACTOR, base=ANALYSIS_MEMORY_BASE):
+    """按成绩文件大小（字节）估算一次分析的峰值内存（字节）"""
+    return int(base + factor * sum(file_sizes))
+
+
+def retry_after_seconds(average_seconds, waiting, concurrency):
+    """建议的重试间隔（秒）：前面等待的请求按平均耗时、以concurrency路并发处理完所需的时间"""
+    seconds = average_seconds * (waiting + 1) / max(concurrency, 1)
+    return int(min(max(math.ceil(seconds), MIN_RETRY_AFTER), MAX_RETRY_AFTER))
+
+
+def _process_started(pid):
+    """进程的启动时间（/proc中的时钟滴答数，与进程ID一起区分被复用的进程ID），无法读取时返回None"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # 第2个字段（进程名）可能含空格，从最后一个')'之后数起，启动时间为第22个字段
+    return int(stat[stat.rindex(b')') + 2:].split()[19])
+
+
+def _process_alive(pid, started):
+    """记录名额的进程是否仍在运行"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return started is None or _process_started(pid) in (started, None)
+
+
+class AdmissionLedger:
+    """
+    准入账本（进程内）
+    每个处理中的请求、排队或运行中的任务占用一个名额，记录其类别（gate）、会话、代价和状态；
+    在transaction()中检查并占用名额，检查和占用是原子的
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._leases = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self
+
+    def _matching(self, gate, state, owner):
+        for lease_gate, lease_owner, cost, lease_state, sequence in self._leases.values():
+            if lease_gate == gate and (state is None or lease_state == state) \
+                    and (owner is None or lease_owner == owner):
+                yield cost, sequence
+
+    def count(self, gate, state=None, owner=None):
+        """名额数，state、owner为None时不限"""
+        return sum(1 for _ in self._matching(gate, state, owner))
+
+    def cost(self, gate, state=None):
+        """名额的代价之和"""
+        return sum(cost for cost, _ in self._matching(gate, state, None))
+
+    def first(self, gate, state):
+        """最早占用的名额ID，没有时返回None"""
+        leases = [(sequence, lease_id) for lease_id, (lease_gate, _, _, lease_state, sequence) in self._leases.items()
+                  if lease_gate == gate and lease_state == state]
+        return min(leases)[1] if leases else None
+
+    def add(self, gate, lease_id, owner=None, cost=0, state=LEASE_ACTIVE):
+        self._leases[lease_id] = (gate, owner, cost, state, next(self._sequence))
+
+    def set_state(self, lease_id, state):
+        gate, owner, cost, _, sequence = self._leases[lease_id]
+        self._leases[lease_id] = (gate, owner, cost, state, sequence)
+
+    def remove(self, lease_id):
+        self._leases.pop(lease_id, None)
+
+
+class SQLiteAdmissionLedger:
+    """
+    多个工作进程共用的准入账本，名额保存在SQLite数据库中；
+    每个事务以BEGIN IMMEDIATE开始（进程间互斥），并先删除已退出的进程占用的名额；
+    每个线程使用各自的连接（fork后的子进程中重新连接）
+    """
+
+    shared = True
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        # 建表使用临时连接，不把打开的连接留给fork出的工作进程
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            with conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS leases '
+                             '(sequence INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, '
+                             'gate TEXT NOT NULL, owner TEXT, cost INTEGER NOT NULL, state TEXT NOT NULL, '
+                             'pid INTEGER NOT NULL, started INTEGER)')
+        finally:
+            conn.close()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.started = _process_started(os.getpid())
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._release_exited(conn, self._local.pid, self._local.started)
+            yield _SQLiteLedgerTransaction(conn, self._local.pid, self._local.started)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def _release_exited(conn, own_pid, own_started):
+        """删除已退出的进程占用的名额（调用方在事务中）"""
+        for pid, started in conn.execute('SELECT DISTINCT pid, started FROM leases').fetchall():
+            if (pid, started) != (own_pid, own_started) and not _process_alive(pid, started):
+                conn.execute('DELETE FROM leases WHERE pid = ? AND started IS ?', (pid, started))
+
+
+class _SQLiteLedgerTransaction:
+    """SQLiteAdmissionLedger事务内的操作，接口与AdmissionLedger相同"""
+
+    def __init__(self, conn, pid, started):
+        self._conn = conn
+        self._pid = pid
+        self._started = started
+
+    @staticmethod
+    def _where(gate, state, owner):
+        clauses, params = ['gate = ?'], [gate]
+        if state is not None:
+            clauses.append('state = ?')
+            params.append(state)
+        if owner is not None:
+            clauses.append('owner = ?')
+            params.append(owner)
+        return ' AND '.join(clauses), params
+
+    def count(self, gate, state=None, owner=None):
+        where, params = self._where(gate, state, owner)
+        return self._conn.execute(f'SELECT COUNT(*) FROM leases WHERE {where}', params).fetchone()[0]
+
+    def cost(self, gate, state=None):
+        where, params = self._where(gate, state, None)
+        return self._conn.execute(f'SELECT COALESCE(SUM(cost), 0) FROM leases WHERE {where}', params).fetchone()[0]
+
+    def first(self, gate, state):
+        row = self._conn.execute('SELECT id FROM leases WHERE gate = ? AND state = ? ORDER BY sequence LIMIT 1',
+                                 (gate, state)).fetchone()
+        return row[0] if row else None
+
+    def add(self, gate, lease_id, owner=None, cost=0, state=LEASE_ACTIVE):
+        self._conn.execute('INSERT INTO leases (id, gate, owner, cost, state, pid, started) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           (lease_id, gate, owner, int(cost), state, self._pid, self._started))
+
+    def set_state(self, lease_id, state):
+        self._conn.execute('UPDATE leases SET state = ? WHERE id = ?', (state, lease_id))
+
+    def remove(self, lease_id):
+        self._conn.execute('DELETE FROM leases WHERE id = ?', (lease_id,))
+
+
+def create_admission_ledger(db_path=None):
+    """准入账本：db_path为None时只在进程内计数，否则为多个工作进程共用的SQLite账本"""
+    return SQLiteAdmissionLedger(db_path) if db_path else AdmissionLedger()
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入；reason为拒绝原因，retry_after为建议的重试间隔（秒）"""
+
+    def __init__(self, reason, retry_after, message=None):
+        super().__init__(message or reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """
+    请求准入
+    同时进入的请求不超过max_concurrent个，每个会话不超过per_session个（None为不限），
+    在途请求的代价（如请求体字节数）之和不超过max_cost（None为不限；单个请求超过max_cost时在没有其他请求时仍可进入）；
+    无法进入时按到达顺序等待至多max_wait秒，超时抛出AdmissionRejected；同一会话超出并发上限、
+    或已有max_waiting个请求在等待（None为不限）时直接拒绝，等待的请求占用服务线程，不应占满线程池；
+    ledger: 准入账本，共用账本时各项限制在所有工作进程间共同计算（等待的请求数只在本进程内计算）
+    """
+
+    def __init__(self, name, max_concurrent, per_session=None, max_cost=None, max_wait=0.0, max_waiting=None,
+                 ledger=None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.per_session = per_session
+        self.max_cost = max_cost
+        self.max_wait = max_wait
+        self.max_waiting = max_waiting
+        self.ledger = ledger or AdmissionLedger()
+        self._waiting = deque()
+        self._average_seconds = 1.0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _fits(self, tx, cost):
+        """调用方在账本事务中"""
+        active = tx.count(self.name)
+        if active >= self.max_concurrent:
+            return False
+        return self.max_cost is None or active == 0 or tx.cost(self.name) + cost <= self.max_cost
+
+    def _session_full(self, tx, session_id):
+        """调用方在账本事务中"""
+        return self.per_session is not None and session_id is not None \
+            and tx.count(self.name, owner=session_id) >= self.per_session
+
+    def _reject(self, reason, message):
+        """调用方持有锁"""
+        ADMISSION_DECISIONS.inc(gate=self.name, outcome=f'rejected_{reason}')
+        retry_after = retry_after_seconds(self._average_seconds, len(self._waiting), self.max_concurrent)
+        return AdmissionRejected(reason, retry_after, message)
+
+    def _enter(self, session_id, cost):
+        """占用名额，返回名额ID"""
+        start = time.monotonic()
+        lease_id = uuid.uuid4().hex
+        with self._lock:
+            with self.ledger.transaction() as tx:
+                if self._session_full(tx, session_id):
+                    raise self._reject(REASON_SESSION, SESSION_FULL_MESSAGE)
+                if self.max_waiting is not None and (self._waiting or not self._fits(tx, cost)) \
+                        and len(self._waiting) >= self.max_waiting:
+                    raise self._reject(REASON_BUSY, BUSY_MESSAGE)
+            ticket = object()
+            self._waiting.append(ticket)
+            deadline = start + self.max_wait
+            try:
+                # 按到达顺序进入：只有队首的请求可以进入，避免代价大的请求一直等待
+                while True:
+                    if self._waiting[0] is ticket:
+                        with self.ledger.transaction() as tx:
+                            # 同一会话的其他请求可能在等待期间进入
+                            if self._session_full(tx, session_id):
+                                raise self._reject(REASON_SESSION, SESSION_FULL_MESSAGE)
+                            if self._fits(tx, cost):
+                                tx.add(self.name, lease_id, session_id, cost)
+                                break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject(REASON_BUSY, BUSY_MESSAGE)
+                    # 其他进程释放名额时不会通知本进程，定期重新检查
+                    self._changed.wait(min(remaining, SHARED_POLL_INTERVAL) if self.ledger.shared else remaining)
+            finally:
+                self._waiting.remove(ticket)
+                self._changed.notify_all()
+        waited = time.monotonic() - start
+        ADMISSION_WAIT_SECONDS.observe(waited, gate=self.name)
+        ADMISSION_DECISIONS.inc(gate=self.name, outcome='queued' if waited > QUEUED_THRESHOLD else 'admitted')
+        return lease_id
+
+    def _leave(self, lease_id, seconds):
+        with self._lock:
+            with self.ledger.transaction() as tx:
+                tx.remove(lease_id)
+            # 处理耗时的指数滑动平均，用于估算Retry-After
+            self._average_seconds = 0.8 * self._average_seconds + 0.2 * seconds
+            self._changed.notify_all()
+
+    @contextlib.contextmanager
+    def admit(self, session_id=None, cost=0):
+        """在准入的情况下执行代码块；无法准入时抛出AdmissionRejected"""
+        lease_id = self._enter(session_id, cost)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._leave(lease_id, time.monotonic() - start)
+
+    def stats(self):
+        """准入状态；active、cost为所有共用账本的进程合计，waiting为本进程中等待的请求数"""
+        with self._lock:
+            with self.ledger.transaction() as tx:
+                active = tx.count(self.name)
+                cost = tx.cost(self.name)
+            return {
+                'max_concurrent': self.max_concurrent,
+                'per_session': self.per_session,
+                'max_cost': self.max_cost,
+                'max_waiting': self.max_waiting,
+                'shared': self.ledger.shared,
+                'active': active,
+                'waiting': len(self._waiting),
+                'cost': cost,
+                'average_seconds': round(self._average_seconds, 3),
+            }
@@ -4,18 +4,37 @@
 # @Time    : 2025/9/13
 
 import os
+import shutil
+import time
 import uuid
+import contextlib
+import functools
 import json
 import re
-import pandas as pd
 from datetime import datetime
+from urllib.parse import quote
 from pytz import timezone
-from flask import Flask, render_template, request, jsonify, send_file, session, Blueprint
-from grade_analyzer import GradeAnalyzer
+from flask import Flask, render_template, request, jsonify, send_file, session, Blueprint, Response, g, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from grade_analyzer import DEFAULT_OTHER_COURSE_LIMIT, GradeAnalyzer
+from file_cache import ParsedFileCache, file_sha256
+from grading import DEFAULT_GRADING_SCHEME, GradingScheme
+from result_cache import AnalysisResultCache
+from jobs import FINISHED_STATES, JobQueue, QueueFull, JOB_SUCCEEDED
+from admission import (DEFAULT_ANALYSIS_MEMORY_FACTOR, QUEUED_THRESHOLD, AdmissionGate, AdmissionRejected,
+                       create_admission_ledger, estimate_analysis_memory)
+from result_store import ResultStore
+from metrics import (ADMISSION_DECISIONS, ADMISSION_STATE, ADMISSION_WAIT_SECONDS, REGISTRY, REQUEST_SECONDS,
+                     STAGE_RANK, StageTimer, profiled)
+from ranking import RANK_COLUMNS, STATS_VERSION, add_ranks, strip_ranks, summarize
+from exports import FORMAT_MIMETYPES, FORMAT_XLSX, WRITERS, ExportUnavailable, ResultExporter, available_formats
+from uploads import FileTooLarge, UploadRequest, check_excel_structure, store_upload
+from storage import StorageManager
+from session_store import ServerSessionInterface, create_session_store
+from lazy import LazyModule, loaded_modules, warm_in_background
 
-# 创建Flask应用，支持子路径部署
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-here'  # 在生产环境中应该使用环境变量
+# pandas在首次使用时导入，不涉及分析的请求无需等待
+pd = LazyModule('pandas')
 
 # 配置子路径前缀
 URL_PREFIX = '/zongce'
@@ -38,19 +57,100 @@ class ProxyFix:
                 environ['PATH_INFO'] = path_info[len(script_name):]
         return self.app(environ, start_response)
 
-# 应用代理修复
-app.wsgi_app = ProxyFix(app.wsgi_app)
-
 # 配置
+# 会话签名密钥，多个工作进程必须相同
+SECRET_KEY = os.environ.get('GRADE_SECRET_KEY', 'your-secret-key-here')
 UPLOAD_FOLDER = 'uploads'
 RESULTS_FOLDER = 'results'
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+# 上传文件的临时目录，单个文件及单次上传的大小上限
+UPLOAD_TMP_FOLDER = os.path.join(UPLOAD_FOLDER, '.incoming')
+MAX_FILE_SIZE = int(os.environ.get('GRADE_UPLOAD_MAX_FILE_MB', '50')) * 1024 * 1024
+MAX_UPLOAD_SIZE = int(os.environ.get('GRADE_UPLOAD_MAX_TOTAL_MB', '200')) * 1024 * 1024
 TIME_ZONE = timezone('Asia/Shanghai')
+# 并行解析成绩文件的进程数（1为串行）
+ANALYSIS_WORKERS = int(os.environ.get('GRADE_ANALYSIS_WORKERS', '1'))
+# 计入综合成绩的其他课程门数（按成绩从高到低选取）
+OTHER_COURSE_LIMIT = int(os.environ.get('GRADE_OTHER_COURSE_LIMIT', str(DEFAULT_OTHER_COURSE_LIMIT)))
+# 成绩换算方案配置文件（JSON，格式见grading.py），未设置时使用默认方案
+GRADING_SCHEME_FILE = os.environ.get('GRADE_GRADING_SCHEME_FILE')
+GRADING_SCHEME = GradingScheme.load(GRADING_SCHEME_FILE) if GRADING_SCHEME_FILE else DEFAULT_GRADING_SCHEME
+# 成绩文件解析结果缓存目录及容量上限
+PARSED_CACHE_FOLDER = os.environ.get('GRADE_PARSED_CACHE_DIR', os.path.join('cache', 'parsed'))
+PARSED_CACHE_MAX_BYTES = int(os.environ.get('GRADE_PARSED_CACHE_MAX_MB', '512')) * 1024 * 1024
+# 分析结果缓存目录、容量（内存/磁盘缓存项数）及过期时间（秒）
+RESULT_CACHE_FOLDER = os.environ.get('GRADE_RESULT_CACHE_DIR', os.path.join('cache', 'results'))
+RESULT_CACHE_MEMORY_ITEMS = int(os.environ.get('GRADE_RESULT_CACHE_MEMORY_ITEMS', '32'))
+RESULT_CACHE_DISK_ITEMS = int(os.environ.get('GRADE_RESULT_CACHE_DISK_ITEMS', '256'))
+RESULT_CACHE_TTL = int(os.environ.get('GRADE_RESULT_CACHE_TTL', str(24 * 3600)))
+# 分析结果表存储目录及内存中保留的结果表数量，/results每页最大行数
+RESULT_TABLE_FOLDER = os.path.join(RESULTS_FOLDER, 'tables')
+# 按需导出的结果文件（xlsx/csv/parquet）目录
+RESULT_EXPORT_FOLDER = os.path.join(RESULTS_FOLDER, 'exports')
+RESULT_TABLE_MEMORY_ITEMS = int(os.environ.get('GRADE_RESULT_TABLE_MEMORY_ITEMS', '16'))
+RESULTS_PAGE_MAX = 1000
+# 后台分析任务的并发数、排队上限及已结束任务的保留时间（秒）
+JOB_WORKERS = int(os.environ.get('GRADE_JOB_WORKERS', '2'))
+JOB_QUEUE_SIZE = int(os.environ.get('GRADE_JOB_QUEUE_SIZE', '16'))
+JOB_RETENTION = int(os.environ.get('GRADE_JOB_RETENTION', '3600'))
+# 分析的准入控制：每个会话排队和运行中的分析任务数上限，运行中分析的估算内存之和上限（MB），0为不限，
+# 估算内存 = 固定开销 + 成绩文件大小 × GRADE_ANALYSIS_MEMORY_FACTOR
+JOB_MAX_PER_SESSION = int(os.environ.get('GRADE_JOB_MAX_PER_SESSION', '1')) or None
+ANALYSIS_MEMORY_BUDGET = int(os.environ.get('GRADE_ANALYSIS_MEMORY_MB', '1024')) * 1024 * 1024 or None
+ANALYSIS_MEMORY_FACTOR = float(os.environ.get('GRADE_ANALYSIS_MEMORY_FACTOR', str(DEFAULT_ANALYSIS_MEMORY_FACTOR)))
+# 上传的准入控制：同时处理的上传请求数、每个会话同时上传的请求数、在途请求体大小之和上限（MB），后两者0为不限，
+# 无法立即处理时最多等待GRADE_ADMISSION_WAIT秒（至多GRADE_UPLOAD_QUEUE_SIZE个请求同时等待），仍无法处理时返回429
+UPLOAD_CONCURRENCY = int(os.environ.get('GRADE_UPLOAD_CONCURRENCY', '4'))
+UPLOAD_MAX_PER_SESSION = int(os.environ.get('GRADE_UPLOAD_MAX_PER_SESSION', '1')) or None
+UPLOAD_INFLIGHT_BYTES = int(os.environ.get('GRADE_UPLOAD_INFLIGHT_MB', '400')) * 1024 * 1024 or None
+UPLOAD_QUEUE_SIZE = int(os.environ.get('GRADE_UPLOAD_QUEUE_SIZE', '2'))
+ADMISSION_WAIT = float(os.environ.get('GRADE_ADMISSION_WAIT', '5'))
+# 任务状态目录：多个工作进程部署时设置，使任一进程都能查询和取消任务（见serve.py）
+JOB_STATE_FOLDER = os.environ.get('GRADE_JOB_STATE_DIR') or None
+# 准入账本：设置了任务状态目录时默认为其中的SQLite数据库，各项准入限制在所有工作进程间共同计算；否则只在进程内计数
+ADMISSION_DB = os.environ.get('GRADE_ADMISSION_DB') or \
+    (os.path.join(JOB_STATE_FOLDER, 'admission.sqlite3') if JOB_STATE_FOLDER else None)
+# 按需性能分析：开启后带 X-Profile: 1 请求头或 profile=1 查询参数的请求在cProfile下执行，统计数据写入PROFILE_FOLDER
+PROFILING_ENABLED = os.environ.get('GRADE_PROFILING', '0') == '1'
+PROFILE_FOLDER = os.environ.get('GRADE_PROFILE_DIR', 'profiles')
+# 存储生命周期：会话上传目录及未被引用的结果文件的保留时间（秒）、上传和结果目录的总配额（0为不限制）、
+# 后台清理间隔（秒，0为不启动后台清理）
+STORAGE_TTL = int(os.environ.get('GRADE_STORAGE_TTL', str(24 * 3600)))
+STORAGE_QUOTA_BYTES = int(os.environ.get('GRADE_STORAGE_QUOTA_MB', '2048')) * 1024 * 1024
+STORAGE_SWEEP_INTERVAL = int(os.environ.get('GRADE_STORAGE_SWEEP_INTERVAL', '300'))
+# 会话存储后端：memory（进程内LRU，默认）、sqlite（多个工作进程共用）或cookie（Flask签名Cookie）；
+# 会话过期时间（秒）及memory后端保留的会话数
+SESSION_BACKEND = os.environ.get('GRADE_SESSION_BACKEND', 'memory')
+SESSION_DB = os.environ.get('GRADE_SESSION_DB', os.path.join('cache', 'sessions.sqlite3'))
+SESSION_TTL = int(os.environ.get('GRADE_SESSION_TTL', str(24 * 3600)))
+SESSION_MEMORY_ITEMS = int(os.environ.get('GRADE_SESSION_MEMORY_ITEMS', '10000'))
+# 创建应用后在后台线程中预先导入pandas等分析用到的模块（0为首次使用时才导入）
+WARM_IMPORTS = os.environ.get('GRADE_WARM_IMPORTS', '1') == '1'
 
 # 确保上传和结果目录存在
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(RESULTS_FOLDER, exist_ok=True)
 
+# 解析结果缓存在各请求间共享
+parsed_file_cache = ParsedFileCache(PARSED_CACHE_FOLDER, max_bytes=PARSED_CACHE_MAX_BYTES)
+analysis_result_cache = AnalysisResultCache(RESULT_CACHE_FOLDER,
+                                            memory_capacity=RESULT_CACHE_MEMORY_ITEMS,
+                                            disk_capacity=RESULT_CACHE_DISK_ITEMS,
+                                            ttl=RESULT_CACHE_TTL)
+result_store = ResultStore(RESULT_TABLE_FOLDER, memory_capacity=RESULT_TABLE_MEMORY_ITEMS)
+result_exporter = ResultExporter(RESULT_EXPORT_FOLDER)
+admission_ledger = create_admission_ledger(ADMISSION_DB)
+job_queue = JobQueue(workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, retention=JOB_RETENTION,
+                     state_dir=JOB_STATE_FOLDER, max_per_owner=JOB_MAX_PER_SESSION,
+                     memory_budget=ANALYSIS_MEMORY_BUDGET, ledger=admission_ledger)
+upload_gate = AdmissionGate('upload', UPLOAD_CONCURRENCY, per_session=UPLOAD_MAX_PER_SESSION,
+                            max_cost=UPLOAD_INFLIGHT_BYTES, max_wait=ADMISSION_WAIT,
+                            max_waiting=UPLOAD_QUEUE_SIZE, ledger=admission_ledger)
+session_store = create_session_store(SESSION_BACKEND, db_path=SESSION_DB, ttl=SESSION_TTL,
+                                     capacity=SESSION_MEMORY_ITEMS)
+storage_manager = StorageManager(UPLOAD_FOLDER, RESULTS_FOLDER, ttl=STORAGE_TTL, quota_bytes=STORAGE_QUOTA_BYTES,
+                                 sweep_interval=STORAGE_SWEEP_INTERVAL)
+
 def safe_filename(filename):
     """
     安全化文件名，保留中文字符，并添加时间戳避免冲突
@@ -87,6 +187,178 @@ def safe_filename(filename):
     
     return final_name
 
+def result_download_name(timestamp, fmt=FORMAT_XLSX):
+    """结果文件的下载文件名"""
+    return f'成绩分析结果_{timestamp}.{fmt}'
+
+def ranks_outdated(results_df, stats):
+    """结果早于排名统计（没有排名列）或统计定义已变化"""
+    return not set(RANK_COLUMNS) <= set(results_df.columns) or (stats or {}).get('version') != STATS_VERSION
+
+def rerank_cached(result_id, results_df, result_info):
+    """重新计算缓存结果的排名和统计，并写回分析结果缓存，之后命中时不再重新计算；返回 (结果表, 排名统计)"""
+    results_df = add_ranks(results_df)
+    stats = summarize(results_df)
+    analysis_result_cache.put(result_id, results_df, dict(result_info, stats=stats))
+    return results_df, stats
+
+def load_result_table(analysis_results):
+    """
+    取得会话中分析结果对应的结果表（ResultTable），依次查找结果表存储、分析结果缓存，
+    以及旧版本会话中记录的结果Excel文件；均不存在时返回None
+    结果表的排名统计早于当前的统计定义时重新计算
+    """
+    result_id = analysis_results.get('result_id')
+    if result_id:
+        table = result_store.get(result_id)
+        if table is not None and table.stats_version == STATS_VERSION:
+            return table
+        cached = analysis_result_cache.peek(result_id)
+        if cached is not None:
+            results_df, result_info = cached
+            stats = result_info.get('stats')
+            if ranks_outdated(results_df, stats):
+                results_df, stats = rerank_cached(result_id, results_df, result_info)
+            return result_store.put(result_id, results_df, stats)
+        if table is not None:
+            # 分析结果缓存已失效，在已有的结果表上重新计算
+            results_df = add_ranks(table.df)
+            return result_store.put(result_id, results_df, summarize(results_df))
+    result_path = analysis_results.get('result_path')
+    if result_path and os.path.exists(result_path):
+        return result_store.put(result_id or file_sha256(result_path), pd.read_excel(result_path))
+    return None
+
+class AnalysisError(Exception):
+    """分析输入无效（主要课程列表为空、没有有效数据等）"""
+
+def run_analysis(grade_file_paths, main_course_file_path, progress=None, file_hashes=None, base_result_id=None):
+    """
+    执行成绩分析，在后台任务中运行
+    file_hashes为上传时计算的文件哈希（文件路径 -> SHA-256），缺少的哈希在分析时计算；
+    base_result_id为同一会话之前的分析结果，分析设置相同时只重新汇总受新增、移除或替换的文件影响的学生
+    返回结果信息字典（含各阶段耗时）；输入无效时抛出AnalysisError
+    """
+    timer = StageTimer()
+    # 创建分析器实例
+    analyzer = GradeAnalyzer(workers=ANALYSIS_WORKERS, file_cache=parsed_file_cache, file_hashes=file_hashes,
+                             other_course_limit=OTHER_COURSE_LIMIT, grading_scheme=GRADING_SCHEME)
+    
+    # 加载主要课程列表（必需）
+    analyzer.load_main_courses(main_course_file_path)
+    if not analyzer.main_courses:
+        raise AnalysisError('主要课程列表为空或加载失败')
+    
+    # 相同的输入（成绩文件内容、主要课程列表、分析器版本）直接复用已有的分析结果
+    grade_hashes = [analyzer.file_hash(path) for path in grade_file_paths]
+    fingerprint = analyzer.fingerprint(grade_hashes)
+    cached = analysis_result_cache.get(fingerprint)
+    incremental = False
+    
+    if cached is not None:
+        results_df, result_info = cached
+        timestamp = result_info['timestamp']
+        stats = result_info.get('stats')
+        merge = result_info.get('merge_report')
+        if progress:
+            progress(files_parsed=len(grade_file_paths), total_files=len(grade_file_paths),
+                     students_total=len(results_df), students_processed=len(results_df))
+        if ranks_outdated(results_df, stats):
+            # 缓存的结果早于排名统计或统计定义已变化
+            with timer.stage(STAGE_RANK):
+                results_df, stats = rerank_cached(fingerprint, results_df, result_info)
+    else:
+        results_df = None
+        settings = analyzer.settings_fingerprint()
+        # 在之前的分析结果基础上增量处理
+        base = analysis_result_cache.peek(base_result_id) if base_result_id else None
+        if base is not None and base[1].get('settings') == settings and 'grade_files' in base[1]:
+            results_df = analyzer.process_incremental(grade_file_paths, base[1]['grade_files'],
+                                                      strip_ranks(base[0]), progress=progress, timer=timer)
+            incremental = results_df is not None
+        if results_df is None:
+            # 执行分析
+            results_df = analyzer.process_combined_data(grade_file_paths, progress=progress, timer=timer)
+        merge = analyzer.merge_report
+        
+        if results_df.empty:
+            raise AnalysisError('分析失败，没有有效的数据')
+        
+        # 全体及年级内排名、各年级分数统计，随分析结果一起缓存
+        with timer.stage(STAGE_RANK):
+            results_df = add_ranks(results_df)
+            stats = summarize(results_df)
+        
+        # 结果文件在下载时按所需格式生成（见/download_result）
+        timestamp = datetime.now(TIME_ZONE).strftime('%Y%m%d_%H%M%S')
+        analysis_result_cache.put(fingerprint, results_df, {
+            'timestamp': timestamp,
+            'grade_files': grade_hashes,
+            'settings': settings,
+            'stats': stats,
+            'merge_report': merge
+        })
+    
+    # 保存结果表供/results分页查询和导出
+    result_store.put(fingerprint, results_df, stats)
+    
+    return {
+        'result_id': fingerprint,
+        'result_file': result_download_name(timestamp),
+        'timestamp': timestamp,
+        'student_count': len(results_df),
+        'cached': cached is not None,
+        'incremental': incremental,
+        'timings': timer.summary(),
+        'merge_report': merge,  # 学号写法合并、姓名或年级冲突等（见identity.merge_report）
+        'preview': results_df.head(10).to_dict('records')  # 返回前10条预览
+    }
+
+def profiling_requested():
+    """当前请求是否要求性能分析"""
+    return PROFILING_ENABLED and (request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1')
+
+def admission_key():
+    """
+    准入控制按会话计数的标识：已上传文件的会话ID，其次为服务端会话ID；
+    都没有时（首次请求）为None，只受全局限制（不按客户端地址计数，反向代理后所有请求的地址相同）
+    """
+    return session.get('session_id') or getattr(session, 'sid', None)
+
+def too_busy(error):
+    """请求未被准入（AdmissionRejected）：返回429及Retry-After"""
+    response = jsonify({'error': str(error), 'reason': error.reason, 'retry_after': error.retry_after})
+    return response, 429, {'Retry-After': str(error.retry_after)}
+
+def admission_controlled(gate):
+    """视图装饰器：请求在gate准入后处理，代价为请求体大小；无法准入时返回429"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with gate.admit(admission_key(), cost=request.content_length or 0):
+                    return view(*args, **kwargs)
+            except AdmissionRejected as e:
+                return too_busy(e)
+        return wrapper
+    return decorator
+
+def active_session_jobs():
+    """
+    会话中排队中或运行中的分析任务ID（提交时记录在会话中，已结束的任务从记录中移除）；
+    多个工作进程部署时通过任务状态目录查询其他进程中的任务
+    """
+    job_ids = session.get('job_ids') or []
+    active = [job_id for job_id in job_ids
+              if (job := job_queue.get(job_id)) is not None and job.status not in FINISHED_STATES]
+    if active != job_ids:
+        session['job_ids'] = active
+    return active
+
+def uploads_expired(uploaded_files):
+    """会话上传的文件是否已被存储清理删除"""
+    return not all(os.path.exists(file_info['path']) for file_info in uploaded_files)
+
 def allowed_file(filename):
     """检查文件扩展名是否允许"""
     return '.' in filename and \
@@ -97,7 +369,50 @@ def index():
     """主页 - 显示文件上传界面"""
     return render_template('index.html')
 
+def save_grade_files(files, upload_dir, known_hashes=()):
+    """
+    保存上传的成绩文件：计算哈希、检查文件结构，内容与known_hashes或本次其他文件重复的文件只保留一份
+    返回 (文件信息列表, 因内容重复而忽略的文件名列表, 错误信息)；出错时删除本次已保存的文件
+    """
+    saved = []
+    skipped_duplicates = []
+    grade_hashes = set(known_hashes)
+    
+    def discard():
+        for entry in saved:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry['path'])
+    
+    try:
+        for file in files:
+            if file and file.filename and file.filename != '' and allowed_file(file.filename):
+                filename = safe_filename(file.filename)
+                file_path = os.path.join(upload_dir, filename)
+                file_hash, file_size = store_upload(file, file_path, MAX_FILE_SIZE)
+                if file_hash in grade_hashes:
+                    os.remove(file_path)
+                    skipped_duplicates.append(file.filename)
+                    continue
+                error = check_excel_structure(file_path, '学号')
+                if error:
+                    os.remove(file_path)
+                    discard()
+                    return [], [], f'成绩文件 {file.filename} 无效：{error}'
+                grade_hashes.add(file_hash)
+                saved.append({
+                    'type': 'grade',
+                    'filename': filename,
+                    'path': file_path,
+                    'sha256': file_hash,
+                    'size': file_size
+                })
+    except Exception:
+        discard()
+        raise
+    return saved, skipped_duplicates, None
+
 @main_bp.route('/upload', methods=['POST'])
+@admission_controlled(upload_gate)
 def upload_files():
     """处理文件上传"""
     try:
@@ -113,60 +428,162 @@ def upload_files():
         if not main_course_file or main_course_file.filename == '':
             return jsonify({'error': '主要课程列表文件是必需的'}), 400
         
+        # 处理主要课程列表文件（必需）
+        if not main_course_file.filename or not allowed_file(main_course_file.filename):
+            return jsonify({'error': '主要课程列表文件格式不正确，请选择Excel文件'}), 400
+        
         # 生成会话ID
         session_id = str(uuid.uuid4())
-        session['session_id'] = session_id
         
         # 创建会话专用的上传目录
         session_upload_dir = os.path.join(UPLOAD_FOLDER, session_id)
         os.makedirs(session_upload_dir, exist_ok=True)
         
-        uploaded_files = []
+        def reject(message):
+            # 删除本次已保存的文件
+            shutil.rmtree(session_upload_dir, ignore_errors=True)
+            return jsonify({'error': message}), 400
         
-        # 处理成绩文件（可能有多个）
-        grade_files = request.files.getlist('grade_files')
-        for file in grade_files:
-            if file and file.filename and file.filename != '' and allowed_file(file.filename):
-                filename = safe_filename(file.filename)
-                file_path = os.path.join(session_upload_dir, filename)
-                file.save(file_path)
-                uploaded_files.append({
-                    'type': 'grade',
-                    'filename': filename,
-                    'path': file_path
-                })
+        # 处理成绩文件（可能有多个），上传时已计算文件哈希
+        uploaded_files, skipped_duplicates, error = save_grade_files(request.files.getlist('grade_files'),
+                                                                     session_upload_dir)
+        if error:
+            return reject(error)
         
-        # 处理主要课程列表文件（必需）
-        if not main_course_file.filename or not allowed_file(main_course_file.filename):
-            return jsonify({'error': '主要课程列表文件格式不正确，请选择Excel文件'}), 400
-            
         filename = safe_filename(main_course_file.filename)
         file_path = os.path.join(session_upload_dir, filename)
-        main_course_file.save(file_path)
+        file_hash, file_size = store_upload(main_course_file, file_path, MAX_FILE_SIZE)
+        error = check_excel_structure(file_path, '主要课程', exact=True)
+        if error:
+            return reject(f'主要课程列表文件无效：{error}')
         uploaded_files.append({
             'type': 'main_course',
             'filename': filename,
-            'path': file_path
+            'path': file_path,
+            'sha256': file_hash,
+            'size': file_size
         })
         
         if not uploaded_files:
-            return jsonify({'error': '没有有效的文件上传'}), 400
+            return reject('没有有效的文件上传')
         
         # 保存上传文件信息到会话
+        session['session_id'] = session_id
         session['uploaded_files'] = uploaded_files
         
         return jsonify({
             'message': '文件上传成功',
             'session_id': session_id,
-            'files': [f['filename'] for f in uploaded_files]
+            'files': [f['filename'] for f in uploaded_files],
+            'skipped_duplicates': skipped_duplicates
+        })
+        
+    except FileTooLarge as e:
+        return jsonify({'error': f'文件过大，{e.description}'}), 413
+    except RequestEntityTooLarge as e:
+        return request_too_large(e)
+    except Exception as e:
+        return jsonify({'error': f'文件上传失败: {str(e)}'}), 500
+
+@main_bp.route('/upload/append', methods=['POST'])
+@admission_controlled(upload_gate)
+def append_files():
+    """
+    向当前会话追加成绩文件，已上传的文件无需重新上传
+    表单字段：grade_files（一个或多个成绩文件）；replace（可选，要替换的已上传文件名，此时只能上传一个文件，
+    新文件取代其在文件列表中的位置）
+    """
+    try:
+        if 'session_id' not in session or 'uploaded_files' not in session:
+            return jsonify({'error': '请先上传文件'}), 400
+        
+        uploaded_files = list(session['uploaded_files'])
+        if uploads_expired(uploaded_files):
+            return jsonify({'error': '上传的文件已过期，请重新上传'}), 400
+        grade_files = [file for file in request.files.getlist('grade_files') if file and file.filename]
+        if not grade_files:
+            return jsonify({'error': '请选择成绩文件'}), 400
+        
+        replace = request.form.get('replace')
+        replace_index = None
+        if replace:
+            replace_index = next((i for i, f in enumerate(uploaded_files)
+                                  if f['type'] == 'grade' and f['filename'] == replace), None)
+            if replace_index is None:
+                return jsonify({'error': f'没有找到要替换的文件: {replace}'}), 404
+            if len(grade_files) != 1:
+                return jsonify({'error': '替换文件时只能上传一个成绩文件'}), 400
+            # 被替换的文件会被删除，排队中或运行中的分析仍在使用它
+            if active_session_jobs():
+                return jsonify({'error': '分析任务进行中，请等待其完成或取消后再替换文件'}), 409
+        
+        known_hashes = [f['sha256'] for i, f in enumerate(uploaded_files)
+                        if f['type'] == 'grade' and f.get('sha256') and i != replace_index]
+        session_upload_dir = os.path.join(UPLOAD_FOLDER, session['session_id'])
+        os.makedirs(session_upload_dir, exist_ok=True)
+        saved, skipped_duplicates, error = save_grade_files(grade_files, session_upload_dir, known_hashes)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        if replace_index is not None and saved:
+            replaced = uploaded_files[replace_index]
+            uploaded_files[replace_index] = saved[0]
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(replaced['path'])
+        else:
+            # 新增的成绩文件排在已有成绩文件之后
+            last_grade = max((i for i, f in enumerate(uploaded_files) if f['type'] == 'grade'), default=-1)
+            uploaded_files[last_grade + 1:last_grade + 1] = saved
+        session['uploaded_files'] = uploaded_files
+        
+        return jsonify({
+            'message': '文件替换成功' if replace_index is not None and saved else '文件追加成功',
+            'session_id': session['session_id'],
+            'files': [f['filename'] for f in uploaded_files],
+            'added': [f['filename'] for f in saved],
+            'skipped_duplicates': skipped_duplicates
         })
         
+    except FileTooLarge as e:
+        return jsonify({'error': f'文件过大，{e.description}'}), 413
+    except RequestEntityTooLarge as e:
+        return request_too_large(e)
     except Exception as e:
         return jsonify({'error': f'文件上传失败: {str(e)}'}), 500
 
+@main_bp.route('/upload/remove', methods=['POST'])
+@admission_controlled(upload_gate)
+def remove_file():
+    """
+    从当前会话移除一个已上传的成绩文件，请求体：{"filename": 已上传的文件名}
+    会话有排队中或运行中的分析任务时返回409（任务仍在读取该文件）
+    """
+    if 'session_id' not in session or 'uploaded_files' not in session:
+        return jsonify({'error': '请先上传文件'}), 400
+    if active_session_jobs():
+        return jsonify({'error': '分析任务进行中，请等待其完成或取消后再移除文件'}), 409
+    
+    filename = (request.get_json(silent=True) or {}).get('filename')
+    uploaded_files = list(session['uploaded_files'])
+    index = next((i for i, f in enumerate(uploaded_files) if f['type'] == 'grade' and f['filename'] == filename),
+                 None)
+    if index is None:
+        return jsonify({'error': f'没有找到该成绩文件: {filename}'}), 404
+    
+    removed = uploaded_files.pop(index)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(removed['path'])
+    session['uploaded_files'] = uploaded_files
+    
+    return jsonify({
+        'message': '文件已移除',
+        'session_id': session['session_id'],
+        'files': [f['filename'] for f in uploaded_files]
+    })
+
 @main_bp.route('/analyze', methods=['POST'])
 def analyze():
-    """执行成绩分析"""
+    """提交成绩分析任务"""
     try:
         # 检查会话
         if 'session_id' not in session or 'uploaded_files' not in session:
@@ -174,14 +591,21 @@ def analyze():
         
         session_id = session['session_id']
         uploaded_files = session['uploaded_files']
+        if uploads_expired(uploaded_files):
+            return jsonify({'error': '上传的文件已过期，请重新上传'}), 400
         
         # 分离成绩文件和主要课程文件
         grade_file_paths = []
+        grade_file_sizes = []
         main_course_file_path = None
+        file_hashes = {}
         
         for file_info in uploaded_files:
+            if file_info.get('sha256'):
+                file_hashes[file_info['path']] = file_info['sha256']
             if file_info['type'] == 'grade':
                 grade_file_paths.append(file_info['path'])
+                grade_file_sizes.append(file_info.get('size') or 0)
             elif file_info['type'] == 'main_course':
                 main_course_file_path = file_info['path']
         
@@ -191,69 +615,148 @@ def analyze():
         if not main_course_file_path:
             return jsonify({'error': '没有找到主要课程列表文件'}), 400
         
-        # 创建分析器实例
-        analyzer = GradeAnalyzer()
-        
-        # 加载主要课程列表（必需）
-        analyzer.load_main_courses(main_course_file_path)
-        if not analyzer.main_courses:
-            return jsonify({'error': '主要课程列表为空或加载失败'}), 400
+        profile = profiling_requested()
+        # 之前的分析结果作为增量处理的基础
+        base_result_id = session.get('analysis_results', {}).get('result_id')
         
-        # 执行分析
-        results_df = analyzer.process_combined_data(grade_file_paths)
+        def task(job):
+            waited = job.started - job.created
+            ADMISSION_WAIT_SECONDS.observe(waited, gate='analysis')
+            ADMISSION_DECISIONS.inc(gate='analysis', outcome='queued' if waited > QUEUED_THRESHOLD else 'admitted')
+            if not profile:
+                result = run_analysis(grade_file_paths, main_course_file_path, progress=job.report,
+                                      file_hashes=file_hashes, base_result_id=base_result_id)
+            else:
+                # 分析在后台线程中执行，单独对任务做性能分析
+                profile_path = os.path.join(PROFILE_FOLDER, f'job_{job.id}.prof')
+                with profiled(profile_path) as profiler:
+                    result = run_analysis(grade_file_paths, main_course_file_path, progress=job.report,
+                                          file_hashes=file_hashes, base_result_id=base_result_id)
+                if profiler is not None:
+                    result = dict(result, profile_file=profile_path)
+            # 会话取得新结果之前，新旧结果都不应被清理
+            storage_manager.touch(session_id, [base_result_id, result['result_id']])
+            return result
         
-        if results_df.empty:
-            return jsonify({'error': '分析失败，没有有效的数据'}), 400
-        
-        # 生成结果文件
-        timestamp = datetime.now(TIME_ZONE).strftime('%Y%m%d_%H%M%S')
-        result_filename = f'成绩分析结果_{timestamp}.xlsx'
-        result_path = os.path.join(RESULTS_FOLDER, result_filename)
+        # 提交后台分析任务，立即返回任务ID；按成绩文件大小估算内存，运行中的分析超出内存预算时排队等待
+        cost = estimate_analysis_memory(grade_file_sizes, factor=ANALYSIS_MEMORY_FACTOR)
+        try:
+            job = job_queue.submit(task, owner=session_id, cost=cost)
+        except QueueFull as e:
+            ADMISSION_DECISIONS.inc(gate='analysis', outcome=f'rejected_{e.reason}')
+            return too_busy(e)
+        # 任务结束前不允许移除或替换它使用的文件
+        session['job_ids'] = active_session_jobs() + [job.id]
         
-        # 保存Excel结果
-        with pd.ExcelWriter(result_path, engine='openpyxl') as writer:
-            results_df.to_excel(writer, sheet_name='综合成绩', index=False)
-        
-        # 将结果转换为JSON格式返回
-        results_json = results_df.to_dict('records')
+        return jsonify({
+            'message': '分析任务已提交',
+            'job_id': job.id,
+            'status': job.status
+        }), 202
         
+    except Exception as e:
+        return jsonify({'error': f'分析失败: {str(e)}'}), 500
+
+@main_bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    """查询分析任务的状态和进度，任务完成时返回分析结果预览"""
+    job = job_queue.get(job_id)
+    if job is None or job.owner != session.get('session_id'):
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    
+    response = job.to_dict()
+    if job.status == JOB_SUCCEEDED:
+        result = job.result
         # 保存分析结果到会话（只保存必要信息，减少session大小）
         session['analysis_results'] = {
-            'result_file': result_filename,
-            'result_path': result_path,
-            'timestamp': timestamp,
-            'student_count': len(results_json)
+            'result_id': result['result_id'],
+            'result_file': result['result_file'],
+            'timestamp': result['timestamp'],
+            'student_count': result['student_count']
         }
-        
-        return jsonify({
+        if 'profile_file' in result:
+            response['profile_file'] = result['profile_file']
+        response['result'] = {
             'message': '分析完成',
-            'student_count': len(results_json),
-            'result_file': result_filename,
-            'preview': results_json[:10] if len(results_json) > 10 else results_json  # 返回前10条预览
-        })
-        
-    except Exception as e:
-        return jsonify({'error': f'分析失败: {str(e)}'}), 500
+            'student_count': result['student_count'],
+            'result_file': result['result_file'],
+            'cached': result['cached'],
+            'incremental': result['incremental'],
+            'timings': result['timings'],
+            'merge_report': result.get('merge_report'),
+            'preview': result['preview']
+        }
+    return jsonify(response)
+
+@main_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消排队中或运行中的分析任务"""
+    job = job_queue.get(job_id)
+    if job is None or job.owner != session.get('session_id'):
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    
+    if not job_queue.cancel(job_id):
+        return jsonify({'error': '任务已结束，无法取消', 'status': job.status}), 409
+    
+    return jsonify({'message': '已请求取消任务', 'job_id': job.id, 'status': job.status})
+
+def parse_result_filters(table):
+    """
+    解析结果查询的排序和筛选参数（sort_by、order、grade、name），
+    返回 (ResultTable.positions的关键字参数, 错误信息)
+    """
+    grade = request.args.get('grade')
+    try:
+        grade = int(grade) if grade not in (None, '') else None
+    except ValueError:
+        return None, 'grade参数必须为整数'
+    sort_by = request.args.get('sort_by') or None
+    if sort_by is not None and sort_by not in table.df.columns:
+        return None, f'无法按该列排序: {sort_by}'
+    order = request.args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        return None, 'order参数只能为asc或desc'
+    return {
+        'sort_by': sort_by,
+        'ascending': order == 'asc',
+        'grade': grade,
+        'name_prefix': request.args.get('name') or None,
+    }, None
 
 @main_bp.route('/results')
 def get_results():
-    """获取分析结果"""
+    """
+    分页获取分析结果
+    查询参数：offset、limit（默认100）、sort_by（任意结果列，如学分加权平均分、总学分、学号）、
+    order（asc/desc，默认desc）、grade（年级）、name（姓名前缀）
+    """
     try:
         if 'analysis_results' not in session:
             return jsonify({'error': '没有找到分析结果'}), 404
         
         analysis_results = session['analysis_results']
         
-        # 从Excel文件重新读取数据（因为session中不再存储完整数据）
-        result_path = analysis_results['result_path']
-        if os.path.exists(result_path):
-            df = pd.read_excel(result_path)
-            results_data = df.to_dict('records')
-        else:
-            return jsonify({'error': '结果文件不存在'}), 404
+        table = load_result_table(analysis_results)
+        if table is None:
+            return jsonify({'error': '分析结果已过期，请重新分析'}), 404
+        
+        # 解析查询参数
+        try:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = min(max(int(request.args.get('limit', 100)), 1), RESULTS_PAGE_MAX)
+        except ValueError:
+            return jsonify({'error': 'offset、limit参数必须为整数'}), 400
+        filters, error = parse_result_filters(table)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        total, page = table.query(offset=offset, limit=limit, **filters)
         
         return jsonify({
-            'data': results_data,
+            'data': page.to_dict('records'),
+            'total': total,
+            'offset': offset,
+            'limit': limit,
             'student_count': analysis_results['student_count'],
             'result_file': analysis_results['result_file'],
             'timestamp': analysis_results['timestamp']
@@ -262,42 +765,145 @@ def get_results():
     except Exception as e:
         return jsonify({'error': f'获取结果失败: {str(e)}'}), 500
 
-@main_bp.route('/download/<path:filename>')
-def download_file(filename):
-    """下载分析结果文件"""
+@main_bp.route('/results/stats')
+def get_result_stats():
+    """
+    分析结果的排名统计：全体及各年级的人数、均值、标准差、最值、分位数、并列人数、分数段分布和百分位段分数线
+    统计在分析时计算并随结果缓存；响应带ETag，结果未变化时返回304
+    查询参数：grade（只返回该年级）
+    """
     try:
         if 'analysis_results' not in session:
             return jsonify({'error': '没有找到分析结果'}), 404
         
-        result_path = session['analysis_results']['result_path']
+        analysis_results = session['analysis_results']
+        grade = request.args.get('grade')
+        try:
+            grade = int(grade) if grade not in (None, '') else None
+        except ValueError:
+            return jsonify({'error': 'grade参数必须为整数'}), 400
         
-        if not os.path.exists(result_path):
-            return jsonify({'error': '结果文件不存在'}), 404
+        # 同一分析结果的统计不变，客户端已有时无需加载结果表
+        result_id = analysis_results.get('result_id')
+        etag = f"{result_id}-{STATS_VERSION}-{grade}" if result_id else None
+        if etag and etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
         
-        # 从URL解码文件名
-        import urllib.parse
-        decoded_filename = urllib.parse.unquote(filename)
+        table = load_result_table(analysis_results)
+        if table is None:
+            return jsonify({'error': '分析结果已过期，请重新分析'}), 404
+        stats = table.stats()
+        if grade is not None:
+            stats = dict(stats, grades=[item for item in stats['grades'] if item['grade'] == grade])
         
-        return send_file(result_path, as_attachment=True, download_name=decoded_filename)
+        response = jsonify(stats)
+        if etag:
+            response.set_etag(etag)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        return response
         
     except Exception as e:
-        return jsonify({'error': f'下载失败: {str(e)}'}), 500
+        return jsonify({'error': f'获取统计失败: {str(e)}'}), 500
 
-@main_bp.route('/download_result')
-def download_result():
-    """直接下载分析结果文件（不通过文件名参数）"""
+def stream_ndjson(table, rows):
+    """逐批输出NDJSON，每行一个学生的结果"""
+    for chunk in table.iter_chunks(rows):
+        yield ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in chunk.to_dict('records'))
+
+def stream_csv(table, rows):
+    """逐批输出CSV（UTF-8 BOM，表头只输出一次）"""
+    yield '\ufeff' + table.df.iloc[:0].to_csv(index=False)
+    for chunk in table.iter_chunks(rows):
+        yield chunk.to_csv(index=False, header=False)
+
+@main_bp.route('/results/stream')
+def stream_results():
+    """
+    流式输出全部（或筛选后的）分析结果，直接从结果表逐批生成，不在内存中构建完整的响应
+    查询参数：format（ndjson/csv，默认ndjson）、sort_by、order、grade、name（含义同/results）
+    响应头X-Total-Count为输出的行数
+    """
     try:
         if 'analysis_results' not in session:
             return jsonify({'error': '没有找到分析结果'}), 404
         
         analysis_results = session['analysis_results']
-        result_path = analysis_results['result_path']
-        result_filename = analysis_results['result_file']
+        fmt = request.args.get('format', 'ndjson').lower()
+        if fmt not in ('ndjson', 'csv'):
+            return jsonify({'error': f'不支持的输出格式: {fmt}，可选: ndjson, csv'}), 400
         
-        if not os.path.exists(result_path):
+        table = load_result_table(analysis_results)
+        if table is None:
+            return jsonify({'error': '分析结果已过期，请重新分析'}), 404
+        filters, error = parse_result_filters(table)
+        if error:
+            return jsonify({'error': error}), 400
+        rows = table.positions(**filters)
+        
+        headers = {'X-Total-Count': str(len(rows))}
+        if fmt == 'csv':
+            download_name = result_download_name(analysis_results['timestamp'], 'csv')
+            headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(download_name)}"
+            return Response(stream_csv(table, rows), mimetype='text/csv', headers=headers)
+        return Response(stream_ndjson(table, rows), mimetype='application/x-ndjson', headers=headers)
+        
+    except Exception as e:
+        return jsonify({'error': f'获取结果失败: {str(e)}'}), 500
+
+def send_result_export(fmt, download_name=None):
+    """
+    按格式导出当前会话的分析结果并发送；导出文件首次请求时生成，之后直接复用
+    """
+    if 'analysis_results' not in session:
+        return jsonify({'error': '没有找到分析结果'}), 404
+    if fmt not in WRITERS:
+        return jsonify({'error': f'不支持的导出格式: {fmt}，可选: {", ".join(WRITERS)}'}), 400
+    
+    analysis_results = session['analysis_results']
+    result_id = analysis_results.get('result_id')
+    if not result_id:
+        # 旧版本会话只记录了结果Excel文件
+        result_path = analysis_results.get('result_path')
+        if not result_path or not os.path.exists(result_path):
             return jsonify({'error': '结果文件不存在'}), 404
+        result_id = file_sha256(result_path)
+    
+    def load_frame():
+        table = load_result_table(analysis_results)
+        return table.df if table is not None else None
+    
+    try:
+        export_path = result_exporter.export(result_id, fmt, load_frame)
+    except ExportUnavailable as e:
+        return jsonify({'error': str(e)}), 400
+    if export_path is None:
+        return jsonify({'error': '分析结果已过期，请重新分析'}), 404
+    
+    download_name = download_name or result_download_name(analysis_results['timestamp'], fmt)
+    return send_file(export_path, as_attachment=True, download_name=download_name,
+                     mimetype=FORMAT_MIMETYPES[fmt])
+
+@main_bp.route('/download/<path:filename>')
+def download_file(filename):
+    """下载分析结果文件，格式由文件扩展名决定（默认xlsx）"""
+    try:
+        # 从URL解码文件名
+        import urllib.parse
+        decoded_filename = urllib.parse.unquote(filename)
+        fmt = os.path.splitext(decoded_filename)[1].lstrip('.').lower()
+        return send_result_export(fmt if fmt in WRITERS else FORMAT_XLSX, download_name=decoded_filename)
         
-        return send_file(result_path, as_attachment=True, download_name=result_filename)
+    except Exception as e:
+        return jsonify({'error': f'下载失败: {str(e)}'}), 500
+
+@main_bp.route('/download_result')
+def download_result():
+    """直接下载分析结果文件（不通过文件名参数），查询参数format：xlsx（默认）、csv、parquet"""
+    try:
+        return send_result_export(request.args.get('format', FORMAT_XLSX).lower())
         
     except Exception as e:
         return jsonify({'error': f'下载失败: {str(e)}'}), 500
@@ -308,14 +914,62 @@ def status():
     return jsonify({
         'status': 'running',
         'message': '成绩分析Web服务正在运行',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'parsed_file_cache': parsed_file_cache.stats(),
+        'analysis_result_cache': analysis_result_cache.stats(),
+        'jobs': job_queue.stats(),
+        'admission': {'upload': upload_gate.stats()},
+        'profiling_enabled': PROFILING_ENABLED,
+        'export_formats': available_formats(),
+        'grading_scheme': {'name': GRADING_SCHEME.name, 'version': GRADING_SCHEME.version},
+        'storage': storage_manager.stats(),
+        'session_store': session_store.stats() if session_store is not None else {'backend': SESSION_BACKEND},
+        'loaded_modules': loaded_modules()
     })
 
+@main_bp.route('/api/live')
+def liveness():
+    """存活检查：进程能够处理请求"""
+    return jsonify({'status': 'alive', 'pid': os.getpid()})
+
+@main_bp.route('/api/ready')
+def readiness():
+    """就绪检查：上传和结果目录可写、会话存储可用、任务队列未满，未就绪时返回503"""
+    jobs = job_queue.stats()
+    checks = {
+        'upload_dir': os.access(UPLOAD_FOLDER, os.W_OK),
+        'results_dir': os.access(RESULTS_FOLDER, os.W_OK),
+        'job_queue': jobs['queued'] < jobs['max_queued'],
+    }
+    if JOB_STATE_FOLDER:
+        checks['job_state_dir'] = os.access(JOB_STATE_FOLDER, os.W_OK)
+    if session_store is not None:
+        try:
+            session_store.stats()
+            checks['session_store'] = True
+        except Exception:
+            checks['session_store'] = False
+    ready = all(checks.values())
+    return jsonify({'status': 'ready' if ready else 'not_ready', 'checks': checks,
+                    'pid': os.getpid()}), 200 if ready else 503
+
+@main_bp.route('/api/metrics')
+def metrics():
+    """Prometheus格式的性能指标：分析各阶段耗时、HTTP请求耗时、准入控制"""
+    uploads = upload_gate.stats()
+    jobs = job_queue.stats()
+    for gate, active, waiting, cost in (('upload', uploads['active'], uploads['waiting'], uploads['cost']),
+                                        ('analysis', jobs['running'], jobs['queued'], jobs['reserved_bytes'])):
+        ADMISSION_STATE.set(active, gate=gate, kind='active')
+        ADMISSION_STATE.set(waiting, gate=gate, kind='waiting')
+        ADMISSION_STATE.set(cost, gate=gate, kind='cost')
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @main_bp.route('/sample/<path:filename>')
 def download_sample(filename):
     """下载示例文件"""
     try:
-        sample_dir = os.path.join(app.root_path, 'static', 'samples')
+        sample_dir = os.path.join(current_app.root_path, 'static', 'samples')
         file_path = os.path.join(sample_dir, filename)
         
         if not os.path.exists(file_path):
@@ -326,16 +980,86 @@ def download_sample(filename):
     except Exception as e:
         return jsonify({'error': f'下载示例文件失败: {str(e)}'}), 500
 
-# 注册Blueprint
-app.register_blueprint(main_bp)
+@main_bp.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    # /analyze只提交任务，分析的是后台任务本身（同一时间只能进行一个性能分析）
+    if profiling_requested() and request.endpoint != 'main.analyze':
+        g.profile_path = os.path.join(
+            PROFILE_FOLDER, f"request_{datetime.now(TIME_ZONE).strftime('%Y%m%d_%H%M%S_%f')}.prof")
+        g.profile_stack = contextlib.ExitStack()
+        if g.profile_stack.enter_context(profiled(g.profile_path)) is None:
+            g.profile_stack.close()
+            g.pop('profile_stack')
+
+@main_bp.after_app_request
+def record_request_time(response):
+    profile_stack = g.pop('profile_stack', None)
+    if profile_stack is not None:
+        profile_stack.close()
+        response.headers['X-Profile-File'] = g.profile_path
+    start = g.pop('request_start', None)
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                endpoint=request.endpoint or 'unmatched', method=request.method,
+                                status=response.status_code)
+    return response
+
+@main_bp.teardown_app_request
+def stop_request_profile(error):
+    """请求异常结束（未执行after_app_request）时也结束性能分析，释放性能分析锁"""
+    profile_stack = g.pop('profile_stack', None)
+    if profile_stack is not None:
+        profile_stack.close()
+
+@main_bp.after_app_request
+def touch_session_storage(response):
+    """记录会话的使用及其引用的分析结果，使其不被存储清理删除；按需启动后台清理线程"""
+    storage_manager.start()
+    session_id = session.get('session_id')
+    if session_id:
+        analysis_results = session.get('analysis_results') or {}
+        result_path = analysis_results.get('result_path')
+        storage_manager.touch(session_id, [analysis_results.get('result_id'),
+                                           os.path.basename(result_path) if result_path else None])
+    return response
 
-@app.errorhandler(404)
+@main_bp.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': '页面不存在'}), 404
 
-@app.errorhandler(500)
+@main_bp.app_errorhandler(413)
+def request_too_large(error):
+    return jsonify({'error': f'上传文件过大，单次上传不能超过 {MAX_UPLOAD_SIZE // 1024 // 1024}MB'}), 413
+
+@main_bp.app_errorhandler(500)
 def internal_error(error):
     return jsonify({'error': '内部服务器错误'}), 500
 
+def create_app():
+    """
+    应用工厂：创建Flask应用，注册路由、请求钩子和会话存储
+    缓存、结果存储、任务队列等在进程内共享；后台线程在首次使用时启动，预先fork的工作进程中各自启动
+    """
+    # 支持子路径部署
+    app = Flask(__name__)
+    app.secret_key = SECRET_KEY
+    # 上传文件在表单解析时直接分块写入磁盘并计算哈希
+    app.request_class = UploadRequest
+    app.config['UPLOAD_TMP_FOLDER'] = UPLOAD_TMP_FOLDER
+    app.config['MAX_FILE_SIZE'] = MAX_FILE_SIZE
+    app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
+    if session_store is not None:
+        app.session_interface = ServerSessionInterface(session_store)
+    app.register_blueprint(main_bp)
+    # 应用代理修复
+    app.wsgi_app = ProxyFix(app.wsgi_app)
+    if WARM_IMPORTS:
+        warm_in_background()
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
+    # 开发服务器；生产环境使用 python serve.py 或 gunicorn -c gunicorn.conf.py wsgi:app
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
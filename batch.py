@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# @File    : batch.py
+# @Time    : 2026/10/18
+# 批量分析：按清单一次处理多个班级，每个班级有各自的成绩文件和主要课程列表；
+# 各班级共用的成绩文件（按内容判断）只解析一次，各班级的汇总在进程池中并行执行，
+# 每个班级输出一个结果文件（含班级内及年级内排名），另输出汇总信息 summary.json（含各班级的排名统计和合并报告）
+#
+# 清单为JSON文件，相对路径相对于清单文件所在目录：
+# {
+#     "output_dir": "批量结果",
+#     "format": "xlsx",
+#     "grading_scheme": "成绩换算方案.json",
+#     "classes": [
+#         {"name": "计算机拔尖221",
+#          "grade_files": ["计算机（拔尖）221-1.xlsx", "计算机（拔尖）221-2.xlsx"],
+#          "main_course_file": "主要课程列表-计算机拔尖221.xlsx"},
+#         {"name": "数据科学231",
+#          "grade_files": ["数据科学231-1.xlsx", "数据科学231-2.xlsx"],
+#          "main_course_file": "主要课程列表-数据科学231.xlsx"}
+#     ]
+# }
+#
+# grading_scheme可选，为成绩换算方案配置文件（格式见grading.py），默认使用默认方案
+#
+# 用法：python batch.py manifest.json [--output-dir DIR] [--format xlsx|csv|parquet] [--workers N] [--cache-dir DIR]
+#                      [--grading-scheme FILE]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from exports import FORMAT_XLSX, WRITERS
+from file_cache import ParsedFileCache
+from grade_analyzer import DEFAULT_OTHER_COURSE_LIMIT, GradeAnalyzer
+from grading import GradingScheme
+from ranking import add_ranks, summarize
+
+SUMMARY_FILE = 'summary.json'
+# 文件名中不允许的字符
+UNSAFE_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+class ManifestError(ValueError):
+    """清单格式错误或引用的文件不存在"""
+
+
+def _resolve(base_dir, path):
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def load_manifest(manifest_path):
+    """
+    读取并校验清单，返回 {'output_dir', 'format', 'grading_scheme', 'classes': [{'name', 'grade_files', 'main_course_file'}]}，
+    路径均已相对于清单所在目录解析
+    """
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"无法读取清单 {manifest_path}: {e}")
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('classes'), list) or not manifest['classes']:
+        raise ManifestError("清单中缺少班级列表（classes）")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    fmt = manifest.get('format', FORMAT_XLSX)
+    if fmt not in WRITERS:
+        raise ManifestError(f"不支持的输出格式: {fmt}")
+    grading_scheme = manifest.get('grading_scheme')
+    if grading_scheme:
+        grading_scheme = _resolve(base_dir, grading_scheme)
+        if not os.path.isfile(grading_scheme):
+            raise ManifestError(f"成绩换算方案文件不存在: {grading_scheme}")
+
+    classes = []
+    names = set()
+    for i, entry in enumerate(manifest['classes'], start=1):
+        name = str(entry.get('name') or '').strip() if isinstance(entry, dict) else ''
+        if not name:
+            raise ManifestError(f"第{i}个班级缺少名称（name）")
+        if name in names:
+            raise ManifestError(f"班级名称重复: {name}")
+        names.add(name)
+        grade_files = entry.get('grade_files')
+        if isinstance(grade_files, str):
+            grade_files = [grade_files]
+        if not grade_files:
+            raise ManifestError(f"班级 {name} 缺少成绩文件（grade_files）")
+        if not entry.get('main_course_file'):
+            raise ManifestError(f"班级 {name} 缺少主要课程列表文件（main_course_file）")
+        grade_files = [_resolve(base_dir, path) for path in grade_files]
+        main_course_file = _resolve(base_dir, entry['main_course_file'])
+        for path in grade_files + [main_course_file]:
+            if not os.path.isfile(path):
+                raise ManifestError(f"班级 {name} 的文件不存在: {path}")
+        classes.append({'name': name, 'grade_files': grade_files, 'main_course_file': main_course_file})
+
+    return {
+        'output_dir': _resolve(base_dir, manifest.get('output_dir', 'batch_results')),
+        'format': fmt,
+        'grading_scheme': grading_scheme or None,
+        'classes': classes,
+    }
+
+
+def output_filename(class_name, fmt):
+    """班级结果文件名"""
+    return f"成绩分析结果-{UNSAFE_FILENAME_CHARS.sub('_', class_name)}.{fmt}"
+
+
+def _run_class(spec, parsed_files, output_path, fmt, other_course_limit, grading_scheme):
+    """
+    进程池任务：用一个班级的主要课程列表汇总其已解析的成绩文件并写入结果文件
+    返回班级结果信息，分析过程的输出在log中
+    """
+    start = time.perf_counter()
+    result = {'name': spec['name'], 'students': 0, 'output': None, 'error': None, 'stats': None, 'merge_report': None}
+    buffer = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buffer):
+            analyzer = GradeAnalyzer(other_course_limit=other_course_limit, grading_scheme=grading_scheme)
+            analyzer.load_main_courses(spec['main_course_file'])
+            if not analyzer.main_courses:
+                raise ValueError('主要课程列表为空或加载失败')
+            df = analyzer.process_parsed(parsed_files)
+            result['merge_report'] = analyzer.merge_report
+            if df.empty:
+                raise ValueError('没有有效的数据')
+            df = add_ranks(df)
+            WRITERS[fmt](df, output_path)
+        result['students'] = len(df)
+        result['output'] = output_path
+        result['stats'] = summarize(df)
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    result['log'] = buffer.getvalue()
+    return result
+
+
+def run_batch(classes, output_dir, fmt=FORMAT_XLSX, workers=None, file_cache=None,
+              other_course_limit=DEFAULT_OTHER_COURSE_LIMIT, grading_scheme=None, verbose=False):
+    """
+    批量分析多个班级（load_manifest返回的classes），每个班级的结果写入output_dir，汇总信息写入summary.json
+    workers: 并行的进程数，None为CPU核数；file_cache: 可选的成绩文件解析缓存；
+    grading_scheme: 成绩换算方案（grading.GradingScheme），None为默认方案
+    返回汇总信息字典，其中students_per_second为整体吞吐量（学生数/秒）
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    # 所有班级的成绩文件按内容去重后解析一次
+    analyzer = GradeAnalyzer(workers=workers, file_cache=file_cache, grading_scheme=grading_scheme)
+    file_keys = {}
+    unique_paths = []
+    seen = set()
+    for spec in classes:
+        for path in spec['grade_files']:
+            key = file_keys[path] = analyzer.file_hash(path)
+            if key not in seen:
+                seen.add(key)
+                unique_paths.append(path)
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        parsed_by_key = dict(zip((file_keys[path] for path in unique_paths),
+                                 analyzer._parse_grade_files(unique_paths)))
+    parse_seconds = time.perf_counter() - start
+    if verbose:
+        print(log.getvalue(), end='')
+
+    tasks = [(spec, [parsed_by_key[file_keys[path]] for path in spec['grade_files']],
+              os.path.join(output_dir, output_filename(spec['name'], fmt)), fmt, other_course_limit,
+              analyzer.grading_scheme)
+             for spec in classes]
+    class_workers = min(workers, len(tasks))
+    if class_workers > 1:
+        with ProcessPoolExecutor(max_workers=class_workers) as executor:
+            results = list(executor.map(_run_class, *zip(*tasks)))
+    else:
+        results = [_run_class(*task) for task in tasks]
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        if verbose:
+            print(result['log'], end='')
+        del result['log']
+    total_students = sum(result['students'] for result in results)
+    summary = {
+        'classes': results,
+        'class_count': len(results),
+        'failed': sum(1 for result in results if result['error']),
+        'students': total_students,
+        'grade_files': sum(len(spec['grade_files']) for spec in classes),
+        'parsed_files': len(unique_paths),
+        'parse_seconds': parse_seconds,
+        'seconds': elapsed,
+        'students_per_second': total_students / elapsed if elapsed > 0 else 0.0,
+        'workers': workers,
+        'format': fmt,
+        'grading_scheme': {'name': analyzer.grading_scheme.name, 'version': analyzer.grading_scheme.version},
+        'output_dir': output_dir,
+    }
+    with open(os.path.join(output_dir, SUMMARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def print_summary(summary):
+    """打印各班级结果及整体吞吐量"""
+    print(f"{'班级':<20} {'学生数':>8} {'耗时(s)':>8}  结果")
+    for result in summary['classes']:
+        outcome = f"失败: {result['error']}" if result['error'] else result['output']
+        print(f"{result['name']:<20} {result['students']:>8} {result['seconds']:>8.2f}  {outcome}")
+    print(f"\n共 {summary['class_count']} 个班级（失败 {summary['failed']} 个），{summary['students']} 名学生；"
+          f"引用成绩文件 {summary['grade_files']} 次，实际解析 {summary['parsed_files']} 个（{summary['parse_seconds']:.2f}s）")
+    print(f"总耗时 {summary['seconds']:.2f}s，吞吐量 {summary['students_per_second']:.0f} 学生/秒")
+    print(f"汇总信息: {os.path.join(summary['output_dir'], SUMMARY_FILE)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='按清单批量分析多个班级的成绩')
+    parser.add_argument('manifest', help='清单JSON文件')
+    parser.add_argument('--output-dir', help='结果目录，默认取清单中的output_dir')
+    parser.add_argument('--format', choices=sorted(WRITERS), help='结果文件格式，默认取清单中的format（xlsx）')
+    parser.add_argument('--workers', type=int, default=None, help='并行进程数，默认为CPU核数')
+    parser.add_argument('--cache-dir', help='成绩文件解析缓存目录，默认不缓存')
+    parser.add_argument('--other-course-limit', type=int, default=DEFAULT_OTHER_COURSE_LIMIT,
+                        help='计入的其他课程门数')
+    parser.add_argument('--grading-scheme', help='成绩换算方案配置文件，默认取清单中的grading_scheme')
+    parser.add_argument('--verbose', action='store_true', help='输出各班级的分析过程')
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = load_manifest(args.manifest)
+        scheme_file = args.grading_scheme or manifest['grading_scheme']
+        grading_scheme = GradingScheme.load(scheme_file) if scheme_file else None
+    except (ManifestError, OSError, ValueError) as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 2
+    summary = run_batch(manifest['classes'], args.output_dir or manifest['output_dir'],
+                        fmt=args.format or manifest['format'], workers=args.workers,
+                        file_cache=ParsedFileCache(args.cache_dir) if args.cache_dir else None,
+                        other_course_limit=args.other_course_limit, grading_scheme=grading_scheme,
+                        verbose=args.verbose)
+    print_summary(summary)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
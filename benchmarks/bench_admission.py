@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# @File    : bench_admission.py
+# @Time    : 2026/10/18
+# 准入控制负载测试：模拟截止时间前的集中提交，多个客户端同时 上传 → 提交分析（每个客户端连续点击两次提交）
+# → 轮询任务，收到429时按Retry-After等待后重试；分别在默认的准入限制和不限制（分析并发数等于客户端数、
+# 不限会话任务数和内存预算）下运行，比较 /api/live 与整个流程的尾延迟、429次数和服务进程的峰值内存
+#
+# 用法：python benchmarks/bench_admission.py [--clients 12] [--students 1000] [--threads 16]
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_serve import Client, encode_multipart, free_port, probe_liveness, wait_ready
+from synthetic import generate_dataset
+
+# 场景 -> 额外的环境变量
+SCENARIOS = {
+    'limited': {},
+    'unlimited': {
+        'GRADE_JOB_MAX_PER_SESSION': '0',
+        'GRADE_ANALYSIS_MEMORY_MB': '0',
+        'GRADE_UPLOAD_MAX_PER_SESSION': '0',
+        'GRADE_UPLOAD_INFLIGHT_MB': '0',
+    },
+}
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def peak_rss_mb(pid):
+    """进程的峰值常驻内存（MB），仅Linux"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+
+def with_retry(client, path, body, content_type, rejections):
+    """发送请求，收到429时按retry_after等待后重试，返回 (状态码, 响应)"""
+    while True:
+        status, data = client.request(path, body, content_type)
+        if status != 429:
+            return status, data
+        rejections.append(data.get('reason'))
+        time.sleep(data.get('retry_after') or 1)
+
+
+def run_session(base_url, grade_paths, main_path, rejections, duplicates):
+    """一个用户：上传、连续两次提交分析、等待第一个任务完成，返回 (提交耗时, 总耗时)"""
+    client = Client(base_url)
+    start = time.perf_counter()
+    body, content_type = encode_multipart([('grade_files', path) for path in grade_paths] +
+                                          [('main_course_file', main_path)])
+    status, data = with_retry(client, '/upload', body, content_type, rejections)
+    if status != 200:
+        raise RuntimeError(f'上传失败: {status} {data}')
+    status, job = with_retry(client, '/analyze', b'', None, rejections)
+    if status != 202:
+        raise RuntimeError(f'提交分析失败: {status} {job}')
+    submitted = time.perf_counter() - start
+    # 重复点击：限制会话任务数时返回429，不限制时多出一个任务
+    status, data = client.request('/analyze', b'')
+    duplicates.append(status)
+    while job.get('status') in ('queued', 'running'):
+        time.sleep(0.1)
+        status, job = client.request(f"/jobs/{job['job_id']}")
+    if job.get('status') != 'succeeded':
+        raise RuntimeError(f'分析失败: {job}')
+    return submitted, time.perf_counter() - start
+
+
+def bench_scenario(name, datasets, threads):
+    """启动服务（单个工作进程）并同时运行所有客户端，返回统计结果"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, GRADE_STORAGE_SWEEP_INTERVAL='0', **SCENARIOS[name])
+        if name == 'unlimited':
+            env.update(GRADE_JOB_WORKERS=str(len(datasets)), GRADE_UPLOAD_CONCURRENCY=str(len(datasets)))
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT_DIR, 'serve.py'), '--server', 'builtin',
+                                 '--host', '127.0.0.1', '--port', str(port),
+                                 '--workers', '1', '--threads', str(threads)],
+                                cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(base_url, proc)
+            baseline_rss = peak_rss_mb(proc.pid)
+            stop = threading.Event()
+            latencies = []
+            prober = threading.Thread(target=probe_liveness, args=(base_url, stop, latencies), daemon=True)
+            rejections, duplicates, errors, submits, totals = [], [], [], [], []
+            barrier = threading.Barrier(len(datasets))
+
+            def client(index):
+                grade_paths, main_path = datasets[index]
+                barrier.wait()
+                try:
+                    submitted, total = run_session(base_url, grade_paths, main_path, rejections, duplicates)
+                except Exception as e:
+                    errors.append(str(e))
+                    return
+                submits.append(submitted)
+                totals.append(total)
+
+            prober.start()
+            start = time.perf_counter()
+            clients = [threading.Thread(target=client, args=(i,)) for i in range(len(datasets))]
+            for t in clients:
+                t.start()
+            for t in clients:
+                t.join()
+            elapsed = time.perf_counter() - start
+            stop.set()
+            prober.join()
+            rss = peak_rss_mb(proc.pid)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    return {
+        'sessions': len(totals),
+        'errors': errors,
+        'elapsed': elapsed,
+        'rejected': len(rejections),
+        'duplicates_rejected': duplicates.count(429),
+        'submit_p95': percentile(submits, 0.95),
+        'total_p50': percentile(totals, 0.5),
+        'total_p99': percentile(totals, 0.99),
+        'live_p50': percentile(latencies, 0.5) * 1000,
+        'live_p99': percentile(latencies, 0.99) * 1000,
+        'live_max': max(latencies, default=float('nan')) * 1000,
+        'rss_baseline': baseline_rss,
+        'rss_peak': rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='准入控制负载测试')
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--clients', type=int, default=12, help='同时提交的客户端数')
+    parser.add_argument('--students', type=int, default=1000, help='每组合成数据的学生数')
+    parser.add_argument('--threads', type=int, default=16, help='服务的请求线程数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 每个客户端使用不同的数据，避免命中分析结果缓存
+        datasets = [generate_dataset(os.path.join(data_dir, str(i)), args.students, seed=i)
+                    for i in range(args.clients)]
+        print(f"CPU核数: {os.cpu_count()}，同时提交的客户端: {args.clients}，每组数据 {args.students} 名学生，"
+              f"{args.threads} 个请求线程")
+        print(f"{'场景':>10} {'完成':>4} {'失败':>4} {'总耗时(s)':>9} {'429':>5} {'重复拒绝':>8} "
+              f"{'提交P95(s)':>10} {'流程中位(s)':>11} {'流程P99(s)':>10} "
+              f"{'live中位(ms)':>12} {'live P99(ms)':>12} {'live最大(ms)':>12} {'峰值内存(MB)':>12}")
+        for name in args.scenarios:
+            stats = bench_scenario(name, datasets, args.threads)
+            print(f"{name:>10} {stats['sessions']:>4} {len(stats['errors']):>4} {stats['elapsed']:>9.1f} "
+                  f"{stats['rejected']:>5} {stats['duplicates_rejected']:>8} {stats['submit_p95']:>10.2f} "
+                  f"{stats['total_p50']:>11.2f} {stats['total_p99']:>10.2f} {stats['live_p50']:>12.1f} "
+                  f"{stats['live_p99']:>12.1f} {stats['live_max']:>12.1f} "
+                  f"{stats['rss_baseline']:>5.0f} -> {stats['rss_peak']:<5.0f}")
+            for error in stats['errors'][:3]:
+                print(f"    {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# @File    : bench_main_course_matcher.py
+# @Time    : 2026/10/18
+# 主要课程匹配基准：比较逐个子串扫描与预编译匹配器（含缓存）随主要课程数量增长的耗时
+#
+# 用法：python benchmarks/bench_main_course_matcher.py [--students 2000] [--courses 60]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grade_analyzer import MainCourseMatcher
+
+SIZES = [10, 50, 100, 200, 500, 1000]
+
+
+def make_course_names(count, rng):
+    """生成形如'程序设计基础（3）'的课程名称"""
+    stems = ['程序设计', '数据结构', '高等数学', '大学英语', '形势与政策', '体育', '线性代数',
+             '操作系统', '计算机网络', '数据库原理', '机器学习', '软件工程', '概率论', '离散数学']
+    return [f"{rng.choice(stems)}{i}（{rng.randint(1, 4)}）" for i in range(count)]
+
+
+def naive_scan(main_courses, student_courses):
+    """原始实现：每个学生的每门课程逐个扫描主要课程列表"""
+    major = 0
+    for courses in student_courses:
+        for name in courses:
+            for major_course in main_courses:
+                if major_course in name:
+                    major += 1
+                    break
+    return major
+
+
+def matcher_scan(main_courses, student_courses):
+    """预编译匹配器：每个不同课程名称只匹配一次"""
+    matcher = MainCourseMatcher(main_courses)
+    major = 0
+    for courses in student_courses:
+        for name in courses:
+            if matcher.is_main_course(name):
+                major += 1
+    return major
+
+
+def main():
+    parser = argparse.ArgumentParser(description='主要课程匹配基准')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--courses', type=int, default=60, help='每名学生的课程数')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    catalog = make_course_names(1200, rng)
+    student_courses = [rng.sample(catalog, args.courses) for _ in range(args.students)]
+
+    print(f"学生数: {args.students}, 每人课程数: {args.courses}")
+    print(f"{'主要课程数':>10} {'逐个扫描(s)':>12} {'匹配器(s)':>12} {'加速比':>8}")
+    for size in SIZES:
+        main_courses = rng.sample(catalog, size)
+
+        start = time.perf_counter()
+        expected = naive_scan(main_courses, student_courses)
+        naive_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = matcher_scan(main_courses, student_courses)
+        matcher_time = time.perf_counter() - start
+
+        assert expected == actual
+        print(f"{size:>10} {naive_time:>12.4f} {matcher_time:>12.4f} {naive_time / matcher_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# @File    : bench_memory.py
+# @Time    : 2026/10/18
+# 内存基准：在独立子进程中对合成数据执行process_combined_data，
+# 报告进程峰值RSS及合并后中间数据（学生表、成绩长表等）实际占用的内存
+#
+# 用法：python benchmarks/bench_memory.py [--students 50000] [--engine vectorized rows]
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+
+def current_rss():
+    """当前进程的RSS（字节）"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def peak_rss():
+    """进程峰值RSS（字节）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run(engine, grade_paths, main_path):
+    """子进程：执行一次分析并输出内存统计（JSON）"""
+    from grade_analyzer import ENGINE_VECTORIZED, GradeAnalyzer
+
+    analyzer = GradeAnalyzer(engine=engine)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        analyzer.load_main_courses(main_path)
+        baseline = current_rss()
+        start = time.perf_counter()
+        df = analyzer.process_combined_data(grade_paths)
+        elapsed = time.perf_counter() - start
+        stats = {
+            'engine': engine,
+            'students': len(df),
+            'seconds': elapsed,
+            'baseline_rss': baseline,
+            'peak_rss': peak_rss(),
+        }
+        if engine == ENGINE_VECTORIZED:
+            # 单独构建一次合并后的中间数据，用tracemalloc统计其实际占用的内存
+            tracemalloc.start()
+            partials = [(file_idx, *parsed) for file_idx, parsed in
+                        enumerate(analyzer._parse_grade_files(grade_paths), start=1) if parsed is not None]
+            stats['records'] = sum(len(partial[-1]) for partial in partials)
+            merged = analyzer._merge_partials(partials)
+            del partials
+            gc.collect()
+            stats['intermediate_bytes'] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del merged
+    print(json.dumps(stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='内存基准')
+    parser.add_argument('--students', type=int, nargs='+', default=[50000])
+    parser.add_argument('--semesters', type=int, default=2)
+    parser.add_argument('--courses', type=int, default=60)
+    parser.add_argument('--engine', nargs='+', default=['vectorized'])
+    parser.add_argument('--run', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        engine, main_path, *grade_paths = args.run
+        run(engine, grade_paths, main_path)
+        return
+
+    from synthetic import generate_dataset
+
+    mb = 1024 * 1024
+    print(f"{'学生数':>8} {'引擎':>10} {'成绩记录':>10} {'耗时(s)':>8} {'基线RSS(MB)':>12} "
+          f"{'峰值RSS(MB)':>12} {'增量(MB)':>9} {'中间数据(MB)':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for students in args.students:
+            grade_paths, main_path = generate_dataset(os.path.join(tmp_dir, str(students)), students,
+                                                      semesters=args.semesters, courses=args.courses)
+            for engine in args.engine:
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', engine, main_path,
+                                         *grade_paths], capture_output=True, text=True, check=True).stdout
+                stats = json.loads(output.strip().splitlines()[-1])
+                intermediate = stats.get('intermediate_bytes')
+                intermediate = f"{intermediate / mb:.1f}" if intermediate else '-'
+                print(f"{students:>8} {engine:>10} {stats.get('records', '-'):>10} {stats['seconds']:>8.2f} "
+                      f"{stats['baseline_rss'] / mb:>12.1f} {stats['peak_rss'] / mb:>12.1f} "
+                      f"{(stats['peak_rss'] - stats['baseline_rss']) / mb:>9.1f} "
+                      f"{intermediate:>12}")
+
+
+if __name__ == '__main__':
+    main()
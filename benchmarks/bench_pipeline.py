@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# @File    : bench_pipeline.py
+# @Time    : 2026/10/18
+# 分析流程基准：用合成数据（见synthetic.py）测量不同学生规模下
+# load_main_courses、process_combined_data（含各阶段耗时）以及通过Flask测试客户端的
+# /upload -> /analyze -> /results -> /download_result 端到端耗时，结果写入JSON文件，便于在不同提交之间比较
+#
+# 用法：python benchmarks/bench_pipeline.py [--students 100 1000 5000 20000 50000]
+#                                           [--output result.json] [--compare baseline.json]
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import numpy as np
+import pandas as pd
+
+from grade_analyzer import GradeAnalyzer
+from metrics import StageTimer
+from synthetic import generate_dataset
+
+DEFAULT_STUDENTS = [100, 1000, 5000, 20000, 50000]
+
+
+def git_commit():
+    """当前提交的短哈希，不在git仓库中时返回None"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽分析过程中的打印输出"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def timed(func, repeat):
+    """取多次运行的最短耗时，返回 (秒, 最后一次的返回值)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_analyzer(grade_paths, main_path, repeat):
+    """直接调用分析器：加载主要课程列表、合并处理（不使用解析缓存）"""
+    analyzer = GradeAnalyzer()
+    with quiet():
+        load_seconds, _ = timed(lambda: analyzer.load_main_courses(main_path), repeat)
+
+    best = None
+    for _ in range(repeat):
+        timer = StageTimer()
+        start = time.perf_counter()
+        with quiet():
+            df = analyzer.process_combined_data(grade_paths, timer=timer)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, timer.timings, len(df))
+    process_seconds, stages, student_count = best
+    return {
+        'load_main_courses': load_seconds,
+        'process_combined_data': process_seconds,
+        'stages': stages,
+        'student_count': student_count,
+    }
+
+
+def bench_end_to_end(client, grade_paths, main_path):
+    """
+    通过测试客户端依次调用/upload、/analyze（轮询任务至完成，再分析一次测量缓存命中）、/results、
+    /download_result（各导出格式首次下载，即包含导出耗时）
+    """
+    with quiet():
+        return _end_to_end(client, grade_paths, main_path)
+
+
+def _end_to_end(client, grade_paths, main_path):
+    timings = {}
+    with contextlib.ExitStack() as stack:
+        data = {
+            'grade_files': [(stack.enter_context(open(path, 'rb')), os.path.basename(path)) for path in grade_paths],
+            'main_course_file': (stack.enter_context(open(main_path, 'rb')), os.path.basename(main_path)),
+        }
+        start = time.perf_counter()
+        response = client.post('/zongce/upload', data=data, content_type='multipart/form-data')
+        timings['upload'] = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"上传失败: {response.get_json()}")
+
+    for key in ('analyze', 'analyze_cached'):
+        start = time.perf_counter()
+        job = client.post('/zongce/analyze').get_json()
+        while job.get('status') in ('queued', 'running'):
+            time.sleep(0.01)
+            job = client.get(f"/zongce/jobs/{job['job_id']}").get_json()
+        timings[key] = time.perf_counter() - start
+        if job.get('status') != 'succeeded':
+            raise RuntimeError(f"分析失败: {job}")
+
+    start = time.perf_counter()
+    response = client.get('/zongce/results?limit=100')
+    timings['results'] = time.perf_counter() - start
+    start = time.perf_counter()
+    client.get('/zongce/results?limit=100&offset=100&sort_by=学号&order=asc')
+    timings['results_sorted'] = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"获取结果失败: {response.get_json()}")
+
+    for fmt in ('xlsx', 'csv'):
+        start = time.perf_counter()
+        response = client.get(f'/zongce/download_result?format={fmt}')
+        response.get_data()
+        response.close()
+        timings[f'download_{fmt}'] = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"下载{fmt}失败: {response.status_code}")
+
+    timings['total'] = timings['upload'] + timings['analyze'] + timings['results']
+    return timings
+
+
+def create_client(work_dir):
+    """在work_dir中导入Flask应用（上传、结果、缓存目录均为相对路径），返回测试客户端"""
+    os.environ.setdefault('GRADE_UPLOAD_MAX_FILE_MB', '4096')
+    os.environ.setdefault('GRADE_UPLOAD_MAX_TOTAL_MB', '16384')
+    os.chdir(work_dir)
+    with quiet():
+        import app as app_module
+    return app_module.app.test_client()
+
+
+def compare(results, baseline_path):
+    """与基准JSON比较相同学生规模下的各项耗时"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {run['students']: run for run in json.load(f)['runs']}
+    print(f"\n与 {baseline_path} 比较（当前/基准）:")
+    for run in results['runs']:
+        base = baseline.get(run['students'])
+        if base is None:
+            continue
+        ratios = []
+        for section in ('analyzer', 'end_to_end'):
+            for key, value in run[section].items():
+                base_value = base.get(section, {}).get(key)
+                if isinstance(value, float) and base_value:
+                    ratios.append(f"{key}={value / base_value:.2f}x")
+        print(f"{run['students']:>8}: {' '.join(ratios)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析流程基准')
+    parser.add_argument('--students', type=int, nargs='+', default=DEFAULT_STUDENTS)
+    parser.add_argument('--semesters', type=int, default=2, help='成绩文件（学期）数')
+    parser.add_argument('--courses', type=int, default=60, help='每个学期的课程数')
+    parser.add_argument('--blank-ratio', type=float, default=0.75, help='空白成绩比例')
+    parser.add_argument('--text-ratio', type=float, default=0.2, help='非空成绩中文字成绩的比例')
+    parser.add_argument('--repeat', type=int, default=1, help='分析器基准的重复次数（取最短耗时）')
+    parser.add_argument('--no-e2e', action='store_true', help='跳过端到端基准')
+    parser.add_argument('--output', help='结果JSON路径，默认为 bench_pipeline_<提交>.json')
+    parser.add_argument('--compare', help='用于比较的基准结果JSON')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output = os.path.abspath(args.output or f"bench_pipeline_{commit or 'unknown'}.json")
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    results = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'parameters': {
+            'semesters': args.semesters,
+            'courses': args.courses,
+            'blank_ratio': args.blank_ratio,
+            'text_ratio': args.text_ratio,
+            'repeat': args.repeat,
+        },
+        'runs': [],
+    }
+
+    print(f"{'学生数':>8} {'生成(s)':>9} {'加载主课(s)':>11} {'合并处理(s)':>11} "
+          f"{'上传(s)':>9} {'分析(s)':>9} {'缓存分析(s)':>11} {'结果(s)':>9} {'下载xlsx(s)':>11} {'下载csv(s)':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = os.path.join(tmp_dir, 'data')
+        client = None if args.no_e2e else create_client(tmp_dir)
+        for students in args.students:
+            start = time.perf_counter()
+            grade_paths, main_path = generate_dataset(
+                os.path.join(data_dir, str(students)), students, semesters=args.semesters, courses=args.courses,
+                blank_ratio=args.blank_ratio, text_ratio=args.text_ratio)
+            generate_seconds = time.perf_counter() - start
+
+            run = {
+                'students': students,
+                'file_bytes': sum(os.path.getsize(path) for path in grade_paths),
+                'generate_seconds': generate_seconds,
+                'analyzer': bench_analyzer(grade_paths, main_path, args.repeat),
+                'end_to_end': {} if client is None else bench_end_to_end(client, grade_paths, main_path),
+            }
+            results['runs'].append(run)
+
+            e2e_columns = [f"{run['end_to_end'][key]:>{width}.3f}" if run['end_to_end'] else f"{'-':>{width}}"
+                           for key, width in (('upload', 9), ('analyze', 9), ('analyze_cached', 11), ('results', 9),
+                                              ('download_xlsx', 11), ('download_csv', 10))]
+            print(f"{students:>8} {generate_seconds:>9.2f} {run['analyzer']['load_main_courses']:>11.3f} "
+                  f"{run['analyzer']['process_combined_data']:>11.3f} {' '.join(e2e_columns)}")
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# @File    : bench_serve.py
+# @Time    : 2026/10/18
+# 生产服务模式负载测试：以不同的工作进程数、线程数启动 serve.py，多个并发客户端各自使用不同的合成数据
+# 完成 上传 → 提交分析 → 轮询任务 → 获取结果 的完整流程，测量分析吞吐量，
+# 并在负载期间测量 /api/live 的响应延迟（反映分析任务进行时服务能否及时处理其他请求）
+#
+# 用法：python benchmarks/bench_serve.py [--configs 1x1 1x8 2x8] [--clients 8] [--rounds 2] [--students 1000]
+
+import argparse
+import http.cookiejar
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import generate_dataset
+
+DEFAULT_CONFIGS = ['1x1', '1x8', '2x8']
+PREFIX = '/zongce'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def encode_multipart(files):
+    """files: [(字段名, 文件路径)]，返回 (请求体, Content-Type)"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, path in files:
+        with open(path, 'rb') as f:
+            content = f.read()
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                     f'filename="{os.path.basename(path)}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Client:
+    """保持会话Cookie的HTTP客户端"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, data=None, content_type=None):
+        req = urllib.request.Request(self.base_url + PREFIX + path, data=data,
+                                     method='POST' if data is not None else 'GET')
+        if content_type:
+            req.add_header('Content-Type', content_type)
+        try:
+            with self.opener.open(req, timeout=600) as resp:
+                return resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b'{}')
+
+
+def run_session(base_url, grade_paths, main_path):
+    """一个用户的完整分析流程，返回结果行数"""
+    client = Client(base_url)
+    body, content_type = encode_multipart([('grade_files', path) for path in grade_paths] +
+                                          [('main_course_file', main_path)])
+    status, data = client.request('/upload', body, content_type)
+    if status != 200:
+        raise RuntimeError(f'上传失败: {status} {data}')
+    status, job = client.request('/analyze', b'')
+    if status != 202:
+        raise RuntimeError(f'提交分析失败: {status} {job}')
+    while job.get('status') in ('queued', 'running'):
+        time.sleep(0.1)
+        status, job = client.request(f"/jobs/{job['job_id']}")
+    if job.get('status') != 'succeeded':
+        raise RuntimeError(f'分析失败: {job}')
+    status, results = client.request('/results?limit=100')
+    if status != 200:
+        raise RuntimeError(f'获取结果失败: {status} {results}')
+    return results['total']
+
+
+def wait_ready(base_url, proc, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError('服务进程启动失败')
+        try:
+            with urllib.request.urlopen(base_url + PREFIX + '/api/ready', timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('等待服务就绪超时')
+
+
+def probe_liveness(base_url, stop, latencies):
+    """负载期间每50毫秒请求一次 /api/live，记录延迟"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + PREFIX + '/api/live', timeout=60) as resp:
+                resp.read()
+            latencies.append(time.perf_counter() - start)
+        except OSError:
+            pass
+        stop.wait(0.05)
+
+
+def bench_config(workers, threads, datasets, clients, rounds):
+    """启动服务并运行负载，返回统计结果"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, GRADE_STORAGE_SWEEP_INTERVAL='0')
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT_DIR, 'serve.py'), '--server', 'builtin',
+                                 '--host', '127.0.0.1', '--port', str(port),
+                                 '--workers', str(workers), '--threads', str(threads)],
+                                cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(base_url, proc)
+            stop = threading.Event()
+            latencies = []
+            prober = threading.Thread(target=probe_liveness, args=(base_url, stop, latencies), daemon=True)
+            errors = []
+            durations = []
+
+            def client_loop(index):
+                for r in range(rounds):
+                    grade_paths, main_path = datasets[(index * rounds + r) % len(datasets)]
+                    start = time.perf_counter()
+                    try:
+                        run_session(base_url, grade_paths, main_path)
+                    except Exception as e:
+                        errors.append(str(e))
+                        continue
+                    durations.append(time.perf_counter() - start)
+
+            prober.start()
+            start = time.perf_counter()
+            threads_ = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+            for t in threads_:
+                t.start()
+            for t in threads_:
+                t.join()
+            elapsed = time.perf_counter() - start
+            stop.set()
+            prober.join()
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else float('nan')
+    return {
+        'sessions': len(durations),
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': len(durations) / elapsed * 60,
+        'session_p50': statistics.median(durations) if durations else float('nan'),
+        'live_p50': statistics.median(latencies) * 1000 if latencies else float('nan'),
+        'live_p95': p95 * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生产服务模式负载测试')
+    parser.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS,
+                        help='工作进程数x线程数，如 1x1 1x8 2x8')
+    parser.add_argument('--clients', type=int, default=8, help='并发客户端数')
+    parser.add_argument('--rounds', type=int, default=2, help='每个客户端的分析次数')
+    parser.add_argument('--students', type=int, default=1000, help='每组合成数据的学生数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 每个会话使用不同的数据，避免命中分析结果缓存
+        datasets = [generate_dataset(os.path.join(data_dir, str(i)), args.students, seed=i)
+                    for i in range(args.clients * args.rounds)]
+        print(f"CPU核数: {os.cpu_count()}，并发客户端: {args.clients}，每个客户端 {args.rounds} 次分析，"
+              f"每组数据 {args.students} 名学生")
+        print(f"{'配置':>6} {'完成':>5} {'失败':>5} {'总耗时(s)':>10} {'分析/分钟':>10} "
+              f"{'单次中位(s)':>11} {'live中位(ms)':>12} {'live P95(ms)':>12}")
+        for config in args.configs:
+            workers, threads = (int(x) for x in config.lower().split('x'))
+            stats = bench_config(workers, threads, datasets, args.clients, args.rounds)
+            print(f"{config:>6} {stats['sessions']:>5} {len(stats['errors']):>5} {stats['elapsed']:>10.1f} "
+                  f"{stats['throughput']:>10.1f} {stats['session_p50']:>11.2f} "
+                  f"{stats['live_p50']:>12.1f} {stats['live_p95']:>12.1f}")
+            for error in stats['errors'][:3]:
+                print(f"    {error}")
+
+
+if __name__ == '__main__':
+    main()
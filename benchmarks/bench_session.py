@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# @File    : bench_session.py
+# @Time    : 2026/10/18
+# 会话存储基准：会话中记录不同数量的上传文件时，比较签名Cookie会话与服务端会话（memory、sqlite）
+# 每个请求的处理耗时（通过Flask测试客户端反复请求只读取会话的接口）及请求携带的Cookie大小
+#
+# 用法：python benchmarks/bench_session.py [--files 5 50 200] [--requests 2000]
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from flask.sessions import SecureCookieSessionInterface
+
+from session_store import (BACKEND_COOKIE, BACKEND_MEMORY, BACKEND_SQLITE, ServerSessionInterface,
+                           create_session_store)
+
+DEFAULT_FILES = [5, 50, 200]
+
+
+def session_data(files):
+    """模拟上传了files个成绩文件并完成分析后的会话内容"""
+    uploaded_files = [{
+        'type': 'grade',
+        'filename': f'计算机（拔尖）221-第{i}学期成绩_20261018_120000_{i:03d}.xlsx',
+        'path': f'uploads/1b4e28ba-2fa1-11d2-883f-0016d3cca427/计算机（拔尖）221-第{i}学期成绩_20261018_120000_{i:03d}.xlsx',
+        'sha256': f'{i:064x}',
+        'size': 1024 * (100 + i),
+    } for i in range(files)]
+    return {
+        'session_id': '1b4e28ba-2fa1-11d2-883f-0016d3cca427',
+        'uploaded_files': uploaded_files,
+        'analysis_results': {'result_id': 'f' * 64, 'result_file': '成绩分析结果_20261018_120000.xlsx',
+                             'timestamp': '20261018_120000', 'student_count': 2000},
+    }
+
+
+def bench_backend(app, interface, files, requests):
+    """返回 (每个请求的耗时（微秒）, Cookie字节数)"""
+    app.session_interface = interface
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(session_data(files))
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    for _ in range(50):
+        client.get('/zongce/jobs/none')
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get('/zongce/jobs/none')
+    elapsed = time.perf_counter() - start
+    return elapsed / requests * 1e6, len(cookie.value.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='会话存储基准')
+    parser.add_argument('--files', type=int, nargs='+', default=DEFAULT_FILES, help='会话中记录的上传文件数')
+    parser.add_argument('--requests', type=int, default=2000, help='每种情况的请求数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        os.environ['GRADE_STORAGE_SWEEP_INTERVAL'] = '0'
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            import app as app_module
+        app = app_module.app
+        interfaces = {
+            BACKEND_COOKIE: SecureCookieSessionInterface(),
+            BACKEND_MEMORY: ServerSessionInterface(create_session_store(BACKEND_MEMORY)),
+            BACKEND_SQLITE: ServerSessionInterface(
+                create_session_store(BACKEND_SQLITE, db_path=os.path.join(tmp_dir, 'sessions.sqlite3'))),
+        }
+
+        print(f"{'文件数':>6} {'后端':>8} {'每请求(us)':>11} {'Cookie(字节)':>13}")
+        for files in args.files:
+            for backend, interface in interfaces.items():
+                per_request, cookie_bytes = bench_backend(app, interface, files, args.requests)
+                print(f"{files:>6} {backend:>8} {per_request:>11.1f} {cookie_bytes:>13}")
+
+
+if __name__ == '__main__':
+    main()
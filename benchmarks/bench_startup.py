@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# @File    : bench_startup.py
+# @Time    : 2026/10/18
+# 冷启动基准：在新的Python进程中导入app，测量导入耗时（-X importtime 统计的累计耗时最多的模块）、
+# 首个轻量请求（/、/api/status、/sample）的响应时间，以及首次完成分析的时间；
+# 比较 preload（导入app前先导入pandas等模块，相当于延迟导入之前的行为）、lazy（首次使用时导入）、
+# warm（创建应用后在后台线程中导入）三种方式
+#
+# 用法：python benchmarks/bench_startup.py [--repeat 5] [--students 200] [--importtime-top 10]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import generate_dataset
+
+MODES = ['preload', 'lazy', 'warm']
+
+# 子进程中执行：各时间点均从解释器开始执行脚本时计时
+CHILD_SCRIPT = r'''
+import time
+start = time.perf_counter()
+import contextlib, json, os, sys
+sys.path.insert(0, sys.argv[1])
+mode, grade_paths, main_path = sys.argv[2], json.loads(sys.argv[3]), sys.argv[4]
+timings = {}
+with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+    if mode == 'preload':
+        from lazy import preload
+        preload()
+    import app as app_module
+timings['import'] = time.perf_counter() - start
+timings['pandas_after_import'] = 'pandas' in sys.modules
+client = app_module.app.test_client()
+for name, path in (('index', '/zongce/'), ('status', '/zongce/api/status'),
+                   ('sample', '/zongce/sample/none.xlsx')):
+    client.get(path)
+    timings[name] = time.perf_counter() - start
+timings['pandas_after_light'] = 'pandas' in sys.modules
+with contextlib.ExitStack() as stack:
+    data = {'grade_files': [(stack.enter_context(open(p, 'rb')), os.path.basename(p)) for p in grade_paths],
+            'main_course_file': (stack.enter_context(open(main_path, 'rb')), os.path.basename(main_path))}
+    client.post('/zongce/upload', data=data, content_type='multipart/form-data')
+job = client.post('/zongce/analyze').get_json()
+while job.get('status') in ('queued', 'running'):
+    time.sleep(0.01)
+    job = client.get(f"/zongce/jobs/{job['job_id']}").get_json()
+assert job['status'] == 'succeeded', job
+timings['analysis'] = time.perf_counter() - start
+print(json.dumps(timings))
+'''
+
+
+def run_child(mode, grade_paths, main_path):
+    env = dict(os.environ, GRADE_STORAGE_SWEEP_INTERVAL='0', GRADE_WARM_IMPORTS='1' if mode == 'warm' else '0')
+    with tempfile.TemporaryDirectory() as work_dir:
+        out = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, ROOT_DIR, mode, json.dumps(grade_paths), main_path],
+                             cwd=work_dir, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def importtime_top(top):
+    """-X importtime 输出中累计耗时最多的模块"""
+    env = dict(os.environ, GRADE_STORAGE_SWEEP_INTERVAL='0', GRADE_WARM_IMPORTS='0')
+    with tempfile.TemporaryDirectory() as work_dir:
+        out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import sys; sys.path.insert(0, {ROOT_DIR!r}); import app'],
+                             cwd=work_dir, env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace('import time:', '|').split('|'))
+        rows.append((int(cumulative_us), int(self_us), name))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='冷启动基准')
+    parser.add_argument('--repeat', type=int, default=5, help='每种方式启动的进程数（取中位数）')
+    parser.add_argument('--students', type=int, default=200, help='首次分析使用的合成数据学生数')
+    parser.add_argument('--importtime-top', type=int, default=10, help='列出累计导入耗时最多的模块数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        grade_paths, main_path = generate_dataset(data_dir, args.students)
+        # 预热磁盘缓存和字节码
+        run_child('lazy', grade_paths, main_path)
+
+        print(f"{'方式':>8} {'导入app(ms)':>12} {'首页(ms)':>9} {'状态(ms)':>9} {'示例(ms)':>9} "
+              f"{'首次分析(ms)':>13} {'轻量请求后已导入pandas':>22}")
+        for mode in MODES:
+            runs = [run_child(mode, grade_paths, main_path) for _ in range(args.repeat)]
+            median = {key: statistics.median(run[key] for run in runs) * 1000
+                      for key in ('import', 'index', 'status', 'sample', 'analysis')}
+            print(f"{mode:>8} {median['import']:>12.0f} {median['index']:>9.0f} {median['status']:>9.0f} "
+                  f"{median['sample']:>9.0f} {median['analysis']:>13.0f} {str(runs[0]['pandas_after_light']):>22}")
+
+    print(f"\n导入app时累计耗时最多的模块（lazy，-X importtime）：")
+    print(f"{'累计(ms)':>9} {'自身(ms)':>9}  模块")
+    for cumulative_us, self_us, name in importtime_top(args.importtime_top):
+        print(f"{cumulative_us / 1000:>9.1f} {self_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == '__main__':
+    main()
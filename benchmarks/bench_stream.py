@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# @File    : bench_stream.py
+# @Time    : 2026/10/18
+# 流式结果输出基准：对不同规模的结果表，测量/results/stream（NDJSON、CSV）的首字节时间、总耗时和
+# 请求期间的峰值内存（tracemalloc），并与一次性构建完整JSON数组的方式比较
+#
+# 用法：python benchmarks/bench_stream.py [--rows 1000 10000 50000 200000]
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import numpy as np
+
+from grade_analyzer import GradeAnalyzer
+from synthetic import generate_dataset
+
+DEFAULT_ROWS = [1000, 10000, 50000, 200000]
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽分析过程中的打印输出"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def sample_results(data_dir, students=2000):
+    """分析一组合成数据，得到结果表样本"""
+    grade_paths, main_path = generate_dataset(data_dir, students)
+    analyzer = GradeAnalyzer()
+    with quiet():
+        analyzer.load_main_courses(main_path)
+        return analyzer.process_combined_data(grade_paths)
+
+
+def scaled_results(sample, rows):
+    """将结果表样本重复扩展到rows行，学号保持唯一"""
+    df = sample.iloc[np.resize(np.arange(len(sample)), rows)].reset_index(drop=True)
+    df['学号'] = np.arange(rows) + 30000000
+    return df
+
+
+def measure(func):
+    """执行func，返回 (首字节时间, 总耗时, 峰值内存字节数, 输出字节数)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_byte, size = func(start)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte, elapsed, peak, size
+
+
+def stream_request(client, url):
+    """以非缓冲方式请求流式接口，边接收边丢弃"""
+    def run(start):
+        response = client.get(url, buffered=False)
+        first_byte = None
+        size = 0
+        for chunk in response.response:
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+        response.close()
+        return first_byte, size
+    return run
+
+
+def full_json(table):
+    """对照：一次性构建完整的JSON数组（原先/results返回全部结果的方式）"""
+    def run(start):
+        payload = json.dumps(table.df.to_dict('records'), ensure_ascii=False).encode('utf-8')
+        return time.perf_counter() - start, len(payload)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式结果输出基准')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    args = parser.parse_args()
+
+    mb = 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sample = sample_results(os.path.join(tmp_dir, 'data'))
+        os.chdir(tmp_dir)
+        with quiet():
+            import app as app_module
+        client = app_module.app.test_client()
+
+        print(f"{'行数':>8} {'方式':>12} {'首字节(ms)':>11} {'总耗时(s)':>10} {'峰值内存(MB)':>13} {'输出(MB)':>9}")
+        for rows in args.rows:
+            result_id = f'bench-{rows}'
+            table = app_module.result_store.put(result_id, scaled_results(sample, rows))
+            with client.session_transaction() as sess:
+                sess['analysis_results'] = {'result_id': result_id, 'result_file': f'{result_id}.xlsx',
+                                            'timestamp': result_id, 'student_count': rows}
+            cases = [
+                ('ndjson', stream_request(client, '/zongce/results/stream')),
+                ('csv', stream_request(client, '/zongce/results/stream?format=csv')),
+                ('full-json', full_json(table)),
+            ]
+            for name, func in cases:
+                first_byte, elapsed, peak, size = measure(func)
+                print(f"{rows:>8} {name:>12} {first_byte * 1000:>11.1f} {elapsed:>10.3f} "
+                      f"{peak / mb:>13.1f} {size / mb:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
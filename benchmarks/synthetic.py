@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# @File    : synthetic.py
+# @Time    : 2026/10/18
+# 合成测试数据：按示例文件的格式生成学期成绩文件和主要课程列表，
+# 学生数、课程数、文字成绩比例、空白比例和年级分布均可配置
+
+import os
+
+import numpy as np
+from openpyxl import Workbook
+
+# 示例文件中课程列之前的学生信息与统计列
+INFO_COLUMNS = ['学号', '姓名', '学院', '专业', '年级', '方向', '行政班', '门数', '总学分', '获得学分',
+                '不及格学分', '不及格门数', '通过率', '算术平均分', '算术平均分排名', '学分加权平均分',
+                '学分加权平均分排名', '平均学分绩点', '平均学分绩点排名']
+
+SUBJECTS = ['高等数学', '大学英语', '大学物理', '线性代数', '概率论与数理统计', '程序设计基础', '数据结构',
+            '操作系统', '计算机网络', '数据库原理', '体育', '军事理论', '思想道德与法治', '中国近现代史纲要',
+            '形势与政策', '大学生心理健康教育', '创新思维训练', '数据可视化技术', 'MATLAB程序设计', '古典诗词鉴赏']
+CREDITS = [0.5, 1.0, 1.0, 1.5, 2.0, 2.0, 2.5, 3.0, 3.5, 4.0]
+TEXT_GRADES = ['优秀', '良好', '中等', '及格', '不及格']
+# 偶尔出现的无法识别的文字成绩
+ODD_GRADES = ['缓考', '合格', ' 优秀 ']
+DEFAULT_LEVELS = (2021, 2022, 2023, 2024)
+
+
+def course_names(count, offset=0):
+    """生成count个不重复的课程名称，如 高等数学（2）"""
+    return [f"{SUBJECTS[i % len(SUBJECTS)]}（{i // len(SUBJECTS) + 1}）" for i in range(offset, offset + count)]
+
+
+def _grade_column(rng, students, blank_ratio, text_ratio):
+    """生成一门课程的成绩列：空白、数字成绩、文字成绩按比例混合"""
+    kind = rng.random(students)
+    text_cut = blank_ratio + (1 - blank_ratio) * text_ratio
+    scores = np.clip(np.round(rng.normal(80, 10, students), rng.integers(0, 2)), 0, 100)
+    texts = rng.choice(TEXT_GRADES, students, p=[0.3, 0.35, 0.2, 0.1, 0.05])
+    # 约1%的文字成绩无法识别
+    texts = np.where(rng.random(students) < 0.01, rng.choice(ODD_GRADES, students), texts)
+    column = []
+    for k, score, text in zip(kind.tolist(), scores.tolist(), texts.tolist()):
+        if k < blank_ratio:
+            column.append(None)
+        elif k < text_cut:
+            column.append(text)
+        else:
+            column.append(int(score) if score == int(score) else score)
+    return column
+
+
+def write_grade_workbook(path, courses, student_levels, blank_ratio=0.75, text_ratio=0.2, id_start=20210000, seed=0):
+    """
+    生成一个学期成绩文件
+    courses: 课程名称列表，列名为 课程名称 【学分】
+    student_levels: 各学生的年级，学号从id_start起连续编号
+    """
+    rng = np.random.default_rng(seed)
+    students = len(student_levels)
+    headers = [f"{name} 【{CREDITS[i % len(CREDITS)]}】" for i, name in enumerate(courses)]
+    columns = [_grade_column(rng, students, blank_ratio, text_ratio) for _ in courses]
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(INFO_COLUMNS + headers)
+    for i in range(students):
+        student_id = id_start + i
+        info = [student_id, f"学生{student_id}", '计算机与信息学院', '数据科学与大数据技术', student_levels[i],
+                None, f"{student_levels[i]}级{i % 8 + 1}班"] + [None] * (len(INFO_COLUMNS) - 7)
+        sheet.append(info + [column[i] for column in columns])
+    workbook.save(path)
+
+
+def write_main_course_workbook(path, main_courses):
+    """生成主要课程列表文件"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['主要课程'])
+    for name in main_courses:
+        sheet.append([name])
+    workbook.save(path)
+
+
+def generate_dataset(out_dir, students, semesters=2, courses=60, main_ratio=0.3, levels=DEFAULT_LEVELS,
+                     blank_ratio=0.75, text_ratio=0.2, seed=0):
+    """
+    生成一组分析输入：semesters个学期成绩文件（同一批学生，各学期课程部分重叠）和主要课程列表
+    返回 (成绩文件路径列表, 主要课程文件路径)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    student_levels = rng.choice(levels, students).tolist()
+    all_courses = []
+    grade_paths = []
+    for semester in range(semesters):
+        names = course_names(courses, offset=semester * courses // 2)
+        all_courses.extend(name for name in names if name not in all_courses)
+        path = os.path.join(out_dir, f'成绩_{students}_{semester + 1}.xlsx')
+        write_grade_workbook(path, names, student_levels, blank_ratio=blank_ratio, text_ratio=text_ratio,
+                             seed=seed + semester + 1)
+        grade_paths.append(path)
+
+    main_count = max(1, int(len(all_courses) * main_ratio))
+    main_courses = sorted(rng.choice(all_courses, main_count, replace=False).tolist())
+    main_path = os.path.join(out_dir, f'主要课程_{students}.xlsx')
+    write_main_course_workbook(main_path, main_courses)
+    return grade_paths, main_path
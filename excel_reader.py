@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# @File    : excel_reader.py
+# @Time    : 2026/10/18
+# Excel读取层：优先使用更快的读取后端（python-calamine），未安装时回退到pandas默认的openpyxl只读模式；
+# 先读取表头，再只加载需要的列
+
+import importlib.util
+import os
+
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+# 可通过环境变量指定读取后端：calamine / openpyxl
+EXCEL_ENGINE_ENV = 'GRADE_EXCEL_ENGINE'
+
+
+def calamine_available():
+    """是否安装了python-calamine"""
+    return importlib.util.find_spec('python_calamine') is not None
+
+
+def resolve_engine(engine=None):
+    """
+    确定Excel读取后端
+    未指定时依次使用环境变量、calamine（已安装时），否则交由pandas按文件类型选择默认后端
+    """
+    engine = engine or os.environ.get(EXCEL_ENGINE_ENV) or None
+    if engine == 'calamine' and not calamine_available():
+        print("警告：未安装python-calamine，使用默认读取后端")
+        engine = None
+    if engine is None and calamine_available():
+        engine = 'calamine'
+    return engine
+
+
+def read_header(excel_file, sheet_index=0):
+    """
+    读取第一行作为表头（与pandas一致，空行同样作为表头），返回单元格取值列表
+    后端不支持按行读取或工作表为空时返回None
+    """
+    book = excel_file.book
+    if excel_file.engine == 'openpyxl':
+        sheet = book.worksheets[sheet_index]
+        if book.read_only:
+            sheet.reset_dimensions()
+        rows = sheet.iter_rows(max_row=1, values_only=True)
+    elif excel_file.engine == 'calamine':
+        rows = book.get_sheet_by_index(sheet_index).to_python(skip_empty_area=False, nrows=1)
+    else:
+        return None
+    return next((list(row) for row in rows), None)
+
+
+def read_excel_columns(file_path, select_columns=None, engine=None):
+    """
+    读取Excel文件的第一个工作表
+    select_columns(表头) 返回需要加载的列位置列表，只解析这些列；
+    未提供select_columns或无法读取表头时加载全部列
+    """
+    with pd.ExcelFile(file_path, engine=resolve_engine(engine)) as excel_file:
+        usecols = None
+        if select_columns is not None:
+            header = read_header(excel_file)
+            if header is not None:
+                usecols = select_columns(header)
+                if not usecols:
+                    return pd.DataFrame()
+        return excel_file.parse(sheet_name=0, usecols=usecols)
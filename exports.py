@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# @File    : exports.py
+# @Time    : 2026/10/18
+# 结果导出：按需将分析结果表导出为xlsx（流式写入）、CSV（UTF-8 BOM，Excel可直接打开）或Parquet，
+# 导出文件按 (结果ID, 格式) 缓存，同一结果的同一格式只生成一次
+
+import importlib.util
+import os
+import threading
+
+from metrics import STAGE_EXPORT, StageTimer
+
+FORMAT_XLSX = 'xlsx'
+FORMAT_CSV = 'csv'
+FORMAT_PARQUET = 'parquet'
+
+# 格式 -> MIME类型
+FORMAT_MIMETYPES = {
+    FORMAT_XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    FORMAT_CSV: 'text/csv',
+    FORMAT_PARQUET: 'application/vnd.apache.parquet',
+}
+
+SHEET_NAME = '综合成绩'
+# 流式写入xlsx时每批转换的行数
+XLSX_CHUNK_ROWS = 10000
+
+
+class ExportUnavailable(Exception):
+    """导出格式需要的依赖未安装"""
+
+
+def _module_available(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def parquet_engine():
+    """可用的Parquet写入后端（pyarrow优先），未安装时返回None"""
+    for name in ('pyarrow', 'fastparquet'):
+        if _module_available(name):
+            return name
+    return None
+
+
+def available_formats():
+    """当前环境可用的导出格式"""
+    formats = [FORMAT_XLSX, FORMAT_CSV]
+    if parquet_engine() is not None:
+        formats.append(FORMAT_PARQUET)
+    return formats
+
+
+def _iter_rows(df):
+    """按批将DataFrame转换为Python取值的行，缺失值为None"""
+    for start in range(0, len(df), XLSX_CHUNK_ROWS):
+        chunk = df.iloc[start:start + XLSX_CHUNK_ROWS].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def _write_xlsx_xlsxwriter(df, path):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        sheet = workbook.add_worksheet(SHEET_NAME)
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        sheet.write_row(0, 0, [str(column) for column in df.columns], header_format)
+        for row_idx, row in enumerate(_iter_rows(df), start=1):
+            sheet.write_row(row_idx, 0, row)
+    finally:
+        workbook.close()
+
+
+def _write_xlsx_openpyxl(df, path):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    # 表头样式与pandas.to_excel一致
+    side = Side(style='thin')
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(sheet, value=str(column))
+        cell.font = Font(bold=True)
+        cell.border = Border(left=side, right=side, top=side, bottom=side)
+        cell.alignment = Alignment(horizontal='center', vertical='top')
+        header.append(cell)
+    sheet.append(header)
+    for row in _iter_rows(df):
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_xlsx(df, path):
+    """流式写入xlsx：安装了xlsxwriter时使用其constant_memory模式，否则使用openpyxl的只写模式"""
+    if _module_available('xlsxwriter'):
+        _write_xlsx_xlsxwriter(df, path)
+    else:
+        _write_xlsx_openpyxl(df, path)
+
+
+def write_csv(df, path):
+    """写入CSV（UTF-8 BOM，Excel打开中文不乱码）"""
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def write_parquet(df, path):
+    """写入Parquet，需要pyarrow或fastparquet"""
+    engine = parquet_engine()
+    if engine is None:
+        raise ExportUnavailable('服务器未安装pyarrow或fastparquet，无法导出Parquet格式')
+    # 学号等列可能混有数字和文本，统一为文本
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].map(lambda value: value if value is None or isinstance(value, str)
+                                        else str(value))
+    df.to_parquet(path, index=False, engine=engine)
+
+
+WRITERS = {
+    FORMAT_XLSX: write_xlsx,
+    FORMAT_CSV: write_csv,
+    FORMAT_PARQUET: write_parquet,
+}
+
+
+class ResultExporter:
+    """
+    分析结果导出器
+    导出文件保存为 export_dir/<结果ID>.<格式>，已存在时直接复用；
+    同一文件的并发导出请求只生成一次
+    """
+
+    def __init__(self, export_dir):
+        self.export_dir = os.path.abspath(export_dir)
+        self._locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(export_dir, exist_ok=True)
+
+    def path(self, result_id, fmt):
+        return os.path.join(self.export_dir, f"{result_id}.{fmt}")
+
+    def _file_lock(self, path):
+        with self._lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def export(self, result_id, fmt, load_frame):
+        """
+        返回结果的导出文件路径，尚未导出时调用load_frame()取得结果表并写入
+        load_frame返回None时（结果表已不存在）返回None；格式未知时抛出ValueError
+        """
+        writer = WRITERS.get(fmt)
+        if writer is None:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        path = self.path(result_id, fmt)
+        if os.path.exists(path):
+            return path
+
+        with self._file_lock(path):
+            if os.path.exists(path):
+                return path
+            df = load_frame()
+            if df is None:
+                return None
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp{os.path.splitext(path)[1]}"
+            try:
+                with StageTimer().stage(STAGE_EXPORT):
+                    writer(df, tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return path
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# @File    : file_cache.py
+# @Time    : 2026/10/18
+# 成绩文件解析结果缓存：以上传文件内容的SHA-256为键，将解析得到的长表以NumPy .npz格式保存在本地磁盘，
+# 按总大小做LRU淘汰，重复分析同一文件时跳过Excel解析
+
+import hashlib
+import json
+import os
+import threading
+import zipfile
+import zlib
+
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+CACHE_SUFFIX = '.npz'
+# 读取.npz缓存文件可能出现的错误：文件不存在或不可读、缺少数组，以及文件截断或损坏
+# （zipfile.BadZipFile、zlib.error等不是OSError或ValueError的子类）
+CACHE_READ_ERRORS = (OSError, KeyError, ValueError, EOFError, NotImplementedError, zipfile.BadZipFile, zlib.error)
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_objects(values):
+    """
+    将object数组编码为 (类型, 文本) 两个字符串数组，解码后保持原有的Python类型
+    支持int、float、str、bool和缺失值，遇到其他类型时抛出TypeError
+    """
+    kinds, texts = [], []
+    for value in values:
+        if value is None:
+            kinds.append('n')
+            texts.append('')
+        elif isinstance(value, (bool, np.bool_)):
+            kinds.append('b')
+            texts.append('1' if value else '')
+        elif isinstance(value, (int, np.integer)):
+            kinds.append('i')
+            texts.append(str(int(value)))
+        elif isinstance(value, (float, np.floating)):
+            kinds.append('f')
+            texts.append(repr(float(value)))
+        elif isinstance(value, str):
+            kinds.append('s')
+            texts.append(value)
+        else:
+            raise TypeError(f"不支持缓存的取值类型: {type(value).__name__}")
+    return np.array(kinds, dtype='U1'), np.array(texts, dtype=str)
+
+
+def decode_objects(kinds, texts):
+    """encode_objects的逆过程"""
+    decoders = {
+        'n': lambda text: None,
+        'b': bool,
+        'i': int,
+        'f': float,
+        's': str,
+    }
+    values = np.empty(len(kinds), dtype=object)
+    for i, (kind, text) in enumerate(zip(kinds.tolist(), texts.tolist())):
+        values[i] = decoders[kind](text)
+    return values
+
+
+def remove_file(path):
+    """删除文件，不存在时忽略"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ParsedFileCache:
+    """
+    解析结果磁盘缓存
+    每个缓存项为一个.npz文件，命中时更新修改时间，写入后按修改时间淘汰最久未使用的项直至总大小不超过上限
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}{CACHE_SUFFIX}")
+
+    def get(self, key):
+        """读取缓存的解析结果（DataFrame元组），未命中返回None；缓存文件损坏时删除并视为未命中"""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                parsed = self._decode(data)
+            os.utime(path)
+        except CACHE_READ_ERRORS as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"读取解析缓存失败: {e}")
+                remove_file(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return parsed
+
+    def put(self, key, frames):
+        """写入缓存，frames为DataFrame元组；包含无法编码的取值时跳过"""
+        try:
+            arrays = self._encode(frames)
+        except TypeError as e:
+            print(f"跳过解析缓存: {e}")
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        """按最近使用时间淘汰缓存项，直至总大小不超过上限"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(CACHE_SUFFIX):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        """缓存统计信息"""
+        entries = 0
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(CACHE_SUFFIX):
+                entries += 1
+                try:
+                    total += os.path.getsize(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+            }
+
+    @staticmethod
+    def _encode(frames):
+        """
+        将DataFrame元组编码为紧凑的数组：数值列保持原dtype，
+        object列按取值去重后保存编码（codes为int32，去重后的取值按类型编码）
+        """
+        arrays = {}
+        layout = []
+        for i, frame in enumerate(frames):
+            columns = []
+            for j, column in enumerate(frame.columns):
+                values = frame[column]
+                prefix = f'f{i}_c{j}'
+                if values.dtype == object:
+                    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+                    arrays[f'{prefix}_codes'] = codes.astype(np.int32)
+                    arrays[f'{prefix}_kind'], arrays[f'{prefix}_text'] = encode_objects(uniques)
+                    columns.append([column, True])
+                else:
+                    arrays[prefix] = values.to_numpy()
+                    columns.append([column, False])
+            layout.append(columns)
+        arrays['layout'] = np.array(json.dumps(layout, ensure_ascii=False))
+        return arrays
+
+    @staticmethod
+    def _decode(data):
+        """_encode的逆过程，还原为与解析结果相同的列和类型"""
+        frames = []
+        for i, columns in enumerate(json.loads(str(data['layout']))):
+            frame = {}
+            for j, (column, is_object) in enumerate(columns):
+                prefix = f'f{i}_c{j}'
+                if is_object:
+                    uniques = decode_objects(data[f'{prefix}_kind'], data[f'{prefix}_text'])
+                    frame[column] = uniques[data[f'{prefix}_codes']]
+                else:
+                    frame[column] = data[prefix]
+            frames.append(pd.DataFrame(frame))
+        return tuple(frames)
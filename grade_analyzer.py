@@ -3,77 +3,110 @@
 # @File    : grade_analyzer.py
 # @Time    : 2025/9/13
 
-import pandas as pd
-import numpy as np
+import contextlib
+import hashlib
+import io
+import json
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from excel_reader import read_excel_columns
+from file_cache import file_sha256
+from grading import DEFAULT_GRADING_SCHEME
+from identity import (canonical_student_id, canonical_student_ids, course_key, describe, display_student_id,
+                      merge_report, parse_course_header)
+from lazy import LazyModule
+from metrics import STAGE_AGGREGATE, STAGE_NORMALIZE, STAGE_READ, STAGE_SORT, StageTimer
+
+# pandas、numpy在首次使用时导入
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+
+# 处理引擎：列式向量化（默认）与原始的逐行处理
+ENGINE_VECTORIZED = 'vectorized'
+ENGINE_ROWS = 'rows'
+
+# 解析结果格式版本，解析逻辑变化时递增以使旧的解析缓存失效
+PARSE_CACHE_VERSION = 'p4'
+# 分析器版本，分析结果可能变化时递增以使旧的分析结果缓存失效
+ANALYZER_VERSION = '1.3.0'
+# 默认计入的其他课程门数
+DEFAULT_OTHER_COURSE_LIMIT = 4
+
+class MainCourseMatcher:
+    """
+    主要课程匹配器
+    将主要课程列表预编译为一个正则多选模式，课程名称包含任一主要课程名称即视为主要课程
+    （与原始实现相同，空的主要课程名称包含于任何课程名称）；每个不同的课程名称只匹配一次，结果缓存复用
+    """
+
+    def __init__(self, main_courses):
+        self.main_courses = list(main_courses)
+        patterns = sorted(set(self.main_courses), key=len, reverse=True)
+        self._pattern = re.compile('|'.join(map(re.escape, patterns))) if patterns else None
+        self._cache = {}
+
+    def is_main_course(self, course_name):
+        """判断课程是否为主要课程"""
+        flag = self._cache.get(course_name)
+        if flag is None:
+            flag = self._pattern is not None and self._pattern.search(course_name) is not None
+            self._cache[course_name] = flag
+        return flag
+
+    def classify(self, course_names):
+        """批量判断课程是否为主要课程，返回布尔数组"""
+        return np.array([self.is_main_course(name) for name in course_names], dtype=bool)
 
 class GradeAnalyzer:
     """成绩分析器类"""
     
-    def __init__(self):
+    def __init__(self, engine=ENGINE_VECTORIZED, excel_engine=None, workers=1, file_cache=None, file_hashes=None,
+                 other_course_limit=DEFAULT_OTHER_COURSE_LIMIT, grading_scheme=None):
+        """
+        engine: 处理引擎，'vectorized'（默认）或'rows'
+        excel_engine: Excel读取后端，None时自动选择（见excel_reader.resolve_engine）
+        workers: 并行解析成绩文件的进程数，1为串行，None为CPU核数（仅vectorized引擎）
+        file_cache: 成绩文件解析结果缓存（file_cache.ParsedFileCache），None为不缓存（仅vectorized引擎）
+        file_hashes: 已知的文件内容SHA-256（文件路径 -> 哈希，如上传时计算的哈希），避免重复读取文件
+        other_course_limit: 每个学生计入的其他课程门数（按成绩取最高的若干门）
+        grading_scheme: 成绩换算方案（grading.GradingScheme），None为默认方案
+        """
+        if engine not in (ENGINE_VECTORIZED, ENGINE_ROWS):
+            raise ValueError(f"未知的处理引擎: {engine}")
+        if isinstance(other_course_limit, bool) or not isinstance(other_course_limit, int) or other_course_limit < 0:
+            raise ValueError(f"其他课程门数必须为非负整数: {other_course_limit}")
         self.main_courses = []
+        self.engine = engine
+        self.excel_engine = excel_engine
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.file_cache = file_cache
+        self.file_hashes = dict(file_hashes or {})
+        self.other_course_limit = other_course_limit
+        self.grading_scheme = grading_scheme or DEFAULT_GRADING_SCHEME
+        self._matcher = MainCourseMatcher([])
+        # 最近一次处理的合并报告（见identity.merge_report）
+        self.merge_report = None
     
     def convert_grade_to_score(self, grade, level):
-        """
-        转换成绩：
-        若为0或无效成绩，返回0
-        若为优秀、良好、中等、及格、不及格，分别转换为95, 85, 75, 60, 0
-        若为数字，直接返回数字（限制在0-100之间）
-        """
-        if pd.isna(grade):
-            return 0
-        
-        if isinstance(grade, str):
-            grade = grade.strip()
-            level_grades = [[95, 85, 75, 65, 55], [90, 80, 70, 60, 50]]
-            level_id = 1 if level >= 2023 else 0
-            if grade == '优秀':
-                return level_grades[level_id][0]
-            elif grade == '良好':
-                return level_grades[level_id][1]
-            elif grade == '中等':
-                return level_grades[level_id][2]
-            elif grade == '及格':
-                return level_grades[level_id][3]
-            elif grade == '不及格':
-                return level_grades[level_id][4]
-            else:
-                # 尝试转换为数字
-                try:
-                    return float(grade)
-                except:
-                    return 0
-        
-        # 如果是数字类型
-        try:
-            score = float(grade)
-            # 限制分数在合理范围内
-            if score > 100:
-                return 0  # 超过100分的认为是无效成绩
-            return score if score > 0 else 0
-        except:
-            return 0
+        """按成绩换算方案转换成绩，无效成绩返回0（见grading.GradingScheme）"""
+        return self.grading_scheme.convert(grade, level)
 
     def extract_credits_from_course_name(self, course_name):
         """
-        从课程名称中提取学分数
+        从课程名称中提取学分数，不是有效课程时返回0（见identity.parse_course_header）
         例如：花卉栽培与环境 【1.0】 -> 1.0
         """
-        if pd.isna(course_name):
-            return 0
-        
-        # 使用正则表达式匹配【数字】格式
-        match = re.search(r'【(\d+\.?\d*)】', str(course_name))
-        if match:
-            return float(match.group(1))
-        return 0
+        parsed = parse_course_header(course_name)
+        return parsed[1] if parsed else 0
 
     def load_main_courses(self, main_course_file_path):
         """
         加载主要课程列表
         """
         try:
-            df = pd.read_excel(main_course_file_path)
+            df = read_excel_columns(main_course_file_path, self._select_main_course_column,
+                                    engine=self.excel_engine)
             if '主要课程' in df.columns:
                 self.main_courses = df['主要课程'].tolist()
             else:
@@ -88,21 +121,114 @@ class GradeAnalyzer:
             
             # 清理课程名称
             self.main_courses = [str(course).strip() for course in self.main_courses if pd.notna(course)]
+            # 只有空白的单元格清理后为空，会使所有课程都被视为主要课程，忽略
+            empty_count = self.main_courses.count('')
+            if empty_count:
+                print(f"警告：主要课程列表中有 {empty_count} 个空白单元格，已忽略")
+                self.main_courses = [course for course in self.main_courses if course]
             print(f"成功加载 {len(self.main_courses)} 门主要课程")
             
         except Exception as e:
             print(f"加载主要课程列表失败: {e}")
             self.main_courses = []
 
-    def process_combined_data(self, file_paths):
+        self._matcher = MainCourseMatcher(self.main_courses)
+
+    def fingerprint(self, file_hashes):
+        """
+        分析结果指纹：成绩文件内容哈希（按文件顺序）、规范化的主要课程列表、其他课程门数、成绩换算方案与分析器版本
+        主要课程只用于判断课程名称是否包含，去重排序后不影响结果
+        """
+        payload = json.dumps({
+            'version': ANALYZER_VERSION,
+            'grade_files': list(file_hashes),
+            'main_courses': sorted(set(self.main_courses)),
+            'other_course_limit': self.other_course_limit,
+            'grading_scheme': self.grading_scheme.key,
+        }, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def settings_fingerprint(self):
+        """
+        分析设置指纹：规范化的主要课程列表、其他课程门数、成绩换算方案与分析器版本（不含成绩文件）
+        设置相同的分析结果之间可以增量处理（见process_incremental）
+        """
+        payload = json.dumps({
+            'version': ANALYZER_VERSION,
+            'main_courses': sorted(set(self.main_courses)),
+            'other_course_limit': self.other_course_limit,
+            'grading_scheme': self.grading_scheme.key,
+        }, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def __getstate__(self):
+        # 进程池中的解析任务不使用缓存（缓存在主进程中读写）
+        state = self.__dict__.copy()
+        state['file_cache'] = None
+        return state
+
+    @staticmethod
+    def _select_main_course_column(header):
+        """从表头中选出'主要课程'列的位置"""
+        for i, col in enumerate(header):
+            if col == '主要课程':
+                return [i]
+        return []
+
+    @property
+    def main_course_matcher(self):
+        """主要课程匹配器，main_courses被直接修改时自动重建"""
+        if self._matcher.main_courses != self.main_courses:
+            self._matcher = MainCourseMatcher(self.main_courses)
+        return self._matcher
+
+    def process_combined_data(self, file_paths, progress=None, timer=None):
         """
         合并处理多个学期的数据
+        progress: 可选的进度回调，以关键字参数报告 files_parsed/total_files、students_total/students_processed
+        （仅vectorized引擎）；回调抛出的异常会中止处理
+        timer: 分阶段计时器（metrics.StageTimer），记录read、normalize、aggregate、sort各阶段耗时
+        """
+        if timer is None:
+            timer = StageTimer()
+        if self.engine == ENGINE_ROWS:
+            return self._process_combined_data_rows(file_paths, timer)
+        return self._process_combined_data_vectorized(file_paths, progress, timer)
+
+    def _process_combined_data_rows(self, file_paths, timer):
+        """
+        逐行处理多个学期的数据（原始实现，保留用于结果比对）
+        读取与规范化在逐文件循环中交替进行，整体计入read阶段
         """
         print(f"\n=== 合并处理 {len(file_paths)} 个文件的数据 ===")
         
-        # 存储所有学生的课程数据
+        # 存储所有学生的课程数据（以规范学号为键）
         all_students_data = {}
+        
+        with timer.stage(STAGE_READ):
+            file_tables = self._read_rows(file_paths, all_students_data)
+            self._report_merge(file_tables)
+        
+        with timer.stage(STAGE_AGGREGATE):
+            results = self._aggregate_rows(all_students_data)
+        
+        print(f"处理完成，共{len(results)}名学生")
+        
+        # 创建DataFrame并按照学分加权平均分降序排列
+        with timer.stage(STAGE_SORT):
+            df_results = pd.DataFrame(results)
+            if not df_results.empty:
+                df_results = df_results.sort_values(by='学分加权平均分', ascending=False)
+        
+        return df_results
+
+    def _read_rows(self, file_paths, all_students_data):
+        """
+        逐行读取各文件的成绩，存入all_students_data
+        返回各文件的 (文件序号, 学生记录, 课程列) 列表，用于生成合并报告（见identity.merge_report）
+        """
         file_idx = 0
+        file_tables = []
         
         for file_path in file_paths:
             print(f"读取文件: {file_path}")
@@ -138,56 +264,65 @@ class GradeAnalyzer:
                         student_name_col = col
                         break
                 
-                # 获取课程列（包含【】的列）
-                course_columns = []
+                # 获取课程列（学分大于0的列），课程名称、学分和课程键按列解析一次
+                course_columns = {}
                 for col in df.columns:
-                    if '【' in str(col) and '】' in str(col):
-                        # 提取学分确保是有效课程
-                        credits = self.extract_credits_from_course_name(col)
-                        if credits > 0:
-                            course_columns.append(col)
+                    parsed = parse_course_header(col)
+                    if parsed:
+                        course_name, credits = parsed
+                        course_columns[col] = (course_name, credits, course_key(course_name))
                 
                 print(f"找到有效课程: {len(course_columns)}门")
                 
+                file_students = {'student_id': [], 'key': [], 'name': [], 'level': []}
+                file_courses = {
+                    'course': [info[0] for info in course_columns.values()],
+                    'credits': [info[1] for info in course_columns.values()],
+                    'key': [info[2] for info in course_columns.values()],
+                }
+                file_tables.append((file_idx, file_students, file_courses))
+                
                 # 处理每个学生的数据
                 for index, row in df.iterrows():
                     student_id = row[student_id_col]
                     
-                    # 跳过无效的学号
-                    if pd.isna(student_id):
+                    # 跳过无效的学号，不同写法的同一学号合并为同一学生
+                    key = canonical_student_id(student_id)
+                    if key is None:
                         continue
 
                     level = row[level_col] if level_col and not pd.isna(row[level_col]) else '未知'
                     level = int(str(level).strip())
                     
+                    name = row[student_name_col] if student_name_col else np.nan
+                    file_students['student_id'].append(student_id)
+                    file_students['key'].append(key)
+                    file_students['name'].append(name)
+                    file_students['level'].append(level)
+                    
                     # 初始化学生数据
-                    if student_id not in all_students_data:
-                        student_name = row[student_name_col] if student_name_col and not pd.isna(row[student_name_col]) else f"学生{student_id}"
-                        all_students_data[student_id] = {
+                    if key not in all_students_data:
+                        student_id = display_student_id(student_id)
+                        student_name = name if not pd.isna(name) else f"学生{student_id}"
+                        all_students_data[key] = {
+                            'student_id': student_id,
                             'name': student_name,
                             'level': level,
                             'courses': {}
                         }
                     
                     # 收集该学生的课程成绩
-                    for course_col in course_columns:
-                        # 提取课程学分
-                        credits = self.extract_credits_from_course_name(course_col)
-                        if credits == 0:
-                            continue
-                            
+                    for course_col, (course_name, credits, course_id) in course_columns.items():
                         # 获取成绩
                         grade = row[course_col]
                         score = self.convert_grade_to_score(grade, level)
                         
                         # 成绩为0或没有成绩说明该学生未学习该课程
                         if score > 0:
-                            course_name = str(course_col).split('【')[0].strip()
-                            
-                            # 为每个课程创建唯一的标识符，包含原始列名以区分不同学期的同名课程
-                            unique_course_key = f"{course_name}_{file_idx}"
+                            # 为每个课程创建唯一的标识符，包含文件序号以区分不同学期的同名课程
+                            unique_course_key = f"{course_id}_{file_idx}"
                             
-                            all_students_data[student_id]['courses'][unique_course_key] = {
+                            all_students_data[key]['courses'][unique_course_key] = {
                                 'name': course_name,  # 保存原始课程名称用于分类
                                 'score': score,
                                 'credits': credits,
@@ -198,9 +333,14 @@ class GradeAnalyzer:
                 print(f"处理文件 {file_path} 时出错: {e}")
                 continue
         
-        # 计算每个学生的综合成绩
+        return file_tables
+
+    def _aggregate_rows(self, all_students_data):
+        """逐个学生计算综合成绩"""
+        matcher = self.main_course_matcher
         results = []
-        for student_id, student_data in all_students_data.items():
+        for student_data in all_students_data.values():
+            student_id = student_data['student_id']
             total_weighted_score = 0
             total_credits = 0
             course_count = 0
@@ -210,7 +350,7 @@ class GradeAnalyzer:
             major_courses = []  # 主要课程
             other_courses = []  # 其他课程
             
-            for course_key, course_data in student_data['courses'].items():
+            for course_data in student_data['courses'].values():
                 course_info = {
                     'name': course_data['name'],  # 使用保存的原始课程名称
                     'score': course_data['score'],
@@ -219,11 +359,7 @@ class GradeAnalyzer:
                 }
                 
                 # 判断是否为主要课程（使用原始课程名称进行判断）
-                is_major_course = False
-                for major_course in self.main_courses:
-                    if major_course in course_data['name']:
-                        is_major_course = True
-                        break
+                is_major_course = matcher.is_main_course(course_data['name'])
                 
                 if is_major_course:
                     major_courses.append(course_info)
@@ -237,11 +373,12 @@ class GradeAnalyzer:
                 course_count += 1
                 valid_courses.append(f"{course['name']}({course['score']}分,{course['credits']}学分)[主要课程]")
             
-            # 对其他课程按成绩排序，只取前4门
+            # 对其他课程按成绩排序，只取前other_course_limit门
+            limit = self.other_course_limit
             other_courses.sort(key=lambda x: x['score'], reverse=True)
-            if len(other_courses) > 4:
-                print(f"注意：学生 {student_id} 的其他课程超过4门，仅取成绩最高的4门")
-                selected_other_courses = other_courses[:4]  # 只取成绩最高的4门
+            if len(other_courses) > limit:
+                print(f"注意：学生 {student_id} 的其他课程超过{limit}门，仅取成绩最高的{limit}门")
+                selected_other_courses = other_courses[:limit]  # 只取成绩最高的几门
             else:
                 selected_other_courses = other_courses
 
@@ -264,29 +401,565 @@ class GradeAnalyzer:
                 '课程详情': "; ".join(valid_courses)
             })
         
-        print(f"处理完成，共{len(results)}名学生")
-        
-        # 创建DataFrame并按照学分加权平均分降序排列
-        df_results = pd.DataFrame(results)
-        if not df_results.empty:
-            df_results = df_results.sort_values(by='学分加权平均分', ascending=False)
-        
+        return results
+
+    @staticmethod
+    def _find_column(columns, keyword):
+        """返回第一个列名包含关键字的列，找不到时返回None"""
+        for col in columns:
+            if keyword in str(col):
+                return col
+        return None
+
+    def _get_course_columns(self, columns):
+        """
+        获取课程列（列名含【学分】且学分大于0的列），每列只解析一次（见identity.parse_course_header）
+        返回 (课程列, 课程名称, 学分) 三个列表
+        """
+        course_columns, course_names, course_credits = [], [], []
+        for col in columns:
+            parsed = parse_course_header(col)
+            if parsed:
+                course_columns.append(col)
+                course_names.append(parsed[0])
+                course_credits.append(parsed[1])
+        return course_columns, course_names, course_credits
+
+    def _select_grade_columns(self, header):
+        """
+        根据表头选出需要加载的列位置：学号、年级、姓名列及有效课程列
+        找不到学号列时不加载任何列
+        """
+        positions = []
+        for keyword in ('学号', '年级', '姓名'):
+            for i, col in enumerate(header):
+                if keyword in str(col):
+                    positions.append(i)
+                    break
+            else:
+                if keyword == '学号':
+                    return []
+        for i, col in enumerate(header):
+            if parse_course_header(col):
+                positions.append(i)
+        return sorted(set(positions))
+
+    @staticmethod
+    def _parse_level(level):
+        """解析年级，与逐行处理保持一致：缺失时按'未知'处理（会抛出异常）"""
+        if pd.isna(level):
+            level = '未知'
+        return int(str(level).strip())
+
+    def _parse_grade_file(self, file_path):
+        """
+        以列式方式解析单个成绩文件
+        返回 (学生表, 课程表, 成绩长表, 错误信息)：学生表每行对应一条有效学号记录（含原始学号和规范学号key），
+        课程表每行对应一个有效课程列（含课程键key），学号和课程名称在此规范化一次，合并时直接按规范键连接；
+        成绩长表每行对应一个成绩大于0的单元格（按行优先顺序排列，以行号和课程表位置引用学生和课程），
+        文件中途出错时错误信息非空
+        """
+        df = read_excel_columns(file_path, self._select_grade_columns, engine=self.excel_engine)
+        print(f"数据形状: {df.shape}")
+
+        student_id_col = self._find_column(df.columns, '学号')
+        if student_id_col is None:
+            print(f"错误：在文件 {file_path} 中找不到学号列")
+            return None
+        level_col = self._find_column(df.columns, '年级')
+        student_name_col = self._find_column(df.columns, '姓名')
+
+        course_columns, course_names, course_credits = self._get_course_columns(df.columns)
+        print(f"找到有效课程: {len(course_columns)}门")
+
+        # 规范学号：每个不同的取值计算一次，缺失或空白的学号无效
+        student_keys = canonical_student_ids(df[student_id_col].astype(object).to_numpy())
+        rows = np.flatnonzero(pd.notna(student_keys))
+
+        # 年级按取值去重后解析；codes为-1（缺失）时对应末尾的NaN
+        if level_col:
+            raw_levels = df[level_col].astype(object).to_numpy()[rows]
+        else:
+            raw_levels = np.full(len(rows), np.nan, dtype=object)
+        level_codes, level_uniques = pd.factorize(raw_levels)
+        level_values = []
+        level_errors = []
+        for value in list(level_uniques) + [np.nan]:
+            try:
+                level_values.append(self._parse_level(value))
+                level_errors.append(None)
+            except Exception as e:
+                level_values.append(0)
+                level_errors.append(e)
+
+        # 与逐行处理一致：遇到无法解析的年级时，保留之前的行并中止该文件
+        error = None
+        bad_levels = np.array([e is not None for e in level_errors])[level_codes]
+        if bad_levels.any():
+            first_bad = int(np.argmax(bad_levels))
+            error = level_errors[level_codes[first_bad]]
+            rows = rows[:first_bad]
+            level_codes = level_codes[:first_bad]
+
+        students = pd.DataFrame({
+            'student_id': df[student_id_col].astype(object).to_numpy()[rows],
+            'key': student_keys[rows],
+            'name': (df[student_name_col].astype(object).to_numpy()[rows]
+                     if student_name_col else np.full(len(rows), np.nan, dtype=object)),
+            'level': np.array(level_values, dtype=np.int64)[level_codes],
+        })
+
+        courses = pd.DataFrame({
+            'original_name': np.array([str(col) for col in course_columns], dtype=object),
+            'course': np.array(course_names, dtype=object),
+            'credits': np.array(course_credits, dtype=float),
+            'key': np.array([course_key(name) for name in course_names], dtype=object),
+        })
+
+        if course_columns and len(rows):
+            # 宽表按行优先展开为长表，成绩按 (取值, 年级) 查表转换，表末行对应缺失值（编码-1）；
+            # score_int记录转换结果是否为整数（文字成绩），用于还原成绩文本
+            cells = df[course_columns].to_numpy(dtype=object)[rows].ravel()
+            grade_codes, grade_uniques = pd.factorize(cells)
+            valid_levels = [level if e is None else None for level, e in zip(level_values, level_errors)]
+            score_table, int_table = self.grading_scheme.score_table(list(grade_uniques) + [None], valid_levels)
+
+            cell_levels = np.repeat(level_codes, len(course_columns))
+            scores = score_table[grade_codes, cell_levels]
+            keep = np.flatnonzero(scores > 0)
+            row_pos, col_pos = np.divmod(keep, len(course_columns))
+            records = pd.DataFrame({
+                'row': row_pos.astype(np.int32),
+                'column': col_pos.astype(np.int32),
+                'score': scores[keep],
+                'score_int': int_table[grade_codes[keep], cell_levels[keep]],
+            })
+        else:
+            records = pd.DataFrame({
+                'row': np.array([], dtype=np.int32),
+                'column': np.array([], dtype=np.int32),
+                'score': np.array([], dtype=float),
+                'score_int': np.array([], dtype=bool),
+            })
+
+        if error is not None:
+            error = str(error)
+            print(f"处理文件 {file_path} 时出错: {error}")
+
+        return students, courses, records, error
+
+    def _parse_grade_file_safely(self, file_path):
+        """解析单个成绩文件，出错时打印错误并返回None"""
+        print(f"读取文件: {file_path}")
+        try:
+            return self._parse_grade_file(file_path)
+        except Exception as e:
+            print(f"处理文件 {file_path} 时出错: {e}")
+            return None
+
+    def file_hash(self, file_path):
+        """文件内容的SHA-256，优先使用已知的哈希"""
+        file_hash = self.file_hashes.get(file_path)
+        if file_hash is None:
+            file_hash = self.file_hashes[file_path] = file_sha256(file_path)
+        return file_hash
+
+    def _cache_key(self, file_path):
+        """解析缓存键：文件内容的SHA-256加解析格式版本和成绩换算方案；未配置缓存或文件无法读取时返回None"""
+        if self.file_cache is None:
+            return None
+        try:
+            return self._hash_cache_key(self.file_hash(file_path))
+        except OSError:
+            return None
+
+    def _hash_cache_key(self, file_hash):
+        return f"{file_hash}-{PARSE_CACHE_VERSION}-{self.grading_scheme.key}"
+
+    def _parse_grade_files(self, file_paths, progress=None):
+        """
+        按文件顺序返回各文件的解析结果 (学生表, 课程表, 成绩长表)，无法解析的文件为None
+        配置了解析缓存时先按文件内容查找缓存，只解析未命中的文件；
+        workers大于1且有多个待解析文件时在进程池中并行解析，子进程输出按文件顺序回放，结果与串行一致
+        """
+        if progress:
+            progress(files_parsed=0, total_files=len(file_paths))
+
+        cache_keys = [self._cache_key(file_path) for file_path in file_paths]
+        cached = [self.file_cache.get(key) if key else None for key in cache_keys]
+        pending = [file_path for file_path, hit in zip(file_paths, cached) if hit is None]
+
+        outputs = None
+        workers = min(self.workers, len(pending))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outputs = iter(list(executor.map(_parse_grade_file_in_worker, [self] * len(pending), pending)))
+
+        parsed_files = []
+        for file_path, key, hit in zip(file_paths, cache_keys, cached):
+            if hit is not None:
+                print(f"读取文件: {file_path}")
+                print("使用缓存的解析结果")
+                parsed_files.append(hit)
+                if progress:
+                    progress(files_parsed=len(parsed_files), total_files=len(file_paths))
+                continue
+
+            if outputs is not None:
+                log, parsed = next(outputs)
+                print(log, end='')
+            else:
+                parsed = self._parse_grade_file_safely(file_path)
+
+            if parsed is not None:
+                *parsed, error = parsed
+                parsed = tuple(parsed)
+                # 中途出错的文件不缓存，以便每次分析都能报告错误
+                if key and error is None:
+                    self.file_cache.put(key, parsed)
+            parsed_files.append(parsed)
+            if progress:
+                progress(files_parsed=len(parsed_files), total_files=len(file_paths))
+        return parsed_files
+
+    def _merge_partials(self, partials):
+        """
+        合并各文件的解析结果为紧凑的中间表示，返回 (学生, 课程表, 成绩记录)
+        课程按原始列名统一编号，课程表保存课程名称、学分和是否为主要课程；
+        成绩记录为定长类型的平行列：学生编号、课程编号、文件序号、成绩及成绩是否为整数，
+        按学生、首次出现顺序排列
+        学生按规范学号一次哈希连接（pd.factorize）、按首次出现顺序编号，学号、姓名和年级取首次出现的记录；
+        同一文件内的同一课程（课程键相同）以 {course_key}_{file_idx} 为键去重（保留最后一次成绩，位置取首次出现）
+        """
+        course_index = {}
+        course_table = {'course': [], 'credits': [], 'original_name': [], 'key': []}
+        course_parts, file_parts, score_parts, int_parts = [], [], [], []
+
+        # 所有文件的学生记录连接后按规范学号编号，编号即首次出现的顺序
+        student_keys = np.concatenate([students['key'].to_numpy(dtype=object) for _, students, _, _ in partials])
+        row_codes, unique_keys = pd.factorize(student_keys)
+        # 编号按首次出现递增，编号超过此前最大编号的位置即各学生首次出现的位置
+        running_max = np.maximum.accumulate(row_codes)
+        first = np.flatnonzero(np.r_[True, running_max[1:] > running_max[:-1]]) if len(row_codes) else row_codes
+        raw_ids = np.concatenate([students['student_id'].to_numpy(dtype=object) for _, students, _, _ in partials])
+        raw_names = np.concatenate([students['name'].to_numpy(dtype=object) for _, students, _, _ in partials])
+        raw_levels = np.concatenate([students['level'].to_numpy(dtype=np.int64) for _, students, _, _ in partials])
+        student_ids = [display_student_id(student_id) for student_id in raw_ids[first].tolist()]
+        student_names = [name if not pd.isna(name) else f"学生{student_id}"
+                         for student_id, name in zip(student_ids, raw_names[first].tolist())]
+        student_levels = raw_levels[first].tolist()
+
+        sidx_parts = []
+        offset = 0
+        for file_idx, students, courses, records in partials:
+            row_sidx = row_codes[offset:offset + len(students)]
+            offset += len(students)
+
+            column_cidx = np.empty(len(courses), dtype=np.int32)
+            for i, (original_name, course, credits, key) in enumerate(zip(
+                    courses['original_name'], courses['course'], courses['credits'], courses['key'])):
+                cidx = course_index.get(original_name)
+                if cidx is None:
+                    cidx = len(course_table['course'])
+                    course_index[original_name] = cidx
+                    course_table['course'].append(course)
+                    course_table['credits'].append(float(credits))
+                    course_table['original_name'].append(original_name)
+                    course_table['key'].append(key)
+                column_cidx[i] = cidx
+
+            sidx_parts.append(row_sidx[records['row'].to_numpy()].astype(np.int32))
+            course_parts.append(column_cidx[records['column'].to_numpy()])
+            file_parts.append(np.full(len(records), file_idx, dtype=np.int32))
+            score_parts.append(records['score'].to_numpy(dtype=np.float64))
+            int_parts.append(records['score_int'].to_numpy(dtype=bool))
+
+        courses = pd.DataFrame({
+            'course': np.array(course_table['course'], dtype=object),
+            'credits': np.array(course_table['credits'], dtype=np.float64),
+            'original_name': np.array(course_table['original_name'], dtype=object),
+        })
+        courses['is_major'] = self.main_course_matcher.classify(courses['course'])
+
+        sidx = np.concatenate(sidx_parts)
+        course = np.concatenate(course_parts)
+        file_idx = np.concatenate(file_parts)
+
+        # 去重键 (学生, 文件, 课程键)：保留每组最后一条记录，按学生及该组首次出现的位置排列
+        key_codes, key_uniques = pd.factorize(np.array(course_table['key'], dtype=object))
+        n_files = int(file_idx.max()) + 1 if len(file_idx) else 1
+        keys = (sidx.astype(np.int64) * n_files + file_idx) * max(len(key_uniques), 1) + key_codes[course]
+        _, first = np.unique(keys, return_index=True)
+        _, last_reversed = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last_reversed
+        keep = last[np.lexsort((first, sidx[first]))]
+
+        records = pd.DataFrame({
+            'sidx': sidx[keep],
+            'course': course[keep],
+            'file_idx': file_idx[keep],
+            'score': np.concatenate(score_parts)[keep],
+            'score_int': np.concatenate(int_parts)[keep],
+        })
+        students = {
+            'student_id': student_ids,
+            'key': list(unique_keys),
+            'name': student_names,
+            'level': student_levels,
+        }
+        return students, courses, records
+
+    def _report_merge(self, files):
+        """生成合并报告（见identity.merge_report）并打印需要说明的情况，保存在merge_report属性中"""
+        self.merge_report = merge_report(files)
+        for line in describe(self.merge_report):
+            print(f"合并提示：{line}")
+        return self.merge_report
+
+    @staticmethod
+    def _rank_within_groups(sorted_groups):
+        """已按组排列的数组中，每个元素在所属组内的序号"""
+        n = len(sorted_groups)
+        starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]) if n else np.array([], int)
+        return np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+
+    @staticmethod
+    def _score_text_codes(scores, score_int):
+        """
+        成绩文本编码，返回 (各记录的文本编号, 文本列表)
+        文本与str(成绩)一致：由文字成绩转换的整数不带小数
+        """
+        value_codes, values = pd.factorize(scores)
+        codes, keys = pd.factorize(value_codes * 2 + score_int)
+        values = values.tolist()
+        texts = [str(int(values[key // 2])) if key % 2 else str(float(values[key // 2])) for key in keys.tolist()]
+        return codes, texts
+
+    def _aggregate_results(self, students, courses, records):
+        """
+        按学生分组汇总：主要课程全部计入，其他课程取成绩最高的other_course_limit门，
+        按计入顺序累加学分与加权成绩，生成课程详情
+        """
+        n_students = len(students['student_id'])
+        n_records = len(records)
+        limit = self.other_course_limit
+        sidx = records['sidx'].to_numpy()
+        course = records['course'].to_numpy()
+        score = records['score'].to_numpy()
+        is_major = courses['is_major'].to_numpy()[course]
+
+        # 其他课程按 (学生, 成绩降序) 稳定排序，成绩相同保持原有顺序；
+        # 合并后的记录已按学生、首次出现顺序排列，成绩按取值编号后可用单个整数键排序
+        others = np.flatnonzero(~is_major)
+        score_codes, score_values = pd.factorize(score[others])
+        score_rank = np.argsort(np.argsort(-score_values, kind='stable'))[score_codes]
+        others = others[np.argsort(sidx[others].astype(np.int64) * max(len(score_values), 1) + score_rank,
+                                   kind='stable')]
+        other_rank = self._rank_within_groups(sidx[others])
+
+        other_counts = np.bincount(sidx[others], minlength=n_students)
+        for student in np.flatnonzero(other_counts > limit):
+            print(f"注意：学生 {students['student_id'][student]} 的其他课程超过{limit}门，仅取成绩最高的{limit}门")
+
+        # 每个学生先计入全部主要课程（原有顺序），再计入成绩最高的其他课程
+        majors = np.flatnonzero(is_major)
+        top = other_rank < limit
+        rows = np.concatenate([majors, others[top]])
+        group = np.concatenate([np.zeros(len(majors), dtype=np.int64), np.ones(int(top.sum()), dtype=np.int64)])
+        rank = np.concatenate([majors, other_rank[top]])
+        order = np.argsort((sidx[rows].astype(np.int64) * 2 + group) * max(n_records, 1) + rank, kind='stable')
+        rows, group = rows[order], group[order]
+        sidx, course = sidx[rows], course[rows]
+        position = self._rank_within_groups(sidx)
+
+        # 按计入顺序逐位累加，保证浮点求和顺序与逐行处理完全一致
+        credits = courses['credits'].to_numpy()
+        credit_values = credits[course]
+        weighted_values = score[rows] * credit_values
+        total_weighted = np.zeros(n_students)
+        total_credits = np.zeros(n_students)
+        by_position = np.argsort(position, kind='stable')
+        position_bounds = np.r_[0, np.cumsum(np.bincount(position))].tolist() if len(position) else [0]
+        for start, end in zip(position_bounds[:-1], position_bounds[1:]):
+            at_k = by_position[start:end]
+            total_weighted[sidx[at_k]] += weighted_values[at_k]
+            total_credits[sidx[at_k]] += credit_values[at_k]
+        course_count = np.bincount(sidx, minlength=n_students).tolist()
+
+        # 课程详情：相同的 (课程, 类别, 成绩文本) 条目只生成一次，各学生的条目连续排列，按区间连接
+        text_codes, texts = self._score_text_codes(score[rows], records['score_int'].to_numpy()[rows])
+        entry_codes, entry_keys = pd.factorize((course * 2 + group) * max(len(texts), 1) + text_codes)
+        names = courses['course'].tolist()
+        credit_texts = [str(credit) for credit in credits.tolist()]
+        entries = []
+        for key in entry_keys.tolist():
+            course_group, text_code = divmod(key, max(len(texts), 1))
+            course_code, is_other = divmod(course_group, 2)
+            entries.append(f"{names[course_code]}({texts[text_code]}分,{credit_texts[course_code]}学分)"
+                           f"{'[其他课程]' if is_other else '[主要课程]'}")
+        pieces = np.array(entries + [''], dtype=object)[entry_codes].tolist()
+        bounds = np.r_[0, np.cumsum(course_count)].tolist()
+        details = ['; '.join(pieces[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+        return pd.DataFrame({
+            '学号': students['student_id'],
+            '姓名': students['name'],
+            '年级': students['level'],
+            '修读课程数': course_count,
+            '总学分': [c if n else 0 for c, n in zip(total_credits.tolist(), course_count)],
+            '学分加权平均分': [round(w / c, 2) if n else 0
+                         for w, c, n in zip(total_weighted.tolist(), total_credits.tolist(), course_count)],
+            '课程详情': details,
+        })
+
+    @staticmethod
+    def _select_students(students, courses, records, student_ids):
+        """单个文件的解析结果中只保留student_ids（规范学号）中的学生及其成绩记录"""
+        rows = np.flatnonzero(students['key'].isin(student_ids).to_numpy())
+        row_map = np.full(len(students), -1, dtype=np.int64)
+        row_map[rows] = np.arange(len(rows))
+        record_rows = row_map[records['row'].to_numpy()]
+        keep = record_rows >= 0
+        records = records[keep].reset_index(drop=True)
+        records['row'] = record_rows[keep].astype(records['row'].dtype)
+        return students.iloc[rows].reset_index(drop=True), courses, records
+
+    def process_incremental(self, file_paths, base_hashes, base_results, progress=None, timer=None):
+        """
+        增量处理：base_results为按顺序分析成绩文件base_hashes（内容哈希）得到的结果，分析设置相同
+        （见settings_fingerprint）；只重新汇总出现在新增、删除或替换的文件中的学生，
+        其余学生沿用base_results中的结果，输出与process_combined_data完全一致
+        未配置解析缓存、删除的文件不在缓存中、保留的文件顺序改变等无法增量处理的情况返回None
+        """
+        if self.engine != ENGINE_VECTORIZED or self.file_cache is None or base_results is None or base_results.empty:
+            return None
+        if timer is None:
+            timer = StageTimer()
+        try:
+            hashes = [self.file_hash(file_path) for file_path in file_paths]
+        except OSError:
+            return None
+        base_set, hash_set = set(base_hashes), set(hashes)
+        if len(hash_set) != len(hashes) or len(base_set) != len(base_hashes):
+            return None
+        # 保留的文件相对顺序不变时，其余学生的课程顺序及结果才保持不变
+        if [h for h in hashes if h in base_set] != [h for h in base_hashes if h in hash_set]:
+            return None
+        removed = [self.file_cache.get(self._hash_cache_key(h)) for h in base_hashes if h not in hash_set]
+        if any(parsed is None for parsed in removed):
+            return None
+
+        added = sum(1 for h in hashes if h not in base_set)
+        print(f"\n=== 增量处理 {len(file_paths)} 个文件的数据（新增 {added} 个，移除 {len(removed)} 个）===")
+        with timer.stage(STAGE_READ):
+            parsed_files = self._parse_grade_files(file_paths, progress)
+
+        with timer.stage(STAGE_NORMALIZE):
+            # 合并报告覆盖全部文件，与完整处理一致
+            self._report_merge([(file_idx, parsed[0], parsed[1])
+                                for file_idx, parsed in enumerate(parsed_files, start=1) if parsed is not None])
+            affected = set()
+            for file_hash, parsed in zip(hashes, parsed_files):
+                if file_hash not in base_set and parsed is not None:
+                    affected.update(parsed[0]['key'])
+            for parsed in removed:
+                affected.update(parsed[0]['key'])
+            # 全部学生按规范学号首次出现的顺序排列（与完整处理的合并顺序一致）
+            order = list(dict.fromkeys(key for parsed in parsed_files if parsed is not None
+                                       for key in parsed[0]['key']))
+            partials = [(file_idx, *self._select_students(*parsed, affected))
+                        for file_idx, parsed in enumerate(parsed_files, start=1) if parsed is not None]
+            partials = [partial for partial in partials if len(partial[1])]
+            if partials:
+                students, courses, records = self._merge_partials(partials)
+            else:
+                students, courses, records = {'student_id': []}, None, None
+        if progress:
+            progress(students_total=len(order), students_processed=0)
+
+        with timer.stage(STAGE_AGGREGATE):
+            updated = self._aggregate_results(students, courses, records) if students['student_id'] else None
+            base_keys = canonical_student_ids(base_results['学号'].to_numpy(dtype=object))
+            kept = ~pd.Series(base_keys).isin(affected).to_numpy()
+            df_results = pd.concat([base_results[kept], updated]) if updated is not None else base_results[kept]
+            result_keys = np.concatenate([base_keys[kept], students['key']]) if updated is not None else base_keys[kept]
+            df_results = df_results.set_axis(pd.Index(result_keys))
+            if len(df_results) != len(order) or not df_results.index.is_unique:
+                # 已有结果与保留的文件不一致
+                return None
+            try:
+                # 移除文件后学号列可能不再混有文本，类型与完整处理保持一致
+                df_results = df_results.loc[order].reset_index(drop=True).infer_objects()
+            except KeyError:
+                return None
+        if progress:
+            progress(students_processed=len(df_results))
+        print(f"处理完成，共{len(df_results)}名学生，其中重新汇总{len(students['student_id'])}名")
+
+        with timer.stage(STAGE_SORT):
+            if not df_results.empty:
+                df_results = df_results.sort_values(by='学分加权平均分', ascending=False)
+
         return df_results
-    
+
+    def _process_combined_data_vectorized(self, file_paths, progress, timer):
+        """
+        列式处理多个学期的数据，输出与逐行处理完全一致
+        """
+        print(f"\n=== 合并处理 {len(file_paths)} 个文件的数据 ===")
+
+        with timer.stage(STAGE_READ):
+            parsed_files = self._parse_grade_files(file_paths, progress)
+        return self.process_parsed(parsed_files, progress, timer)
+
+    def process_parsed(self, parsed_files, progress=None, timer=None):
+        """
+        合并处理已解析的成绩文件（_parse_grade_files的返回值，按文件顺序），供多个分析共享同一批解析结果
+        解析结果与主要课程列表无关，可用于不同主要课程列表的分析
+        """
+        if timer is None:
+            timer = StageTimer()
+        partials = []
+        for file_idx, parsed in enumerate(parsed_files, start=1):
+            if parsed is not None:
+                partials.append((file_idx, *parsed))
+
+        with timer.stage(STAGE_NORMALIZE):
+            self._report_merge([partial[:3] for partial in partials])
+            if partials:
+                students, courses, records = self._merge_partials(partials)
+            else:
+                students, courses, records = {'student_id': []}, None, None
+        if progress:
+            progress(students_total=len(students['student_id']), students_processed=0)
+
+        with timer.stage(STAGE_AGGREGATE):
+            if students['student_id']:
+                df_results = self._aggregate_results(students, courses, records)
+            else:
+                df_results = pd.DataFrame([])
+        if progress:
+            progress(students_processed=len(df_results))
+        print(f"处理完成，共{len(df_results)}名学生")
+
+        # 按照学分加权平均分降序排列
+        with timer.stage(STAGE_SORT):
+            if not df_results.empty:
+                df_results = df_results.sort_values(by='学分加权平均分', ascending=False)
+
+        return df_results
+
+
+def _parse_grade_file_in_worker(analyzer, file_path):
+    """进程池任务：解析单个成绩文件并捕获输出，由主进程按文件顺序打印"""
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        parsed = analyzer._parse_grade_file_safely(file_path)
+    return buffer.getvalue(), parsed
+
 
 if __name__ == "__main__":
-    # 示例用法
-    data_dir = "data"
-    main_course_files = ["主要课程列表-计算机拔尖221.xlsx", "主要课程列表-数据科学231.xlsx"]
-    data_files = [["计算机（拔尖）221-1.xlsx", "计算机（拔尖）221-2.xlsx"],
-                  ["数据科学231-1.xlsx", "数据科学231-2.xlsx"]]
-    test_case = 0  # 选择测试用例索引
-    main_course_file = f"{data_dir}\\{main_course_files[test_case]}"
-    analyzer = GradeAnalyzer()
-    analyzer.load_main_courses(main_course_file)
-    data_files = [f"{data_dir}\\{f}" for f in data_files[test_case]]
-    combined_df = analyzer.process_combined_data(data_files)
-    # 保存Excel结果
-    result_path = f"{data_dir}\\成绩分析结果-{main_course_files[test_case]}.xlsx"
-    with pd.ExcelWriter(result_path, engine='openpyxl') as writer:
-        combined_df.to_excel(writer, sheet_name='综合成绩', index=False)
\ No newline at end of file
+    # 按清单批量分析多个班级：python grade_analyzer.py manifest.json（清单格式见batch.py）
+    import sys
+    from batch import main
+    sys.exit(main())
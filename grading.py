@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# @File    : grading.py
+# @Time    : 2026/10/18
+# 成绩换算方案：按年级段将文字成绩（优秀、良好等）换算为分数，数字成绩直接使用；
+# 方案可从JSON配置文件加载，带名称和版本，方案变化时解析缓存和分析结果缓存随之失效
+#
+# 配置文件格式（bands按起始年级升序，第一段的from_level为null，表示更早的所有年级）：
+# {
+#     "name": "default",
+#     "version": "1",
+#     "max_score": 100,
+#     "bands": [
+#         {"from_level": null, "grades": {"优秀": 95, "良好": 85, "中等": 75, "及格": 65, "不及格": 55}},
+#         {"from_level": 2023, "grades": {"优秀": 90, "良好": 80, "中等": 70, "及格": 60, "不及格": 50}}
+#     ]
+# }
+
+import bisect
+import hashlib
+import json
+import numbers
+
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+DEFAULT_SCHEME_CONFIG = {
+    'name': 'default',
+    'version': '1',
+    'max_score': 100,
+    'bands': [
+        {'from_level': None, 'grades': {'优秀': 95, '良好': 85, '中等': 75, '及格': 65, '不及格': 55}},
+        {'from_level': 2023, 'grades': {'优秀': 90, '良好': 80, '中等': 70, '及格': 60, '不及格': 50}},
+    ],
+}
+
+
+class GradingScheme:
+    """
+    成绩换算方案
+    文字成绩按所在年级段查表换算（换算结果保持配置中的类型，整数分数显示时不带小数）；
+    数字成绩转换为浮点数，超过max_score或不大于0记为0；文本形式的数字直接使用；其余取值记为0
+    每个年级的不同原始取值只换算一次
+    """
+
+    def __init__(self, name, version, bands, max_score=100):
+        if not bands:
+            raise ValueError("成绩换算方案至少需要一个年级段")
+        starts = [band['from_level'] for band in bands[1:]]
+        if any(not isinstance(start, int) for start in starts) or starts != sorted(set(starts)):
+            raise ValueError("年级段的起始年级必须为整数且按升序排列")
+        for band in bands:
+            for word, score in band['grades'].items():
+                if isinstance(score, bool) or not isinstance(score, numbers.Real):
+                    raise ValueError(f"成绩 {word} 的分数必须为数字: {score}")
+        self.name = str(name)
+        self.version = str(version)
+        self.max_score = max_score
+        self.bands = [{'from_level': band.get('from_level'), 'grades': dict(band['grades'])} for band in bands]
+        self._starts = starts
+        self._memo = {}
+        # 方案标识：名称、版本及配置内容的摘要，用于解析缓存键和分析结果指纹；修改配置而未更新版本号时也能区分
+        digest = hashlib.sha256(json.dumps(self.to_dict(), ensure_ascii=False, sort_keys=True)
+                                .encode('utf-8')).hexdigest()[:12]
+        self.key = f"{self.name}-{self.version}-{digest}"
+
+    @classmethod
+    def from_dict(cls, config):
+        """由配置字典创建方案，配置格式见模块说明"""
+        try:
+            return cls(config['name'], config['version'], config['bands'], config.get('max_score', 100))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"成绩换算方案配置无效: {e}")
+
+    @classmethod
+    def load(cls, path):
+        """从JSON配置文件加载方案"""
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self):
+        return {'name': self.name, 'version': self.version, 'max_score': self.max_score, 'bands': self.bands}
+
+    def band_index(self, level):
+        """年级所在的年级段"""
+        return bisect.bisect_right(self._starts, level)
+
+    def _convert(self, grade, level):
+        if pd.isna(grade):
+            return 0
+        if isinstance(grade, str):
+            grade = grade.strip()
+            score = self.bands[self.band_index(level)]['grades'].get(grade)
+            if score is not None:
+                return score
+            try:
+                return float(grade)
+            except ValueError:
+                return 0
+        try:
+            score = float(grade)
+        except (TypeError, ValueError):
+            return 0
+        return score if 0 < score <= self.max_score else 0
+
+    def convert(self, grade, level):
+        """
+        换算单个成绩，无效成绩返回0
+        结果按 (年级, 原始取值) 缓存；相等的数值（如1、1.0、True）换算结果相同，可共用缓存项
+        """
+        memo = self._memo.get(level)
+        if memo is None:
+            memo = self._memo[level] = {}
+        try:
+            return memo[grade]
+        except KeyError:
+            score = memo[grade] = self._convert(grade, level)
+            return score
+        except TypeError:
+            return self._convert(grade, level)
+
+    def score_table(self, grades, levels):
+        """
+        批量换算：grades为不同的原始取值，levels为不同的年级（None表示该年级无效，对应列全为0）
+        返回 (分数表, 是否为整数分数) 两个形状为 (len(grades), len(levels)) 的数组
+        """
+        scores = np.zeros((len(grades), len(levels)))
+        is_int = np.zeros((len(grades), len(levels)), dtype=bool)
+        for j, level in enumerate(levels):
+            if level is None:
+                continue
+            for i, grade in enumerate(grades):
+                score = self.convert(grade, level)
+                scores[i, j] = score
+                is_int[i, j] = isinstance(score, int)
+        return scores, is_int
+
+
+DEFAULT_GRADING_SCHEME = GradingScheme.from_dict(DEFAULT_SCHEME_CONFIG)
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+# @File    : gunicorn.conf.py
+# @Time    : 2026/10/18
+# gunicorn配置：gunicorn -c gunicorn.conf.py wsgi:app
+# 主进程预先加载应用（preload_app）后fork工作进程，工作进程以多线程（gthread）处理请求
+
+import os
+
+from serve import configure_environment
+
+bind = f"{os.environ.get('GRADE_HOST', '0.0.0.0')}:{os.environ.get('GRADE_PORT', '5000')}"
+workers = int(os.environ.get('GRADE_WEB_WORKERS', os.cpu_count() or 1))
+threads = int(os.environ.get('GRADE_WEB_THREADS', '8'))
+worker_class = 'gthread'
+preload_app = True
+timeout = 120
+
+configure_environment(workers)
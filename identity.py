@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# @File    : identity.py
+# @Time    : 2026/10/18
+# 学生与课程标识规范化，每个成绩文件解析时计算一次，跨文件合并时按规范学号哈希连接：
+#   学号：整数、整数值的浮点数和文本统一为规范文本，文本去除空白并统一全半角，
+#         2021001、'2021001'、2021001.0、' 2021001 '、'２０２１００１' 为同一学号
+#   课程列：列名含【学分】（如【4.0】）且学分大于0，课程名称为第一个【之前的文本（去除首尾空白），与原始实现相同；
+#         课程键为去除全部空白的课程名称，同一文件内课程键相同的列为同一课程（取最后一列的成绩），
+#         大小写、全半角不同的课程名称仍为不同课程；主要课程按课程名称原文匹配（见grade_analyzer.MainCourseMatcher）
+# 合并报告汇总同一学号的不同写法、姓名或年级不一致、文件内重复的行、课程名称空白不同或学分不一致等情况
+
+import math
+import re
+import unicodedata
+
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+# 合并报告中每类情况列出的示例数
+REPORT_EXAMPLES = 10
+
+# 课程列表头中的学分：【4.0】、【4】
+_CREDITS_PATTERN = re.compile(r'【(\d+\.?\d*)】')
+# 整数值的数字文本，如 '2021001.0'
+_INTEGRAL_TEXT = re.compile(r'\d+\.0*')
+
+
+def canonical_student_id(value):
+    """
+    学号的规范文本：整数和整数值的浮点数为不带小数的数字文本，文本去除空白并统一全半角，
+    '2021001.0' 这样的整数值文本去掉小数部分；缺失或空白返回None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        if math.isnan(value):
+            return None
+        return str(int(value)) if value.is_integer() else repr(value)
+    if value is pd.NaT:
+        return None
+    text = ''.join(unicodedata.normalize('NFKC', str(value)).split())
+    if _INTEGRAL_TEXT.fullmatch(text):
+        text = text.split('.')[0]
+    return text or None
+
+
+def canonical_student_ids(values):
+    """批量计算规范学号（object数组，无效学号为None），每个不同的取值只计算一次"""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    keys = [canonical_student_id(value) for value in uniques.tolist()] + [None]
+    return np.array(keys, dtype=object)[codes]
+
+
+def display_student_id(value):
+    """输出的学号：整数值的浮点数（含缺失值的数字列读取后为浮点数）还原为整数，文本取规范文本，其他取值不变"""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return int(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, str):
+        return canonical_student_id(value)
+    return value
+
+
+def course_key(course_name):
+    """课程键：去除全部空白，'礼行天下  仪见倾心' 与 '礼行天下 仪见倾心' 为同一课程"""
+    return ''.join(str(course_name).split())
+
+
+def parse_course_header(header):
+    """
+    解析课程列表头，返回 (课程名称, 学分)，不是有效课程列（没有学分或学分为0）时返回None
+    学分为第一个【数字】，课程名称为第一个【之前的文本，例如：花卉栽培与环境 【1.0】 -> ('花卉栽培与环境', 1.0)
+    """
+    if header is None or (isinstance(header, float) and math.isnan(header)):
+        return None
+    text = str(header)
+    match = _CREDITS_PATTERN.search(text)
+    if match is None:
+        return None
+    credits = float(match.group(1))
+    if credits <= 0:
+        return None
+    return text.split('【')[0].strip(), credits
+
+
+def _id_forms(values):
+    """
+    学号的原始写法（repr，2021001、'2021001'、2021001.0 各不相同），返回 (各行写法编号, 写法列表)
+    同一类型的取值按取值去重后计算；混有多种类型时逐个计算，避免 2021001 与 2021001.0 被视为同一取值
+    """
+    if len(set(map(type, values))) > 1:
+        values = np.array([repr(value) for value in values], dtype=object)
+        return pd.factorize(values)
+    codes, uniques = pd.factorize(values)
+    return codes, [repr(value) for value in uniques.tolist()]
+
+
+def _names(values):
+    """姓名去除首尾空白后编号，缺失为-1，返回 (各行编号, 姓名列表)"""
+    codes, uniques = pd.factorize(values)
+    stripped_codes, stripped = pd.factorize(np.array([str(name).strip() for name in uniques.tolist()] + [''],
+                                                     dtype=object))
+    codes = np.where(codes >= 0, stripped_codes[codes], -1)
+    return codes, stripped.tolist()
+
+
+def _conflicts(key_codes, value_codes, n_keys):
+    """取值（编号，-1为缺失）多于一种的键编号，按键编号排列"""
+    valid = value_codes >= 0
+    key_codes, value_codes = key_codes[valid].astype(np.int64), value_codes[valid].astype(np.int64)
+    width = int(value_codes.max()) + 1 if len(value_codes) else 1
+    pairs = pd.unique(key_codes * width + value_codes)
+    return np.flatnonzero(np.bincount(pairs // width, minlength=n_keys) > 1)
+
+
+def _examples(conflicts, key_codes, key_values, value_codes, values, label):
+    """前REPORT_EXAMPLES个冲突键各自的不同取值（按出现顺序）"""
+    examples = {int(code): [] for code in conflicts[:REPORT_EXAMPLES]}
+    for row in np.flatnonzero(np.isin(key_codes, list(examples))).tolist():
+        found = examples[int(key_codes[row])]
+        code = value_codes[row]
+        if code >= 0 and values[code] not in found:
+            found.append(values[code])
+    return [{'key': key_values[code], label: found} for code, found in examples.items()]
+
+
+def merge_report(files):
+    """
+    汇总多个成绩文件合并时的情况
+    files: (文件序号, 学生表, 课程表) 列表；学生表含student_id（原始取值）、key（规范学号）、name、level列，
+    课程表含course、credits、key（课程键）列
+    各列先编号，再以 (键编号, 取值编号) 对计数，整体为线性时间；
+    返回可直接JSON序列化的字典：各类情况的数量及示例（示例中的key为规范学号或课程键）
+    """
+    def column(tables, name, dtype=object):
+        parts = [np.asarray(table[name], dtype=dtype) for _, table in tables]
+        return np.concatenate(parts) if parts else np.array([], dtype=dtype)
+
+    student_tables = [(file_idx, students) for file_idx, students, _ in files]
+    course_tables = [(file_idx, courses) for file_idx, _, courses in files]
+    student_files = np.repeat([file_idx for file_idx, _ in student_tables],
+                              [len(table['key']) for _, table in student_tables]).astype(np.int64)
+    course_files = np.repeat([file_idx for file_idx, _ in course_tables],
+                             [len(table['key']) for _, table in course_tables]).astype(np.int64)
+
+    key_codes, key_values = pd.factorize(column(student_tables, 'key'))
+    key_values = key_values.tolist()
+    form_parts, forms = [], []
+    for _, students in student_tables:
+        codes, uniques = _id_forms(np.asarray(students['student_id'], dtype=object))
+        form_parts.append(codes + len(forms))
+        forms.extend(uniques)
+    # 各文件的写法合并编号，相同写法编号相同
+    form_ids, forms = pd.factorize(np.array(forms, dtype=object))
+    forms = forms.tolist()
+    form_codes = form_ids[np.concatenate(form_parts)] if form_parts else np.array([], dtype=np.int64)
+    name_codes, names = _names(column(student_tables, 'name'))
+    level_codes, levels = pd.factorize(column(student_tables, 'level', np.int64))
+    levels = levels.tolist()
+
+    merged_ids = _conflicts(key_codes, form_codes, len(key_values))
+    name_conflicts = _conflicts(key_codes, name_codes, len(key_values))
+    level_conflicts = _conflicts(key_codes, level_codes, len(key_values))
+    # 同一文件内重复的学号行：(文件, 学号) 第二次及以后出现的行
+    file_keys = student_files * max(len(key_values), 1) + key_codes
+    duplicate_rows = pd.Series(file_keys).duplicated().to_numpy()
+
+    course_codes, course_keys = pd.factorize(column(course_tables, 'key'))
+    course_keys = course_keys.tolist()
+    variant_codes, variants = pd.factorize(column(course_tables, 'course'))
+    variants = variants.tolist()
+    credit_codes, credits = pd.factorize(column(course_tables, 'credits', float))
+    credits = credits.tolist()
+    course_variants = _conflicts(course_codes, variant_codes, len(course_keys))
+    credit_conflicts = _conflicts(course_codes, credit_codes, len(course_keys))
+    duplicate_courses = pd.Series(course_files * max(len(course_keys), 1) + course_codes).duplicated()
+
+    duplicate_examples = {}
+    for row in np.flatnonzero(duplicate_rows).tolist():
+        pair = (int(student_files[row]), key_values[key_codes[row]])
+        if pair not in duplicate_examples and len(duplicate_examples) >= REPORT_EXAMPLES:
+            break
+        duplicate_examples[pair] = duplicate_examples.get(pair, 0) + 1
+
+    return {
+        'files': len(files),
+        'student_rows': len(key_codes),
+        'students': len(key_values),
+        'merged_ids': len(merged_ids),
+        'name_conflicts': len(name_conflicts),
+        'level_conflicts': len(level_conflicts),
+        'duplicate_rows': int(duplicate_rows.sum()),
+        'course_columns': len(course_codes),
+        'course_variants': len(course_variants),
+        'credit_conflicts': len(credit_conflicts),
+        'duplicate_courses': int(duplicate_courses.sum()),
+        'examples': {
+            'merged_ids': _examples(merged_ids, key_codes, key_values, form_codes, forms, 'values'),
+            'name_conflicts': _examples(name_conflicts, key_codes, key_values, name_codes, names, 'names'),
+            'level_conflicts': _examples(level_conflicts, key_codes, key_values, level_codes, levels, 'levels'),
+            'duplicate_rows': [{'key': key, 'file': file_idx, 'extra_rows': count}
+                               for (file_idx, key), count in duplicate_examples.items()],
+            'course_variants': _examples(course_variants, course_codes, course_keys, variant_codes, variants, 'names'),
+            'credit_conflicts': _examples(credit_conflicts, course_codes, course_keys, credit_codes, credits,
+                                          'credits'),
+        },
+    }
+
+
+def describe(report):
+    """合并报告的文字说明（每类情况一行），没有需要说明的情况时为空列表"""
+    lines = []
+    examples = report['examples']
+
+    def sample(kind, column):
+        items = examples[kind][:3]
+        return '；'.join(f"{item['key']}: {'、'.join(str(value) for value in item[column])}" for item in items)
+
+    if report['merged_ids']:
+        lines.append(f"{report['merged_ids']}个学号有多种写法，已按同一学生合并（{sample('merged_ids', 'values')}）")
+    if report['name_conflicts']:
+        lines.append(f"{report['name_conflicts']}个学号的姓名不一致，取首次出现的姓名（{sample('name_conflicts', 'names')}）")
+    if report['level_conflicts']:
+        lines.append(f"{report['level_conflicts']}个学号的年级不一致，取首次出现的年级（{sample('level_conflicts', 'levels')}）")
+    if report['duplicate_rows']:
+        lines.append(f"同一文件内重复的学号行{report['duplicate_rows']}行，同一课程取最后一行的成绩")
+    if report['course_variants']:
+        lines.append(f"{report['course_variants']}门课程的名称只有空白不同，已视为同一课程（{sample('course_variants', 'names')}）")
+    if report['credit_conflicts']:
+        lines.append(f"{report['credit_conflicts']}门课程在不同列中的学分不一致（{sample('credit_conflicts', 'credits')}）")
+    if report['duplicate_courses']:
+        lines.append(f"同一文件内重复的课程列{report['duplicate_courses']}列，同一学生取最后一列的成绩")
+    return lines
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+# @File    : jobs.py
+# @Time    : 2026/10/18
+# 后台任务队列：在本地有界线程池中执行分析任务，不依赖外部消息队列；
+# 支持进度查询和取消，排队任务数、并发数、每个会话的任务数和内存预算可配置（按估算内存调度，见admission.py）；
+# 多个工作进程部署时，任务状态写入共用的状态目录，任一进程都能查询和取消其他进程中的任务，
+# 排队和运行中的任务记录在共用的准入账本中，各项限制在所有工作进程间共同计算
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from admission import (LEASE_ACTIVE, LEASE_QUEUED, REASON_QUEUE, REASON_SESSION, SHARED_POLL_INTERVAL,
+                       AdmissionLedger, AdmissionRejected, retry_after_seconds)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+# 任务ID：uuid4().hex
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+# 运行中任务的进度写入状态目录的最小间隔（秒）
+PERSIST_INTERVAL = 0.5
+# 任务在准入账本中的类别
+JOB_GATE = 'analysis'
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class QueueFull(AdmissionRejected):
+    """无法接受新任务：排队任务数或该会话的任务数已达上限"""
+
+
+class Job:
+    """后台任务，func(job) 在工作线程中执行，通过job.report报告进度；cost为估算的峰值内存（字节）"""
+
+    def __init__(self, func, owner=None, cost=0):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.func = func
+        self.cost = cost
+        self.status = JOB_QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel_event = threading.Event()
+        self._queue = None
+        self._persisted = 0.0
+
+    @classmethod
+    def from_record(cls, record):
+        """由状态目录中的记录还原的任务（其他进程中的任务，只用于查询）"""
+        job = cls(None, owner=record.get('owner'))
+        job.id = record['job_id']
+        job.status = record['status']
+        job.progress = record.get('progress') or {}
+        job.result = record.get('result')
+        job.error = record.get('error')
+        job.created = record.get('created')
+        job.started = record.get('started')
+        job.finished = record.get('finished')
+        return job
+
+    def report(self, **progress):
+        """更新任务进度；任务已被请求取消时抛出JobCancelled以中止执行"""
+        if self._queue is not None and self._queue._cancel_requested(self):
+            self._cancel_event.set()
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        self.progress.update(progress)
+        if self._queue is not None:
+            self._queue._persist(self, force=False)
+
+    def to_dict(self):
+        """任务状态信息（不含结果）"""
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class JobQueue:
+    """
+    有界任务队列
+    最多workers个任务同时运行，最多max_queued个任务排队，超出时submit抛出QueueFull；
+    已结束的任务保留retention秒供查询结果；
+    max_per_owner: 每个提交者（会话）排队和运行中的任务数上限，超出时submit抛出QueueFull，None为不限；
+    memory_budget: 运行中任务估算内存（Job.cost）之和的上限（字节），None为不限；任务按提交顺序开始，
+    队首任务放不下时等待运行中的任务结束（没有运行中的任务时总可以开始），不会被后提交的小任务越过；
+    state_dir: 任务状态目录，多个工作进程共用，None为只在本进程内查询；
+    ledger: 准入账本（admission.AdmissionLedger），共用账本时以上限制及提交顺序在所有工作进程间共同计算，
+    每个进程仍启动workers个工作线程
+    """
+
+    def __init__(self, workers=2, max_queued=16, retention=3600, state_dir=None, max_per_owner=None,
+                 memory_budget=None, ledger=None):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self.state_dir = state_dir
+        self.max_per_owner = max_per_owner
+        self.memory_budget = memory_budget
+        self.ledger = ledger or AdmissionLedger()
+        self._last_state_prune = 0.0
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self._pending = deque()
+        self._jobs = OrderedDict()
+        # 任务耗时（秒）的指数滑动平均，用于估算Retry-After
+        self._average_seconds = 5.0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._threads = []
+        self._pid = None
+
+    def _ensure_workers(self):
+        """按需启动工作线程（调用方持有锁）；fork后的子进程中重新启动"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'analysis-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, owner=None, cost=0):
+        """提交任务，返回Job；cost为估算的峰值内存（字节）；排队任务或该提交者的任务已满时抛出QueueFull"""
+        job = Job(func, owner=owner, cost=cost)
+        if self.state_dir:
+            job._queue = self
+        with self._lock:
+            self._prune()
+            with self.ledger.transaction() as tx:
+                queued = tx.count(JOB_GATE, LEASE_QUEUED)
+                if self.max_per_owner is not None and owner is not None \
+                        and tx.count(JOB_GATE, owner=owner) >= self.max_per_owner:
+                    raise QueueFull(REASON_SESSION, self._retry_after(queued), '该会话已有分析任务在排队或运行，请等待其完成')
+                if queued >= self.max_queued:
+                    raise QueueFull(REASON_QUEUE, self._retry_after(queued), '服务器繁忙，排队的分析任务已满，请稍后重试')
+                tx.add(JOB_GATE, job.id, owner, cost, LEASE_QUEUED)
+            self._ensure_workers()
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._persist(job)
+            self._not_empty.notify_all()
+        return job
+
+    def _retry_after(self, queued):
+        """建议的重试间隔（调用方持有锁）"""
+        return retry_after_seconds(self._average_seconds, queued, self.workers)
+
+    def _try_start(self, job):
+        """
+        本进程的队首任务能否开始（调用方持有锁），可以时在账本中标记为运行中：
+        须为所有进程中最早提交的排队任务，运行中的任务数未满，且估算内存能放入预算
+        """
+        with self.ledger.transaction() as tx:
+            if tx.first(JOB_GATE, LEASE_QUEUED) != job.id or tx.count(JOB_GATE, LEASE_ACTIVE) >= self.workers:
+                return False
+            reserved = tx.cost(JOB_GATE, LEASE_ACTIVE)
+            if self.memory_budget is not None and reserved and reserved + job.cost > self.memory_budget:
+                return False
+            tx.set_state(job.id, LEASE_ACTIVE)
+            return True
+
+    def _release(self, job):
+        """任务结束后释放其名额（调用方持有锁）"""
+        with self.ledger.transaction() as tx:
+            tx.remove(job.id)
+
+    def get(self, job_id):
+        """查询任务（本进程中没有时查找状态目录），不存在或已过期返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or not self.state_dir or not JOB_ID_PATTERN.fullmatch(job_id):
+            return job
+        try:
+            with open(self._state_path(job_id), encoding='utf-8') as f:
+                return Job.from_record(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def cancel(self, job_id):
+        """
+        取消任务：排队中的任务直接取消，运行中的任务在下一次报告进度时中止
+        返回是否已请求取消（任务不存在或已结束时为False）
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if job.status in FINISHED_STATES:
+                    return False
+                job._cancel_event.set()
+                if job.status == JOB_QUEUED:
+                    self._pending.remove(job)
+                    job.status = JOB_CANCELLED
+                    job.finished = time.time()
+                    self._release(job)
+                    self._persist(job)
+                    # 队首可能变化
+                    self._not_empty.notify_all()
+                return True
+        # 其他进程中的任务：留下取消标记，由执行任务的进程在下一次报告进度时中止
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return False
+        with open(self._state_path(job_id, '.cancel'), 'w'):
+            pass
+        return True
+
+    def _state_path(self, job_id, suffix='.json'):
+        return os.path.join(self.state_dir, f"{job_id}{suffix}")
+
+    def _persist(self, job, force=True):
+        """将任务状态写入状态目录；force为False时按PERSIST_INTERVAL限制写入频率"""
+        if not self.state_dir:
+            return
+        now = time.time()
+        if not force and now - job._persisted < PERSIST_INTERVAL:
+            return
+        job._persisted = now
+        record = dict(job.to_dict(), owner=job.owner, result=job.result)
+        path = self._state_path(job.id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"任务状态写入失败: {e}")
+
+    def _cancel_requested(self, job):
+        return bool(self.state_dir) and os.path.exists(self._state_path(job.id, '.cancel'))
+
+    def stats(self):
+        """队列统计信息"""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            with self.ledger.transaction() as tx:
+                usage = {
+                    'queued': tx.count(JOB_GATE, LEASE_QUEUED),
+                    'running': tx.count(JOB_GATE, LEASE_ACTIVE),
+                    'reserved_bytes': tx.cost(JOB_GATE, LEASE_ACTIVE),
+                    'queued_bytes': tx.cost(JOB_GATE, LEASE_QUEUED),
+                }
+            return {
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+                'max_per_owner': self.max_per_owner,
+                'memory_budget': self.memory_budget,
+                'shared': self.ledger.shared,
+                **usage,
+                'average_seconds': round(self._average_seconds, 3),
+                # 本进程中的任务
+                'jobs': counts,
+            }
+
+    def _prune(self):
+        """清理超过保留时间的已结束任务（调用方持有锁）"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.status in FINISHED_STATES and now - job.finished > self.retention]
+        for job_id in expired:
+            del self._jobs[job_id]
+            if self.state_dir:
+                for suffix in ('.json', '.cancel'):
+                    try:
+                        os.remove(self._state_path(job_id, suffix))
+                    except FileNotFoundError:
+                        pass
+        # 状态目录中其他（可能已退出的）进程遗留的过期记录
+        if self.state_dir and now - self._last_state_prune > 60:
+            self._last_state_prune = now
+            try:
+                entries = list(os.scandir(self.state_dir))
+            except FileNotFoundError:
+                entries = []
+            for entry in entries:
+                # 只清理任务状态文件（<任务ID>.json、.cancel及写入中的临时文件）
+                if not JOB_ID_PATTERN.fullmatch(entry.name.split('.', 1)[0]):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime > self.retention:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._pending or not self._try_start(self._pending[0]):
+                    # 共用账本时其他进程中的任务结束不会通知本进程，有排队任务时定期重新检查
+                    self._not_empty.wait(SHARED_POLL_INTERVAL if self._pending and self.ledger.shared else None)
+                job = self._pending.popleft()
+                job.status = JOB_RUNNING
+                job.started = time.time()
+                # 其他空闲的工作线程可能可以开始下一个任务
+                self._not_empty.notify_all()
+            self._persist(job)
+
+            try:
+                if self._cancel_requested(job):
+                    raise JobCancelled()
+                result = job.func(job)
+            except JobCancelled:
+                status, result, error = JOB_CANCELLED, None, None
+            except Exception as e:
+                status, result, error = JOB_FAILED, None, str(e)
+            else:
+                status, error = JOB_SUCCEEDED, None
+
+            with self._lock:
+                job.status = status
+                job.result = result
+                job.error = error
+                job.finished = time.time()
+                self._release(job)
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * (job.finished - job.started)
+                self._not_empty.notify_all()
+            self._persist(job)
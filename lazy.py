@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# @File    : lazy.py
+# @Time    : 2026/10/18
+# 延迟导入：pandas、numpy等耗时的模块在首次使用时才导入，主页、状态检查、示例文件下载等不涉及分析的请求
+# 无需等待导入；也可在后台线程中提前导入（预热），或在fork工作进程之前导入（见serve.py）
+
+import importlib
+import importlib.util
+import sys
+import threading
+
+# 分析用到的耗时模块（可选依赖不存在时跳过）
+HEAVY_MODULES = ('numpy', 'pandas', 'openpyxl', 'python_calamine', 'xlsxwriter', 'pyarrow')
+
+
+class LazyModule:
+    """
+    模块代理，首次访问属性时导入模块（导入由Python的导入锁保证线程安全）
+    访问过的属性缓存在代理上，之后与直接访问模块属性一样快
+    """
+
+    def __init__(self, name):
+        self._lazy_name = name
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self._lazy_name), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        state = '已导入' if self._lazy_name in sys.modules else '未导入'
+        return f"<LazyModule {self._lazy_name}（{state}）>"
+
+
+def preload(names=HEAVY_MODULES):
+    """导入模块，返回已导入的模块名"""
+    loaded = []
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        loaded.append(name)
+    return loaded
+
+
+def loaded_modules(names=HEAVY_MODULES):
+    """已导入的模块名"""
+    return [name for name in names if name in sys.modules]
+
+
+def warm_in_background(names=HEAVY_MODULES):
+    """在后台线程中导入尚未导入的已安装模块；没有需要导入的模块时不启动线程（预fork的主进程中不留下后台线程）"""
+    pending = [name for name in names if name not in sys.modules and importlib.util.find_spec(name) is not None]
+    if not pending:
+        return None
+    thread = threading.Thread(target=preload, args=(pending,), name='warm-imports', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# @File    : metrics.py
+# @Time    : 2026/10/18
+# 性能指标：分阶段计时（读取、规范化、汇总、排序、导出）与请求耗时直方图、准入控制指标，以及计数器和瞬时值，
+# 以Prometheus文本格式输出；另提供按需的cProfile性能分析
+
+import bisect
+import contextlib
+import cProfile
+import os
+import threading
+import time
+
+# 直方图默认分桶上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 同一时间只进行一个性能分析，见profiled
+_PROFILE_LOCK = threading.Lock()
+
+# 分析阶段
+STAGE_READ = 'read'
+STAGE_NORMALIZE = 'normalize'
+STAGE_AGGREGATE = 'aggregate'
+STAGE_SORT = 'sort'
+STAGE_RANK = 'rank'
+STAGE_EXPORT = 'export'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Histogram:
+    """按标签分组的直方图，线程安全"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """记录一次观测值"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """记录代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        """Prometheus文本格式"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", _format_value(bound))])} '
+                             f'{cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {total!r}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class Counter:
+    """按标签分组的计数器，线程安全"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        """增加计数"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        """Prometheus文本格式"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f'{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}')
+        return lines
+
+
+class Gauge(Counter):
+    """按标签分组的瞬时值，线程安全"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        """设置当前值"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, labelnames=()):
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """所有指标的Prometheus文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram('grade_analysis_stage_seconds', '成绩分析各阶段耗时（秒）',
+                                   labelnames=('stage',))
+REQUEST_SECONDS = REGISTRY.histogram('grade_http_request_seconds', 'HTTP请求处理耗时（秒）',
+                                     labelnames=('endpoint', 'method', 'status'))
+ADMISSION_DECISIONS = REGISTRY.counter('grade_admission_decisions_total',
+                                       '准入结果：admitted（直接进入）、queued（等待后进入）、rejected_<原因>（拒绝）',
+                                       labelnames=('gate', 'outcome'))
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram('grade_admission_wait_seconds', '准入等待时间（秒），分析任务为排队时间',
+                                            labelnames=('gate',))
+ADMISSION_STATE = REGISTRY.gauge('grade_admission_state', '准入状态：active（处理中）、waiting（等待中）、cost（在途代价）',
+                                 labelnames=('gate', 'kind'))
+
+
+class StageTimer:
+    """
+    一次分析的分阶段计时器
+    每个阶段的耗时计入STAGE_SECONDS直方图，同时累加到timings（阶段 -> 秒）供返回给调用方
+    """
+
+    def __init__(self, histogram=STAGE_SECONDS):
+        self.histogram = histogram
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            self.histogram.observe(elapsed, stage=name)
+
+    def summary(self):
+        """各阶段耗时（毫秒，保留两位小数）"""
+        return {name: round(seconds * 1000, 2) for name, seconds in self.timings.items()}
+
+
+@contextlib.contextmanager
+def profiled(output_path):
+    """
+    在cProfile下执行代码块，结束后将统计数据写入output_path，可用pstats查看，返回Profile对象
+    同一时间只能进行一个性能分析（Python 3.12起同时启用第二个cProfile会抛出ValueError），
+    已有性能分析进行中时代码块照常执行但不分析，返回None，也不写入文件
+    """
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        yield None
+        return
+    try:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 其他性能分析工具已启用
+            profiler = None
+        if profiler is None:
+            yield None
+            return
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            profiler.dump_stats(output_path)
+    finally:
+        _PROFILE_LOCK.release()
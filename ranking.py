@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# @File    : ranking.py
+# @Time    : 2026/10/18
+# 排名与统计：在分析结果上按学分加权平均分计算全体排名、年级内排名（竞争排名、密集排名）、
+# 年级内排名百分比及百分位段，并按年级汇总分数统计（分位数、分数段分布等），均为分组向量化计算；
+# 统计结果随分析结果一起缓存，供 /results/stats 直接返回
+
+import math
+
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+# 统计定义变化时递增，使缓存的统计结果失效
+STATS_VERSION = 's1'
+
+SCORE_COLUMN = '学分加权平均分'
+GRADE_COLUMN = '年级'
+RANK_COLUMNS = ['总排名', '年级排名', '年级密集排名', '年级人数', '年级排名百分比', '年级百分位段']
+# 百分位段上界（年级排名百分比，含），如排名百分比10表示位于年级前10%
+PERCENTILE_BANDS = (10, 25, 50, 75, 100)
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+# 分数段宽度：[0, 10), [10, 20), ..., [90, 100]
+HISTOGRAM_BIN_WIDTH = 10
+
+
+def band_labels(bands=PERCENTILE_BANDS):
+    """百分位段名称：前10%、10%-25%、……"""
+    labels, lower = [], 0
+    for upper in bands:
+        labels.append(f"前{upper}%" if lower == 0 else f"{lower}%-{upper}%")
+        lower = upper
+    return labels
+
+
+def strip_ranks(df):
+    """去掉排名列，得到分析器输出的原始结果"""
+    return df.drop(columns=[column for column in RANK_COLUMNS if column in df.columns])
+
+
+def add_ranks(df):
+    """
+    在结果表中加入排名列（位于学分加权平均分之后），不改变行顺序；已有的排名列重新计算，空结果不加排名列
+    分数相同的学生竞争排名相同、其后名次顺延（1、2、2、4），密集排名不顺延（1、2、2、3）；
+    年级排名百分比 = 年级排名 / 年级人数 × 100，越小越靠前；年级为空的学生归为同一组
+    """
+    df = strip_ranks(df)
+    if df.empty:
+        return df
+    scores = df[SCORE_COLUMN].astype(float)
+    grouped = scores.groupby(df[GRADE_COLUMN], dropna=False, sort=False)
+    grade_rank = grouped.rank(method='min', ascending=False).astype(np.int64)
+    grade_size = grouped.transform('size').astype(np.int64)
+    top_percent = (grade_rank / grade_size * 100).round(2)
+    labels = np.array(band_labels(), dtype=object)
+    band = np.searchsorted(np.asarray(PERCENTILE_BANDS, dtype=float), top_percent.to_numpy(), side='left')
+    ranks = {
+        '总排名': scores.rank(method='min', ascending=False).astype(np.int64),
+        '年级排名': grade_rank,
+        '年级密集排名': grouped.rank(method='dense', ascending=False).astype(np.int64),
+        '年级人数': grade_size,
+        '年级排名百分比': top_percent,
+        '年级百分位段': pd.Series(labels[np.minimum(band, len(labels) - 1)], index=df.index),
+    }
+    position = df.columns.get_loc(SCORE_COLUMN) + 1
+    columns = list(df.columns[:position]) + RANK_COLUMNS + list(df.columns[position:])
+    return df.assign(**ranks)[columns]
+
+
+def _number(value, digits=2):
+    """JSON中的数值：NaN为None，整数值保持整数"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return round(float(value), digits)
+
+
+def _group_stats(scores, grade_codes, n_groups):
+    """各组的人数、均值、标准差、最值、分位数（按组编号排列的数组）"""
+    frame = pd.DataFrame({'group': grade_codes, 'score': scores})
+    grouped = frame.groupby('group', sort=True)['score']
+    described = grouped.agg(['count', 'mean', 'std', 'min', 'max']).reindex(range(n_groups))
+    quantiles = grouped.quantile(list(QUANTILES)).unstack().reindex(range(n_groups))
+    return described, quantiles
+
+
+def summarize(df):
+    """
+    按年级汇总学分加权平均分的统计：人数、均值、标准差、最值、分位数、并列人数、分数段分布、
+    各百分位段的分数线（该段最低分）；另含全体学生的同类统计
+    返回可直接JSON序列化的字典
+    """
+    if df.empty or SCORE_COLUMN not in df.columns or GRADE_COLUMN not in df.columns:
+        return {'version': STATS_VERSION, 'student_count': len(df), 'overall': None, 'grades': []}
+    if not set(RANK_COLUMNS) <= set(df.columns):
+        df = add_ranks(df)
+    scores = df[SCORE_COLUMN].to_numpy(dtype=float)
+    grade_codes, grade_values = pd.factorize(df[GRADE_COLUMN], use_na_sentinel=False, sort=True)
+    n_groups = len(grade_values)
+    n = len(scores)
+
+    # 全体作为额外的一组，与各年级一起计算
+    all_scores = np.concatenate([scores, scores])
+    all_codes = np.concatenate([grade_codes, np.full(n, n_groups)])
+    described, quantiles = _group_stats(all_scores, all_codes, n_groups + 1)
+
+    # 分数段分布：分数段编号 = min(floor(分数 / 宽度), 段数 - 1)，最高分所在段含上界
+    top = max(100.0, float(scores.max()))
+    n_bins = int(math.ceil(top / HISTOGRAM_BIN_WIDTH))
+    bins = np.clip(np.floor(all_scores / HISTOGRAM_BIN_WIDTH).astype(np.int64), 0, n_bins - 1)
+    histogram = np.bincount(all_codes * n_bins + bins, minlength=(n_groups + 1) * n_bins).reshape(-1, n_bins)
+    edges = [i * HISTOGRAM_BIN_WIDTH for i in range(n_bins + 1)]
+
+    # 并列人数：与同组其他学生分数相同的学生数
+    score_codes, score_values = pd.factorize(all_scores)
+    pair_codes = np.unique(all_codes * len(score_values) + score_codes, return_inverse=True)[1]
+    pair_counts = np.bincount(pair_codes)
+    tied = np.bincount(all_codes, weights=(pair_counts[pair_codes] > 1), minlength=n_groups + 1)
+
+    # 各百分位段的分数线：排名百分比不超过段上界的学生中的最低分
+    grade_percent = df['年级排名百分比'].to_numpy(dtype=float)
+    overall_percent = np.round(df['总排名'].to_numpy(dtype=float) / max(n, 1) * 100, 2)
+    all_percent = np.concatenate([grade_percent, overall_percent])
+    cutoffs = np.full((n_groups + 1, len(PERCENTILE_BANDS)), np.nan)
+    for j, upper in enumerate(PERCENTILE_BANDS):
+        inside = all_percent <= upper
+        minimum = pd.Series(all_scores[inside]).groupby(all_codes[inside]).min()
+        cutoffs[minimum.index.to_numpy(), j] = minimum.to_numpy()
+    labels = band_labels()
+
+    def group_summary(i):
+        return {
+            'count': int(described['count'].iat[i]),
+            'mean': _number(described['mean'].iat[i]),
+            'std': _number(described['std'].iat[i]),
+            'min': _number(described['min'].iat[i]),
+            'max': _number(described['max'].iat[i]),
+            'quantiles': {f"p{round(q * 100)}": _number(quantiles[q].iat[i]) for q in QUANTILES},
+            'tied_students': int(tied[i]),
+            'histogram': histogram[i].tolist(),
+            'band_cutoffs': {label: _number(cutoffs[i, j]) for j, label in enumerate(labels)},
+        }
+
+    grades = []
+    for i, grade in enumerate(grade_values.tolist()):
+        summary = group_summary(i)
+        summary['grade'] = grade if isinstance(grade, str) else _number(grade)
+        grades.append(summary)
+    return {
+        'version': STATS_VERSION,
+        'student_count': n,
+        'score_column': SCORE_COLUMN,
+        'histogram_edges': edges,
+        'percentile_bands': labels,
+        'overall': group_summary(n_groups),
+        'grades': grades,
+    }
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# @File    : result_cache.py
+# @Time    : 2026/10/18
+# 分析结果缓存：以 (成绩文件哈希, 主要课程列表, 分析器版本) 的指纹为键，
+# 内存LRU + 磁盘.npz两级缓存分析结果表及其结果信息，支持过期时间和容量上限
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from file_cache import CACHE_READ_ERRORS, decode_objects, encode_objects
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+CACHE_SUFFIX = '.npz'
+
+
+def encode_frame(df, meta=None):
+    """将DataFrame编码为可用np.savez保存的数组；object列按类型编码，其余列保持原dtype"""
+    arrays = {'index': df.index.to_numpy(dtype=np.int64)}
+    columns = []
+    for i, column in enumerate(df.columns):
+        values = df[column]
+        if values.dtype == object:
+            arrays[f'col{i}_kind'], arrays[f'col{i}_text'] = encode_objects(values.tolist())
+            columns.append({'name': column, 'object': True})
+        else:
+            arrays[f'col{i}'] = values.to_numpy()
+            columns.append({'name': column, 'object': False})
+    arrays['meta'] = np.array(json.dumps({'columns': columns, 'meta': meta or {}}, ensure_ascii=False))
+    return arrays
+
+
+def decode_frame(data):
+    """encode_frame的逆过程，返回 (DataFrame, meta)"""
+    info = json.loads(str(data['meta']))
+    frame = {}
+    for i, column in enumerate(info['columns']):
+        if column['object']:
+            frame[column['name']] = decode_objects(data[f'col{i}_kind'], data[f'col{i}_text'])
+        else:
+            frame[column['name']] = data[f'col{i}']
+    df = pd.DataFrame(frame, index=data['index'])
+    return df, info['meta']
+
+
+class AnalysisResultCache:
+    """
+    分析结果两级缓存
+    内存中保留最近使用的memory_capacity个结果，磁盘上最多保留disk_capacity个；
+    缓存项超过ttl秒后失效
+    """
+
+    def __init__(self, cache_dir, memory_capacity=32, disk_capacity=256, ttl=24 * 3600):
+        self.cache_dir = cache_dir
+        self.memory_capacity = memory_capacity
+        self.disk_capacity = disk_capacity
+        self.ttl = ttl
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, fingerprint):
+        return os.path.join(self.cache_dir, f"{fingerprint}{CACHE_SUFFIX}")
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, fingerprint):
+        """
+        查找分析结果，返回 (结果DataFrame, 结果信息字典)，未命中或已过期返回None
+        返回的DataFrame为缓存副本，可直接修改；计入命中率（相同输入再次分析）
+        """
+        return self._lookup(fingerprint, count=True)
+
+    def peek(self, fingerprint):
+        """同get，但不计入命中和未命中次数，用于按结果ID查找之前的分析结果等内部查找"""
+        return self._lookup(fingerprint, count=False)
+
+    def _lookup(self, fingerprint, count):
+        with self._lock:
+            entry = self._memory.get(fingerprint)
+            if entry is not None:
+                df, meta = entry
+                if not self._expired(meta['created']):
+                    self._memory.move_to_end(fingerprint)
+                    self.memory_hits += count
+                    return df.copy(), dict(meta)
+                del self._memory[fingerprint]
+
+        path = self._path(fingerprint)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                df, meta = decode_frame(data)
+        except CACHE_READ_ERRORS as e:
+            # 缓存文件损坏时删除，视为未命中
+            if not isinstance(e, FileNotFoundError):
+                print(f"读取分析结果缓存失败: {e}")
+                self._remove_file(path)
+            with self._lock:
+                self.misses += count
+            return None
+
+        if self._expired(meta['created']):
+            self._remove_file(path)
+            with self._lock:
+                self.misses += count
+            return None
+
+        os.utime(path)
+        with self._lock:
+            self.disk_hits += count
+            self._remember(fingerprint, df, meta)
+        return df.copy(), dict(meta)
+
+    def put(self, fingerprint, df, meta):
+        """保存分析结果及其结果信息（timestamp、成绩文件哈希、分析设置、排名统计等，须可JSON序列化）"""
+        meta = dict(meta, created=time.time())
+        with self._lock:
+            self._remember(fingerprint, df.copy(), meta)
+
+        try:
+            arrays = encode_frame(df, meta)
+        except TypeError as e:
+            print(f"分析结果未写入磁盘缓存: {e}")
+            return
+        path = self._path(fingerprint)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    def _remember(self, fingerprint, df, meta):
+        """加入内存缓存（调用方持有锁）"""
+        self._memory[fingerprint] = (df, meta)
+        self._memory.move_to_end(fingerprint)
+        while len(self._memory) > self.memory_capacity:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_disk(self):
+        """删除过期的磁盘缓存项，并按最近使用时间淘汰超出容量的项"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(CACHE_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    continue
+        entries.sort()
+        now = time.time()
+        for i, (mtime, path) in enumerate(entries):
+            expired = self.ttl is not None and now - mtime > self.ttl
+            if expired or len(entries) - i > self.disk_capacity:
+                self._remove_file(path)
+                with self._lock:
+                    self.evictions += 1
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        """缓存统计信息"""
+        disk_entries = sum(1 for name in os.listdir(self.cache_dir) if name.endswith(CACHE_SUFFIX))
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+            }
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# @File    : result_store.py
+# @Time    : 2026/10/18
+# 分析结果表存储：结果以列式DataFrame保存在内存中（LRU），同时落盘为.npz；
+# 为分页、排序、按年级/姓名前缀筛选建立索引，查询代价与结果规模基本无关；排名统计与结果表一起保存
+
+import os
+import threading
+from collections import OrderedDict
+
+from lazy import LazyModule
+from ranking import STATS_VERSION, summarize
+from file_cache import CACHE_READ_ERRORS, remove_file
+from result_cache import decode_frame, encode_frame
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+TABLE_SUFFIX = '.npz'
+# 流式输出结果时每批的行数
+STREAM_CHUNK_ROWS = 1000
+
+
+class ResultTable:
+    """
+    单个分析结果表及其查询索引
+    排序顺序、年级分组和姓名前缀索引在首次使用时建立并复用；stats为排名统计（ranking.summarize），
+    未提供或版本不符时在首次使用时计算
+    """
+
+    def __init__(self, df, stats=None):
+        self.df = df.reset_index(drop=True)
+        # 保存时排名统计的版本，None为没有统计
+        self.stats_version = stats.get('version') if stats else None
+        self._stats = stats if self.stats_version == STATS_VERSION else None
+        self._orders = {}
+        self._ranks = {}
+        self._grade_rows = None
+        self._name_index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def stats(self):
+        """排名统计"""
+        with self._lock:
+            if self._stats is None:
+                self._stats = summarize(self.df)
+            return self._stats
+
+    def _order(self, sort_by, ascending):
+        """按列排序后的行位置（稳定排序，相同值保持原有顺序）；sort_by为None时为原有顺序"""
+        key = (sort_by, ascending)
+        with self._lock:
+            order = self._orders.get(key)
+            if order is None:
+                if sort_by is None:
+                    order = np.arange(len(self.df))
+                else:
+                    values = self.df[sort_by].reset_index(drop=True)
+                    try:
+                        order = values.sort_values(ascending=ascending, kind='mergesort').index.to_numpy()
+                    except TypeError:
+                        # 学号等列可能混有数字和文本，按文本排序
+                        order = values.astype(str).sort_values(ascending=ascending, kind='mergesort').index.to_numpy()
+                self._orders[key] = order
+                rank = np.empty(len(order), dtype=np.int64)
+                rank[order] = np.arange(len(order))
+                self._ranks[key] = rank
+            return order, self._ranks[key]
+
+    def _rows_for_grade(self, grade):
+        """指定年级的行位置"""
+        with self._lock:
+            if self._grade_rows is None:
+                self._grade_rows = {key: np.asarray(rows) for key, rows in
+                                    self.df.groupby('年级', sort=False).indices.items()}
+            return self._grade_rows.get(grade, np.array([], dtype=np.int64))
+
+    def _rows_for_name_prefix(self, prefix):
+        """姓名以prefix开头的行位置，基于按姓名排序的索引二分查找"""
+        with self._lock:
+            if self._name_index is None:
+                names = self.df['姓名'].astype(str).to_numpy()
+                order = np.argsort(names, kind='stable')
+                self._name_index = (names[order], order)
+            sorted_names, order = self._name_index
+        start = np.searchsorted(sorted_names, prefix, side='left')
+        end = np.searchsorted(sorted_names, prefix + '\U0010ffff', side='left')
+        return order[start:end]
+
+    def positions(self, sort_by=None, ascending=False, grade=None, name_prefix=None):
+        """
+        符合条件的行位置（按排序顺序）
+        sort_by为None时保持结果原有顺序（按学分加权平均分降序）
+        """
+        order, rank = self._order(sort_by, ascending)
+
+        if grade is None and not name_prefix:
+            return order
+
+        rows = None
+        if grade is not None:
+            rows = self._rows_for_grade(grade)
+        if name_prefix:
+            prefix_rows = self._rows_for_name_prefix(name_prefix)
+            rows = prefix_rows if rows is None else np.intersect1d(rows, prefix_rows)
+        return rows[np.argsort(rank[rows], kind='stable')]
+
+    def query(self, offset=0, limit=100, sort_by=None, ascending=False, grade=None, name_prefix=None):
+        """分页查询，返回 (符合条件的总行数, 当前页DataFrame)，参数见positions"""
+        rows = self.positions(sort_by, ascending, grade, name_prefix)
+        return len(rows), self.df.iloc[rows[offset:offset + limit]]
+
+    def iter_chunks(self, rows, chunk_rows=STREAM_CHUNK_ROWS):
+        """按行位置依次取出各批行（DataFrame），每批至多chunk_rows行"""
+        for start in range(0, len(rows), chunk_rows):
+            yield self.df.iloc[rows[start:start + chunk_rows]]
+
+
+class ResultStore:
+    """
+    分析结果表存储
+    内存中保留最近使用的memory_capacity个结果表，所有结果表同时写入磁盘，内存淘汰后可从磁盘重新加载
+    """
+
+    def __init__(self, store_dir, memory_capacity=16):
+        self.store_dir = store_dir
+        self.memory_capacity = memory_capacity
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _path(self, result_id):
+        return os.path.join(self.store_dir, f"{result_id}{TABLE_SUFFIX}")
+
+    def _remember(self, result_id, table):
+        with self._lock:
+            self._tables[result_id] = table
+            self._tables.move_to_end(result_id)
+            while len(self._tables) > self.memory_capacity:
+                self._tables.popitem(last=False)
+
+    def put(self, result_id, df, stats=None):
+        """
+        保存结果表及其排名统计，返回ResultTable；
+        已存在且排名统计版本相同时直接返回已有的结果表，版本不同（如统计定义变化后重新计算）时替换
+        """
+        table = self.get(result_id)
+        if table is not None and table.stats_version == (stats.get('version') if stats else None):
+            return table
+
+        table = ResultTable(df, stats)
+        self._remember(result_id, table)
+        try:
+            arrays = encode_frame(table.df, {'stats': stats} if stats else None)
+        except TypeError as e:
+            print(f"结果表未写入磁盘: {e}")
+            return table
+        path = self._path(result_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        return table
+
+    def get(self, result_id):
+        """获取结果表，内存中没有时从磁盘加载；不存在返回None，磁盘文件损坏时删除并返回None"""
+        with self._lock:
+            table = self._tables.get(result_id)
+            if table is not None:
+                self._tables.move_to_end(result_id)
+                return table
+        path = self._path(result_id)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                df, meta = decode_frame(data)
+        except CACHE_READ_ERRORS as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"读取结果表失败: {e}")
+                remove_file(path)
+            return None
+        table = ResultTable(df, meta.get('stats'))
+        self._remember(result_id, table)
+        return table
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# @File    : serve.py
+# @Time    : 2026/10/18
+# 生产环境启动入口：先导入pandas等耗时的模块并创建应用，再fork工作进程，各进程以写时复制方式共享这部分内存；
+# 安装了gunicorn时使用gunicorn（gthread工作进程），否则使用内置的预fork多线程服务器
+# 多个工作进程时，会话存储默认改为SQLite，任务状态写入共用目录，任一进程都能查询和取消任务，准入限制在共用账本中合计
+#
+# 用法：python serve.py [--host 0.0.0.0] [--port 5000] [--workers N] [--threads N] [--server auto|gunicorn|builtin]
+
+import argparse
+import gc
+import importlib.util
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler, select_address_family
+
+from lazy import preload
+
+SERVER_AUTO = 'auto'
+SERVER_GUNICORN = 'gunicorn'
+SERVER_BUILTIN = 'builtin'
+
+
+def configure_environment(workers):
+    """多个工作进程时，会话和任务状态需在进程间共享；须在导入app之前调用"""
+    if workers <= 1:
+        return
+    os.environ.setdefault('GRADE_SESSION_BACKEND', 'sqlite')
+    os.environ.setdefault('GRADE_JOB_STATE_DIR', os.path.join('cache', 'jobs'))
+    if os.environ['GRADE_SESSION_BACKEND'] == 'memory':
+        raise SystemExit('多个工作进程不能使用memory会话存储，请设置 GRADE_SESSION_BACKEND=sqlite')
+
+
+def load_application():
+    """预先导入耗时的模块并创建应用；冻结此时的对象，避免fork后垃圾回收触碰共享内存页"""
+    loaded = preload()
+    import app as app_module
+    gc.collect()
+    gc.freeze()
+    print(f"已预先导入: {', '.join(loaded)}")
+    return app_module.app
+
+
+class _RequestHandler(WSGIRequestHandler):
+    # 不保持连接，避免空闲连接占用线程池
+    protocol_version = 'HTTP/1.0'
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """以固定大小的线程池处理请求的WSGI服务器；fd为已监听的套接字（预fork时由主进程创建）"""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=8, fd=None):
+        super().__init__(host, port, app, handler=_RequestHandler, fd=fd)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def serve_forever(self, poll_interval=0.5):
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            # 停止后等待处理中的请求完成
+            self._pool.shutdown(wait=True)
+
+
+def _serve_worker(app, host, port, threads, fd):
+    """工作进程：收到SIGTERM时停止接受新请求，处理完当前请求后退出"""
+    server = PooledWSGIServer(host, port, app, threads=threads, fd=fd)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server.serve_forever()
+
+
+def run_builtin(app, host, port, workers, threads):
+    """内置服务器：主进程监听端口并fork workers个工作进程，工作进程异常退出时重新启动"""
+    if workers <= 1 or not hasattr(os, 'fork'):
+        print(f"监听 http://{host}:{port}（单进程，{threads}个线程）")
+        PooledWSGIServer(host, port, app, threads=threads).serve_forever()
+        return
+
+    listener = socket.create_server((host, port), family=select_address_family(host, port), backlog=1024)
+    listener.set_inheritable(True)
+    print(f"监听 http://{host}:{port}（{workers}个工作进程，每个{threads}个线程）")
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve_worker(app, host, port, threads, listener.fileno())
+            except BaseException as e:
+                print(f"工作进程 {os.getpid()} 异常退出: {e}", file=sys.stderr)
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"工作进程 {pid} 已退出，重新启动", file=sys.stderr)
+            time.sleep(1)
+            spawn()
+    listener.close()
+
+
+def run_gunicorn(host, port, workers, threads):
+    """使用gunicorn（gthread工作进程，preload_app）"""
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in {'bind': f'{host}:{port}', 'workers': workers, 'threads': threads,
+                               'worker_class': 'gthread', 'preload_app': True, 'timeout': 120}.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_application()
+
+    Application().run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='以生产模式启动成绩分析Web服务')
+    parser.add_argument('--host', default=os.environ.get('GRADE_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('GRADE_PORT', '5000')))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('GRADE_WEB_WORKERS', os.cpu_count() or 1)),
+                        help='工作进程数，默认为CPU核数')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('GRADE_WEB_THREADS', '8')),
+                        help='每个工作进程处理请求的线程数')
+    parser.add_argument('--server', choices=(SERVER_AUTO, SERVER_GUNICORN, SERVER_BUILTIN), default=SERVER_AUTO,
+                        help='auto：安装了gunicorn时使用gunicorn，否则使用内置服务器')
+    args = parser.parse_args(argv)
+
+    configure_environment(args.workers)
+    server = args.server
+    if server == SERVER_AUTO:
+        server = SERVER_GUNICORN if importlib.util.find_spec('gunicorn') else SERVER_BUILTIN
+    if server == SERVER_GUNICORN:
+        run_gunicorn(args.host, args.port, args.workers, args.threads)
+    else:
+        run_builtin(load_application(), args.host, args.port, args.workers, args.threads)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# @File    : session_store.py
+# @Time    : 2026/10/18
+# 服务端会话存储：会话数据（上传文件列表、分析结果信息等）保存在服务端，Cookie中只保存随机的会话ID；
+# 存储后端可选进程内LRU（默认）或SQLite（多个工作进程共用），按会话ID直接查找
+
+import copy
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+BACKEND_MEMORY = 'memory'
+BACKEND_SQLITE = 'sqlite'
+BACKEND_COOKIE = 'cookie'
+BACKENDS = (BACKEND_MEMORY, BACKEND_SQLITE, BACKEND_COOKIE)
+
+# 会话ID：secrets.token_urlsafe(32)
+SESSION_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{43}')
+
+
+class MemorySessionStore:
+    """
+    进程内会话存储
+    保留最近使用的capacity个会话，超过ttl秒未使用的会话失效；仅适用于单进程部署
+    """
+
+    def __init__(self, capacity=10000, ttl=24 * 3600):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def get(self, sid):
+        """会话数据的副本（与其他后端一致，请求中的修改在put之前不影响存储的会话），不存在或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            item = self._sessions.get(sid)
+            if item is None:
+                return None
+            if now - item[1] > self.ttl:
+                del self._sessions[sid]
+                return None
+            item[1] = now
+            self._sessions.move_to_end(sid)
+            data = item[0]
+        return copy.deepcopy(data)
+
+    def put(self, sid, data):
+        data = copy.deepcopy(data)
+        with self._lock:
+            self._sessions[sid] = [data, time.time()]
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.capacity:
+                self._sessions.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def stats(self):
+        with self._lock:
+            return {'backend': BACKEND_MEMORY, 'sessions': len(self._sessions), 'capacity': self.capacity,
+                    'ttl': self.ttl, 'evictions': self._evictions}
+
+
+class SQLiteSessionStore:
+    """
+    SQLite会话存储，多个工作进程共用同一数据库文件
+    会话数据以JSON保存；超过ttl秒未使用的会话失效，最近使用时间每touch_interval秒最多更新一次；
+    每个线程使用各自的连接（fork后的子进程中重新连接）
+    """
+
+    def __init__(self, db_path, ttl=24 * 3600, touch_interval=60, purge_interval=600):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        # 建表使用临时连接，不把打开的连接留给fork出的工作进程
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            with conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS sessions '
+                             '(id TEXT PRIMARY KEY, data TEXT NOT NULL, accessed REAL NOT NULL)')
+        finally:
+            conn.close()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, sid):
+        """会话数据，不存在或已过期返回None"""
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute('SELECT data, accessed FROM sessions WHERE id = ?', (sid,)).fetchone()
+        if row is None:
+            return None
+        data, accessed = row
+        if now - accessed > self.ttl:
+            with conn:
+                conn.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+            return None
+        if now - accessed > self.touch_interval:
+            with conn:
+                conn.execute('UPDATE sessions SET accessed = ? WHERE id = ?', (now, sid))
+        return json.loads(data)
+
+    def put(self, sid, data):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (id, data, accessed) VALUES (?, ?, ?)',
+                         (sid, json.dumps(data, ensure_ascii=False), now))
+            if now - self._last_purge > self.purge_interval:
+                self._last_purge = now
+                conn.execute('DELETE FROM sessions WHERE accessed < ?', (now - self.ttl,))
+
+    def delete(self, sid):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+
+    def stats(self):
+        count = self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        return {'backend': BACKEND_SQLITE, 'sessions': count, 'ttl': self.ttl, 'db_path': self.db_path}
+
+
+def create_session_store(backend, db_path=None, ttl=24 * 3600, capacity=10000):
+    """按后端名称创建会话存储；cookie后端（Flask默认的签名Cookie会话）返回None"""
+    if backend == BACKEND_MEMORY:
+        return MemorySessionStore(capacity=capacity, ttl=ttl)
+    if backend == BACKEND_SQLITE:
+        return SQLiteSessionStore(db_path, ttl=ttl)
+    if backend == BACKEND_COOKIE:
+        return None
+    raise ValueError(f"未知的会话存储后端: {backend}，可选: {', '.join(BACKENDS)}")
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """服务端会话，修改后在请求结束时写回存储"""
+
+    def __init__(self, initial=None, sid=None):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Flask会话接口：Cookie中只保存会话ID，会话数据读写store
+    会话内嵌套的列表、字典需整体重新赋值才会被保存（与Flask默认会话相同）
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SESSION_ID_PATTERN.fullmatch(sid):
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            # 会话被清空时删除存储的数据和Cookie
+            if session.modified and session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+        if not session.modified:
+            return
+
+        new = session.sid is None
+        if new:
+            session.sid = secrets.token_urlsafe(32)
+        self.store.put(session.sid, dict(session))
+        if new:
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+        response.vary.add('Cookie')
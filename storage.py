@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+# @File    : storage.py
+# @Time    : 2026/10/18
+# 存储生命周期管理：清理过期的会话上传目录和不再使用的结果文件，总占用超过配额时按最近使用时间淘汰；
+# 由进程内的后台线程定期执行，仍被活跃会话引用的结果不会被清理
+#
+# 管理的文件：
+#   uploads/<会话ID>/           会话上传目录，最近使用时间为目录的修改时间（会话有请求时更新）
+#   uploads/.incoming/          上传临时文件
+#   results/tables/<结果ID>.npz  结果表
+#   results/exports/<结果ID>.*   导出文件
+#   results/成绩分析结果_*.xlsx   旧版本生成的结果文件
+# 会话引用的结果记录在会话目录下的REFS_FILE中，多个进程共用同一目录时也能识别；
+# 多个工作进程各自运行清理线程，同一时间只有一个进程执行清理（上传目录下SWEEP_LOCK_FILE的文件锁）
+
+import contextlib
+import heapq
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import REGISTRY
+
+try:
+    import fcntl
+except ImportError:
+    # Windows下没有fcntl，只在进程内互斥（该平台不使用预fork多进程部署）
+    fcntl = None
+
+# 会话目录中记录所引用结果的文件
+REFS_FILE = '.results'
+# 跨进程清理锁文件（位于上传目录下，以.开头，不计入会话目录）
+SWEEP_LOCK_FILE = '.sweep.lock'
+# 上传和导出的临时文件超过该时间（秒）未完成时视为残留
+STALE_TMP_SECONDS = 3600
+
+AREA_UPLOADS = 'uploads'
+AREA_RESULTS = 'results'
+REASON_TTL = 'ttl'
+REASON_QUOTA = 'quota'
+
+KIND_SESSION = 'session'
+KIND_RESULT = 'result'
+KIND_TMP = 'tmp'
+
+STORAGE_BYTES = REGISTRY.gauge('grade_storage_bytes', '上传目录和结果目录占用的字节数', labelnames=('area',))
+STORAGE_SESSIONS = REGISTRY.gauge('grade_storage_sessions', '会话上传目录数')
+EVICTED_FILES = REGISTRY.counter('grade_storage_evicted_files_total', '清理的文件数', labelnames=('reason',))
+EVICTED_BYTES = REGISTRY.counter('grade_storage_evicted_bytes_total', '清理的字节数', labelnames=('reason',))
+SWEEP_SECONDS = REGISTRY.histogram('grade_storage_sweep_seconds', '一次存储清理的耗时（秒）')
+
+
+def _is_tmp(name):
+    return name.endswith('.tmp') or '.tmp.' in name
+
+
+def result_name(filename):
+    """结果文件对应的结果名：结果表和导出文件为结果ID，旧版本结果文件为文件名"""
+    if filename.endswith('.xlsx') and filename.startswith('成绩分析结果_'):
+        return filename
+    return filename.split('.', 1)[0]
+
+
+class StorageManager:
+    """
+    存储生命周期管理器
+    ttl: 会话目录及未被引用的结果文件的保留时间（秒）；quota_bytes: 总占用上限，0为不限制；
+    min_idle: 配额不足时，会话目录至少闲置该时间（秒）才会被淘汰；touch_interval: 更新会话最近使用时间的最小间隔（秒）
+    """
+
+    def __init__(self, upload_dir, results_dir, ttl=24 * 3600, quota_bytes=0, min_idle=3600,
+                 touch_interval=60, sweep_interval=300):
+        self.upload_dir = upload_dir
+        self.results_dir = results_dir
+        self.ttl = ttl
+        self.quota_bytes = quota_bytes
+        self.min_idle = min_idle
+        self.touch_interval = touch_interval
+        self.sweep_interval = sweep_interval
+        self._touched = OrderedDict()
+        self._touch_lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def session_dir(self, session_id):
+        return os.path.join(self.upload_dir, session_id)
+
+    def touch(self, session_id, refs=()):
+        """
+        记录会话的使用：更新会话目录的修改时间，并记录会话引用的结果（结果ID或旧版本结果文件名）；
+        引用未变化时每touch_interval秒最多更新一次；会话目录不存在时不做处理
+        """
+        refs = sorted(set(ref for ref in refs if ref))
+        now = time.time()
+        with self._touch_lock:
+            last = self._touched.get(session_id)
+            if last is not None and last[1] == refs and now - last[0] < self.touch_interval:
+                return
+            self._touched[session_id] = (now, refs)
+            self._touched.move_to_end(session_id)
+            while len(self._touched) > 10000:
+                self._touched.popitem(last=False)
+
+        session_dir = self.session_dir(session_id)
+        try:
+            if last is None or last[1] != refs:
+                refs_path = os.path.join(session_dir, REFS_FILE)
+                tmp_path = f"{refs_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(refs, f)
+                os.replace(tmp_path, refs_path)
+            os.utime(session_dir, (now, now))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _read_refs(session_dir):
+        try:
+            with open(os.path.join(session_dir, REFS_FILE), encoding='utf-8') as f:
+                return [str(ref) for ref in json.load(f)]
+        except (OSError, ValueError, TypeError):
+            return []
+
+    @staticmethod
+    def _files(directory):
+        """目录下的文件 (路径, 字节数, 修改时间)；目录不存在时为空"""
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return []
+        files = []
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((entry.path, stat.st_size, stat.st_mtime))
+            except FileNotFoundError:
+                continue
+        return files
+
+    def _scan(self):
+        """扫描管理的文件，返回清理单元列表（会话目录、结果文件、临时文件）"""
+        units = []
+        incoming = os.path.join(self.upload_dir, '.incoming')
+        for path, size, mtime in self._files(incoming):
+            units.append({'kind': KIND_TMP, 'path': path, 'bytes': size, 'files': 1, 'last_used': mtime,
+                          'area': AREA_UPLOADS})
+        try:
+            entries = list(os.scandir(self.upload_dir))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                last_used = entry.stat(follow_symlinks=False).st_mtime
+            except FileNotFoundError:
+                continue
+            files = self._files(entry.path)
+            units.append({'kind': KIND_SESSION, 'path': entry.path, 'bytes': sum(f[1] for f in files),
+                          'files': len(files), 'last_used': last_used, 'area': AREA_UPLOADS,
+                          'refs': self._read_refs(entry.path)})
+
+        for directory in (self.results_dir, os.path.join(self.results_dir, 'tables'),
+                          os.path.join(self.results_dir, 'exports')):
+            for path, size, mtime in self._files(directory):
+                name = os.path.basename(path)
+                if directory == self.results_dir and result_name(name) != name:
+                    continue
+                units.append({'kind': KIND_TMP if _is_tmp(name) else KIND_RESULT, 'path': path, 'bytes': size,
+                              'files': 1, 'last_used': mtime, 'area': AREA_RESULTS, 'name': result_name(name)})
+        return units
+
+    def _remove(self, unit, reason):
+        try:
+            if unit['kind'] == KIND_SESSION:
+                shutil.rmtree(unit['path'])
+            else:
+                os.remove(unit['path'])
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"清理 {unit['path']} 失败: {e}")
+            return False
+        with self._touch_lock:
+            if unit['kind'] == KIND_SESSION:
+                self._touched.pop(os.path.basename(unit['path']), None)
+        EVICTED_FILES.inc(unit['files'], reason=reason)
+        EVICTED_BYTES.inc(unit['bytes'], reason=reason)
+        return True
+
+    @contextlib.contextmanager
+    def _process_lock(self):
+        """跨进程的清理锁（非阻塞），取得时为True，其他进程正在清理时为False；没有fcntl时总为True"""
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(self.upload_dir, exist_ok=True)
+        with open(os.path.join(self.upload_dir, SWEEP_LOCK_FILE), 'a') as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def sweep(self, now=None):
+        """
+        执行一次清理：
+        1. 删除超过ttl未使用的会话目录、残留的临时文件，以及超过ttl未修改且未被活跃会话引用的结果文件
+        2. 总占用仍超过配额时，按最近使用时间从早到晚淘汰未被引用的结果文件和闲置超过min_idle的会话目录
+        返回本次清理的统计信息；其他进程正在清理同一目录时跳过本次清理，返回None
+        """
+        with self._sweep_lock, self._process_lock() as locked:
+            if not locked:
+                return None
+            return self._sweep(now)
+
+    def _sweep(self, now):
+        """执行清理（调用方持有清理锁）"""
+        with SWEEP_SECONDS.time():
+            start = time.perf_counter()
+            now = time.time() if now is None else now
+            units = self._scan()
+            evicted = {REASON_TTL: [0, 0], REASON_QUOTA: [0, 0]}
+
+            def evict(unit, reason):
+                if self._remove(unit, reason):
+                    evicted[reason][0] += unit['files']
+                    evicted[reason][1] += unit['bytes']
+                    return True
+                return False
+
+            kept = []
+            for unit in units:
+                age = now - unit['last_used']
+                if unit['kind'] == KIND_SESSION and age > self.ttl:
+                    evict(unit, REASON_TTL)
+                elif unit['kind'] == KIND_TMP and age > STALE_TMP_SECONDS:
+                    evict(unit, REASON_TTL)
+                else:
+                    kept.append(unit)
+
+            # 活跃会话引用的结果（引用计数）
+            refs = {}
+            for unit in kept:
+                for name in unit.get('refs', ()):
+                    refs[name] = refs.get(name, 0) + 1
+
+            units, kept = kept, []
+            for unit in units:
+                if (unit['kind'] == KIND_RESULT and not refs.get(unit['name'])
+                        and now - unit['last_used'] > self.ttl):
+                    evict(unit, REASON_TTL)
+                else:
+                    kept.append(unit)
+
+            total = sum(unit['bytes'] for unit in kept)
+            if self.quota_bytes and total > self.quota_bytes:
+                # 可淘汰的单元按最近使用时间进入堆；被引用的结果在引用它的会话目录全部淘汰后才进入
+                candidates = []
+                protected = {}
+                for seq, unit in enumerate(kept):
+                    if unit['kind'] == KIND_RESULT and refs.get(unit['name']):
+                        protected.setdefault(unit['name'], []).append((unit['last_used'], seq, unit))
+                    elif unit['kind'] == KIND_RESULT or (unit['kind'] == KIND_SESSION
+                                                          and now - unit['last_used'] >= self.min_idle):
+                        candidates.append((unit['last_used'], seq, unit))
+                heapq.heapify(candidates)
+                removed = set()
+                while total > self.quota_bytes and candidates:
+                    _, seq, unit = heapq.heappop(candidates)
+                    if not evict(unit, REASON_QUOTA):
+                        continue
+                    removed.add(seq)
+                    total -= unit['bytes']
+                    for name in unit.get('refs', ()):
+                        refs[name] -= 1
+                        if not refs[name]:
+                            for item in protected.pop(name, ()):
+                                heapq.heappush(candidates, item)
+                kept = [unit for seq, unit in enumerate(kept) if seq not in removed]
+
+            usage = {AREA_UPLOADS: 0, AREA_RESULTS: 0}
+            for unit in kept:
+                usage[unit['area']] += unit['bytes']
+            for area, used in usage.items():
+                STORAGE_BYTES.set(used, area=area)
+            sessions = sum(1 for unit in kept if unit['kind'] == KIND_SESSION)
+            STORAGE_SESSIONS.set(sessions)
+            self._last_sweep = {
+                'time': now,
+                'seconds': round(time.perf_counter() - start, 4),
+                'bytes': usage,
+                'total_bytes': sum(usage.values()),
+                'sessions': sessions,
+                'protected_results': sum(1 for count in refs.values() if count > 0),
+                'evicted_files': {reason: counts[0] for reason, counts in evicted.items()},
+                'evicted_bytes': {reason: counts[1] for reason, counts in evicted.items()},
+                'over_quota': bool(self.quota_bytes) and sum(usage.values()) > self.quota_bytes,
+            }
+            return self._last_sweep
+
+    def start(self):
+        """按需启动后台清理线程（sweep_interval大于0时）；fork后的子进程中重新启动"""
+        if not self.sweep_interval or self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='storage-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"存储清理失败: {e}")
+            if self._stop.wait(self.sweep_interval):
+                return
+
+    def stats(self):
+        """存储配置、上一次清理的统计信息及累计清理量"""
+        return {
+            'ttl': self.ttl,
+            'quota_bytes': self.quota_bytes,
+            'sweep_interval': self.sweep_interval,
+            'last_sweep': self._last_sweep,
+            'evicted_files_total': {reason: EVICTED_FILES.value(reason=reason)
+                                    for reason in (REASON_TTL, REASON_QUOTA)},
+            'evicted_bytes_total': {reason: EVICTED_BYTES.value(reason=reason)
+                                    for reason in (REASON_TTL, REASON_QUOTA)},
+        }
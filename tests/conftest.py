@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# @File    : conftest.py
+# @Time    : 2026/10/18
+# 测试公共设置：模块从仓库根目录导入，合成数据使用benchmarks/synthetic.py
+
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+
+SAMPLES_DIR = os.path.join(ROOT_DIR, 'static', 'samples')
+SAMPLE_GRADE_FILE = os.path.join(SAMPLES_DIR, '课程成绩-示例.xlsx')
+SAMPLE_MAIN_COURSE_FILE = os.path.join(SAMPLES_DIR, '主要课程列表-示例.xlsx')
+
+
+def analyze(grade_paths, main_path, **options):
+    """以给定选项分析，返回 (分析器, 结果表)，不输出处理过程"""
+    from grade_analyzer import GradeAnalyzer
+
+    analyzer = GradeAnalyzer(**options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.load_main_courses(main_path)
+        results = analyzer.process_combined_data(grade_paths)
+    return analyzer, results
+
+
+def corrupt_file(path, mode):
+    """按mode损坏文件（.npz缓存等）：截断、改写中间的字节或整个替换为非zip内容"""
+    with open(path, 'rb') as f:
+        raw = bytearray(f.read())
+    if mode == 'truncated':
+        raw = raw[:len(raw) // 2]
+    elif mode == 'flipped':
+        for i in range(len(raw) // 4, len(raw) // 2):
+            raw[i] ^= 0xff
+    else:
+        raw = b'not a zip file'
+    with open(path, 'wb') as f:
+        f.write(raw)
+
+
+@pytest.fixture(scope='session')
+def synthetic_dataset(tmp_path_factory):
+    """三个学期的合成数据：文字成绩、空白单元格和少量无法识别的成绩"""
+    from synthetic import generate_dataset
+
+    return generate_dataset(str(tmp_path_factory.mktemp('synthetic')), 300, semesters=3, courses=40,
+                            text_ratio=0.3, seed=7)
+
+
+@pytest.fixture(scope='session')
+def web_app(tmp_path_factory):
+    """在临时目录中导入app模块（上传、结果和缓存目录为相对路径），关闭后台清理和预热"""
+    work_dir = tmp_path_factory.mktemp('app')
+    previous = os.getcwd()
+    os.environ['GRADE_STORAGE_SWEEP_INTERVAL'] = '0'
+    os.environ['GRADE_WARM_IMPORTS'] = '0'
+    os.chdir(work_dir)
+    try:
+        import app
+        yield app
+    finally:
+        os.chdir(previous)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# @File    : reference.py
+# @Time    : 2026/10/18
+# 原始实现（逐行处理）的参考版本，用作结果的基准：只依赖pandas，不使用仓库中的任何辅助函数
+# （成绩换算、课程列解析、主要课程匹配、学号规范化），以便发现这些辅助函数的回归；
+# 其他课程门数改为参数limit（原始实现固定为4）
+
+import re
+
+import pandas as pd
+
+RESULT_COLUMNS = ['学号', '姓名', '年级', '修读课程数', '总学分', '学分加权平均分', '课程详情']
+
+
+def reference_main_courses(main_course_path):
+    """原始实现的主要课程列表加载"""
+    df = pd.read_excel(main_course_path)
+    courses = df['主要课程'].tolist() if '主要课程' in df.columns else []
+    return [str(course).strip() for course in courses if pd.notna(course)]
+
+
+def reference_score(grade, level):
+    """原始实现的成绩换算"""
+    if pd.isna(grade):
+        return 0
+    if isinstance(grade, str):
+        grade = grade.strip()
+        level_grades = [[95, 85, 75, 65, 55], [90, 80, 70, 60, 50]]
+        texts = ['优秀', '良好', '中等', '及格', '不及格']
+        if grade in texts:
+            return level_grades[1 if level >= 2023 else 0][texts.index(grade)]
+        try:
+            return float(grade)
+        except ValueError:
+            return 0
+    score = float(grade)
+    if score > 100:
+        return 0
+    return score if score > 0 else 0
+
+
+def reference_analysis(grade_paths, main_courses, limit=4):
+    """原始实现：按原始学号合并各文件的学生，其他课程取成绩最高的limit门，结果按学分加权平均分降序"""
+    students = {}
+    for file_idx, path in enumerate(grade_paths, start=1):
+        df = pd.read_excel(path)
+        id_col = next(col for col in df.columns if '学号' in str(col))
+        level_col = next(col for col in df.columns if '年级' in str(col))
+        name_col = next(col for col in df.columns if '姓名' in str(col))
+        course_cols = []
+        for col in df.columns:
+            match = re.search(r'【(\d+\.?\d*)】', str(col))
+            if match and float(match.group(1)) > 0:
+                course_cols.append((col, float(match.group(1))))
+        for _, row in df.iterrows():
+            student_id = row[id_col]
+            if pd.isna(student_id):
+                continue
+            level = int(str(row[level_col]).strip())
+            if student_id not in students:
+                name = row[name_col] if not pd.isna(row[name_col]) else f"学生{student_id}"
+                students[student_id] = {'name': name, 'level': level, 'courses': {}}
+            for col, credits in course_cols:
+                score = reference_score(row[col], level)
+                if score > 0:
+                    name = str(col).split('【')[0].strip()
+                    students[student_id]['courses'][f"{name}_{file_idx}"] = (name, score, credits)
+
+    results = []
+    for student_id, data in students.items():
+        major, other = [], []
+        for course in data['courses'].values():
+            (major if any(main in course[0] for main in main_courses) else other).append(course)
+        other.sort(key=lambda course: course[1], reverse=True)
+        selected = [(course, '主要课程') for course in major] + [(course, '其他课程') for course in other[:limit]]
+        total = sum(score * credits for (_, score, credits), _ in selected)
+        credits_sum = sum(credits for (_, _, credits), _ in selected)
+        results.append({
+            '学号': student_id,
+            '姓名': data['name'],
+            '年级': data['level'],
+            '修读课程数': len(selected),
+            '总学分': credits_sum,
+            '学分加权平均分': round(total / credits_sum if credits_sum > 0 else 0, 2),
+            '课程详情': '; '.join(f"{name}({score}分,{credits}学分)[{kind}]"
+                              for (name, score, credits), kind in selected),
+        })
+    df = pd.DataFrame(results, columns=RESULT_COLUMNS)
+    return df.sort_values(by='学分加权平均分', ascending=False)
+
+
+def by_student(df):
+    """按学号排列（学分加权平均分相同的学生在原始实现中的先后顺序不固定）"""
+    return df.sort_values('学号', key=lambda ids: ids.astype(str), kind='stable').reset_index(drop=True)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# @File    : test_admission.py
+# @Time    : 2026/10/18
+# 准入控制：进程内计数与多个工作进程共用的SQLite账本
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from admission import (REASON_BUSY, REASON_SESSION, AdmissionGate, AdmissionLedger, AdmissionRejected,
+                       SQLiteAdmissionLedger)
+from jobs import JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobQueue, QueueFull
+
+
+@pytest.fixture(params=['local', 'shared'])
+def ledgers(request, tmp_path):
+    """两个“进程”各自的账本：进程内账本为同一个对象，共用账本为同一数据库文件的两个实例"""
+    if request.param == 'local':
+        ledger = AdmissionLedger()
+        return ledger, ledger
+    path = str(tmp_path / 'admission.sqlite3')
+    return SQLiteAdmissionLedger(path), SQLiteAdmissionLedger(path)
+
+
+def reason(gate, session_id=None, cost=0):
+    """进入gate的结果：拒绝原因，进入时为None"""
+    try:
+        with gate.admit(session_id, cost):
+            return None
+    except AdmissionRejected as e:
+        return e.reason
+
+
+def test_gate_limits_across_ledger_instances(ledgers):
+    first = AdmissionGate('upload', 2, per_session=1, max_cost=100, max_wait=0.3, ledger=ledgers[0])
+    second = AdmissionGate('upload', 2, per_session=1, max_cost=100, max_wait=0.3, ledger=ledgers[1])
+    with first.admit('s1', cost=60):
+        assert reason(second, 's1') == REASON_SESSION
+        # 在途代价之和超出上限
+        assert reason(second, 's2', cost=60) == REASON_BUSY
+        with second.admit('s2', cost=40):
+            # 并发数已满
+            assert reason(first, 's3') == REASON_BUSY
+            assert first.stats()['active'] == second.stats()['active'] == 2
+            assert second.stats()['cost'] == 100
+    assert reason(second, 's1', cost=60) is None
+    assert first.stats()['active'] == 0
+
+
+def test_waiting_request_enters_after_release_in_other_instance(ledgers):
+    first = AdmissionGate('upload', 1, ledger=ledgers[0])
+    second = AdmissionGate('upload', 1, max_wait=5, ledger=ledgers[1])
+    entered = threading.Event()
+    with first.admit('s1'):
+        def wait():
+            with second.admit('s2'):
+                entered.set()
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.3)
+        assert not entered.is_set()
+    waiter.join(5)
+    assert entered.is_set()
+
+
+def _hold_lease(db_path, ready):
+    gate = AdmissionGate('upload', 1, ledger=SQLiteAdmissionLedger(db_path))
+    with gate.admit('child'):
+        ready.set()
+        time.sleep(60)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='需要fork')
+def test_leases_of_exited_process_are_released(tmp_path):
+    db_path = str(tmp_path / 'admission.sqlite3')
+    context = multiprocessing.get_context('fork')
+    ready = context.Event()
+    child = context.Process(target=_hold_lease, args=(db_path, ready))
+    child.start()
+    try:
+        assert ready.wait(10)
+        gate = AdmissionGate('upload', 1, max_wait=0.3, ledger=SQLiteAdmissionLedger(db_path))
+        assert reason(gate, 'parent') == REASON_BUSY
+        assert gate.stats()['active'] == 1
+    finally:
+        # 进程被强制结束，没有释放名额
+        os.kill(child.pid, signal.SIGKILL)
+        child.join()
+    assert reason(gate, 'parent') is None
+    assert gate.stats()['active'] == 0
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def shared_ledgers(tmp_path):
+    """两个“进程”各自打开同一数据库文件（进程内账本只属于一个任务队列，其结束的任务只通知本队列）"""
+    path = str(tmp_path / 'admission.sqlite3')
+    return SQLiteAdmissionLedger(path), SQLiteAdmissionLedger(path)
+
+
+@pytest.fixture
+def queues(shared_ledgers):
+    """两个“进程”的任务队列，同时运行的任务数合计为1"""
+    created = [JobQueue(workers=1, max_queued=2, max_per_owner=1, memory_budget=100, ledger=ledger)
+               for ledger in shared_ledgers]
+    releases = []
+    yield created, releases
+    for release in releases:
+        release.set()
+
+
+def blocking_task(releases):
+    release = threading.Event()
+    releases.append(release)
+    return lambda job: release.wait(10) and 'done'
+
+
+def test_job_limits_across_queues(queues):
+    (first, second), releases = queues
+    running = first.submit(blocking_task(releases), owner='s1', cost=10)
+    assert wait_for(lambda: running.status == JOB_RUNNING)
+
+    with pytest.raises(QueueFull) as info:
+        second.submit(blocking_task(releases), owner='s1')
+    assert info.value.reason == REASON_SESSION
+
+    waiting = second.submit(blocking_task(releases), owner='s2', cost=10)
+    time.sleep(0.5)
+    # 同时运行的任务数合计已满，另一个队列的任务排队
+    assert waiting.status == JOB_QUEUED
+    stats = second.stats()
+    assert (stats['running'], stats['queued'], stats['reserved_bytes']) == (1, 1, 10)
+
+    second.submit(blocking_task(releases), owner='s3')
+    with pytest.raises(QueueFull) as info:
+        first.submit(blocking_task(releases), owner='s4')
+    assert info.value.reason == 'queue'
+
+    releases[0].set()
+    assert wait_for(lambda: running.status == JOB_SUCCEEDED)
+    assert wait_for(lambda: waiting.status == JOB_RUNNING)
+
+
+def test_memory_budget_and_order_across_queues(shared_ledgers):
+    first = JobQueue(workers=2, max_queued=4, memory_budget=100, ledger=shared_ledgers[0])
+    second = JobQueue(workers=2, max_queued=4, memory_budget=100, ledger=shared_ledgers[1])
+    releases = []
+    try:
+        big = first.submit(blocking_task(releases), cost=80)
+        assert wait_for(lambda: big.status == JOB_RUNNING)
+        # 放不下的任务排队，之后提交的小任务不越过它
+        medium = second.submit(blocking_task(releases), cost=50)
+        small = first.submit(blocking_task(releases), cost=10)
+        time.sleep(0.5)
+        assert (medium.status, small.status) == (JOB_QUEUED, JOB_QUEUED)
+
+        releases[0].set()
+        assert wait_for(lambda: medium.status == JOB_RUNNING and small.status == JOB_RUNNING)
+        assert second.stats()['reserved_bytes'] == 60
+    finally:
+        for release in releases:
+            release.set()
+
+
+def test_state_prune_keeps_ledger(tmp_path):
+    db_path = tmp_path / 'admission.sqlite3'
+    queue = JobQueue(workers=1, retention=0, state_dir=str(tmp_path), ledger=SQLiteAdmissionLedger(str(db_path)))
+    job = queue.submit(lambda job: 'done')
+    assert wait_for(lambda: job.status == JOB_SUCCEEDED)
+    time.sleep(0.05)
+    with queue._lock:
+        queue._last_state_prune = 0
+        queue._prune()
+    assert db_path.exists()
+    assert not (tmp_path / f'{job.id}.json').exists()
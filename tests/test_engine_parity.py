@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# @File    : test_engine_parity.py
+# @Time    : 2026/10/18
+# 向量化引擎与逐行引擎的结果一致性，以及两个引擎与原始实现（tests/reference.py）的结果一致性
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from conftest import SAMPLE_GRADE_FILE, SAMPLE_MAIN_COURSE_FILE, analyze
+from grade_analyzer import ENGINE_ROWS, ENGINE_VECTORIZED
+from reference import RESULT_COLUMNS, by_student, reference_analysis, reference_main_courses
+
+
+def assert_engines_equal(grade_paths, main_path, **options):
+    _, expected = analyze(grade_paths, main_path, engine=ENGINE_ROWS, **options)
+    _, actual = analyze(grade_paths, main_path, engine=ENGINE_VECTORIZED, **options)
+    pd.testing.assert_frame_equal(expected, actual, check_exact=True)
+    assert not actual.empty
+    return actual
+
+
+def write_edge_case_workbook(path):
+    """
+    空白、文字成绩（含首尾空白）、无法识别的成绩、文本学号与数字学号混用、超过100分的成绩、
+    学分为0或无学分的列、只有大小写不同的课程名称（为不同课程）
+    """
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['学号', '姓名', '年级', '高等数学（1） 【4.0】', '大学英语 【2.0】', '体育 【1.0】', '备注',
+                  'Java程序设计 【2.5】', 'java程序设计 【2.5】', '形势与政策 【0】', '军训【A】'])
+    sheet.append([2021001, '张三', 2021, 85, '优秀', None, None, 88, 77, 90, 90])
+    sheet.append(['2021002', '李四', 2022, None, ' 良好 ', '缓考', None, '中等', None, None, None])
+    sheet.append([2021003.0, '王五', 2023, '不及格', 59.5, '合格', None, None, '及格', 80, None])
+    sheet.append([2021004, '赵六', 2024, None, None, None, None, 101, None, None, None])
+    sheet.append([2021005, '孙七', 2021, '100', 0, -5, None, '  95 ', '优秀', None, None])
+    sheet.append([None, '无学号', 2021, 90, 90, 90, None, 90, 90, 90, 90])
+    workbook.save(path)
+
+
+def write_edge_main_courses(path):
+    """主要课程：首尾空白、只有大小写不同的课程名称不匹配"""
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in (['主要课程'], [' 高等数学 '], ['Java程序设计'], ['体育'], [None]):
+        sheet.append(row)
+    workbook.save(path)
+
+
+def test_samples():
+    assert_engines_equal([SAMPLE_GRADE_FILE], SAMPLE_MAIN_COURSE_FILE)
+
+
+def test_synthetic_semesters(synthetic_dataset):
+    grade_paths, main_path = synthetic_dataset
+    assert len(grade_paths) == 3
+    assert_engines_equal(grade_paths, main_path)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_edge_cases(tmp_path, synthetic_dataset, workers):
+    _, main_path = synthetic_dataset
+    edge_path = str(tmp_path / 'edge.xlsx')
+    write_edge_case_workbook(edge_path)
+    results = assert_engines_equal([edge_path, SAMPLE_GRADE_FILE], main_path, workers=workers)
+    assert {2021001, 2021002, 2021003} <= set(results['学号'])
+
+
+def assert_matches_reference(grade_paths, main_path, engine, **options):
+    """
+    与原始实现的结果逐列一致（按学号对齐），且按学分加权平均分降序排列；
+    两个引擎共用成绩换算、课程列解析和主要课程匹配等辅助函数，与独立的原始实现比较才能发现这些函数的回归
+    """
+    _, actual = analyze(grade_paths, main_path, engine=engine, **options)
+    expected = reference_analysis(grade_paths, reference_main_courses(main_path))
+    assert actual.columns.tolist() == RESULT_COLUMNS
+    assert actual['学分加权平均分'].is_monotonic_decreasing
+    pd.testing.assert_frame_equal(by_student(actual), by_student(expected), check_dtype=False, check_exact=True)
+
+
+@pytest.mark.parametrize('engine', [ENGINE_ROWS, ENGINE_VECTORIZED])
+def test_samples_match_reference(engine):
+    assert_matches_reference([SAMPLE_GRADE_FILE], SAMPLE_MAIN_COURSE_FILE, engine)
+
+
+@pytest.mark.parametrize('engine', [ENGINE_ROWS, ENGINE_VECTORIZED])
+def test_synthetic_semesters_match_reference(synthetic_dataset, engine):
+    grade_paths, main_path = synthetic_dataset
+    assert_matches_reference(grade_paths, main_path, engine)
+
+
+@pytest.mark.parametrize('engine, workers', [(ENGINE_ROWS, 1), (ENGINE_VECTORIZED, 1), (ENGINE_VECTORIZED, 2)])
+def test_edge_cases_match_reference(tmp_path, synthetic_dataset, engine, workers):
+    grade_paths, main_path = synthetic_dataset
+    edge_path = str(tmp_path / 'edge.xlsx')
+    write_edge_case_workbook(edge_path)
+    assert_matches_reference([edge_path, SAMPLE_GRADE_FILE], main_path, engine, workers=workers)
+
+    edge_main_path = str(tmp_path / 'edge_main.xlsx')
+    write_edge_main_courses(edge_main_path)
+    assert_matches_reference([edge_path, grade_paths[0]], edge_main_path, engine, workers=workers)
+
+
+@pytest.mark.parametrize('engine', [ENGINE_ROWS, ENGINE_VECTORIZED])
+def test_missing_name_placeholder(tmp_path, engine):
+    """
+    没有姓名时以 学生{学号} 代替；学号列有空单元格时读取为浮点数，原始实现为 学生2021001.0，
+    现按规范学号合并后与结果中的学号写法一致（见identity.canonical_student_id）
+    """
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['学号', '姓名', '年级', '高等数学 【4.0】'])
+    sheet.append([2021001, None, 2021, 90])
+    sheet.append([None, '无学号', 2021, 80])
+    path = str(tmp_path / 'grades.xlsx')
+    workbook.save(path)
+
+    _, results = analyze([path], SAMPLE_MAIN_COURSE_FILE, engine=engine)
+    assert results[['学号', '姓名']].values.tolist() == [[2021001, '学生2021001']]
+    assert reference_analysis([path], [])['姓名'].tolist() == ['学生2021001.0']
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# @File    : test_file_cache.py
+# @Time    : 2026/10/18
+# 成绩文件解析结果缓存：读写往返与损坏的缓存文件
+
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import corrupt_file
+from file_cache import ParsedFileCache
+
+
+def frames():
+    return (pd.DataFrame({'学号': [2021001, '2021002', 2021003.0], '成绩': [90.0, 85.5, float('nan')]}),
+            pd.DataFrame({'课程': ['高等数学', '体育'], '学分': [4.0, 1.0]}))
+
+
+def test_round_trip(tmp_path):
+    cache = ParsedFileCache(str(tmp_path))
+    cache.put('k', frames())
+    for cached, original in zip(cache.get('k'), frames()):
+        pd.testing.assert_frame_equal(cached, original)
+    assert cache.get('missing') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize('mode', ['truncated', 'flipped', 'garbage'])
+def test_corrupt_entry_is_a_miss(tmp_path, mode):
+    cache = ParsedFileCache(str(tmp_path))
+    cache.put('k', frames())
+    path = cache._path('k')
+    corrupt_file(path, mode)
+
+    assert cache.get('k') is None
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert not os.path.exists(path)
+
+    # 重新解析后写入的缓存可正常使用
+    cache.put('k', frames())
+    assert cache.get('k') is not None
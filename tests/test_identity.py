@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# @File    : test_identity.py
+# @Time    : 2026/10/18
+# 学号与课程标识规范化、跨文件合并及合并报告
+
+import math
+
+import numpy as np
+import pytest
+from openpyxl import Workbook
+
+from conftest import analyze
+from grade_analyzer import ENGINE_ROWS, ENGINE_VECTORIZED, MainCourseMatcher
+from identity import canonical_student_id, course_key, describe, merge_report, parse_course_header
+
+
+@pytest.mark.parametrize('value', [2021001, np.int64(2021001), 2021001.0, np.float64(2021001.0), '2021001',
+                                   ' 2021001 ', '2021001.0', '２０２１００１', '2021 001'])
+def test_student_id_variants(value):
+    assert canonical_student_id(value) == '2021001'
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None), (math.nan, None), ('', None), ('  ', None),
+    (2021001.5, '2021001.5'), ('A2021001', 'A2021001'), ('2021001.5', '2021001.5'),
+])
+def test_student_id_other_values(value, expected):
+    assert canonical_student_id(value) == expected
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('花卉栽培与环境 【1.0】', ('花卉栽培与环境', 1.0)),
+    ('体育【2】', ('体育', 2.0)),
+    ('  大学英语（1） 【2.0】  ', ('大学英语（1）', 2.0)),
+    # 课程名称为第一个【之前的文本，学分为第一个【数字】
+    ('专题【A】 【2.0】', ('专题', 2.0)),
+    ('高等数学 【４.０】', ('高等数学', 4.0)),
+    # 不是有效课程列
+    ('形势与政策 【0】', None), ('形势与政策 【0.0】', None), ('体育 【 2.0 】', None), ('体育 【２．０】', None),
+    ('学号', None), ('备注【无】', None), (None, None), (math.nan, None),
+])
+def test_parse_course_header(header, expected):
+    assert parse_course_header(header) == expected
+
+
+def test_course_key_ignores_only_whitespace():
+    assert course_key('礼行天下  仪见倾心') == course_key('礼行天下 仪见倾心') == course_key(' 礼行天下仪见倾心')
+    assert course_key('Java程序设计') != course_key('java程序设计')
+    assert course_key('高等数学（1）') != course_key('高等数学(1)')
+
+
+def test_main_course_matching_uses_course_name():
+    matcher = MainCourseMatcher(['Java程序设计', '高等数学'])
+    assert matcher.is_main_course('Java程序设计')
+    assert matcher.is_main_course('高等数学（1）')
+    assert not matcher.is_main_course('java程序设计')
+    assert not matcher.is_main_course('高等 数学')
+
+
+def write_workbook(path, headers, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def write_main_courses(path, names):
+    return write_workbook(path, ['主要课程'], [[name] for name in names])
+
+
+@pytest.mark.parametrize('engine', [ENGINE_ROWS, ENGINE_VECTORIZED])
+def test_duplicate_course_columns_within_file(tmp_path, engine):
+    grade_path = write_workbook(
+        tmp_path / 'grades.xlsx',
+        ['学号', '姓名', '年级', '礼行天下  仪见倾心 【1.0】', 'Java程序设计 【2.5】', '礼行天下 仪见倾心 【1.0】',
+         'java程序设计 【2.5】'],
+        [[2021001, '张三', 2021, 70, 80, 90, 60]])
+    main_path = write_main_courses(tmp_path / 'main.xlsx', ['Java程序设计'])
+    analyzer, results = analyze([grade_path], main_path, engine=engine)
+
+    row = results.iloc[0]
+    # 只有空白不同的两列为同一课程，取最后一列的成绩；大小写不同的为两门课程，只有原文匹配的为主要课程
+    assert row['修读课程数'] == 3
+    details = row['课程详情'].split('; ')
+    assert 'Java程序设计(80.0分,2.5学分)[主要课程]' in details
+    assert 'java程序设计(60.0分,2.5学分)[其他课程]' in details
+    assert sum(item.startswith('礼行天下') for item in details) == 1
+    assert any(item.startswith('礼行天下') and '(90.0分' in item for item in details)
+
+    report = analyzer.merge_report
+    assert report['course_columns'] == 4
+    assert report['duplicate_courses'] == 1
+    assert report['course_variants'] == 1
+
+
+@pytest.fixture
+def semester_files(tmp_path):
+    """
+    同一学生的学号在三个文件中写法不同（读取后分别为 2021001、2021001.0 和全角数字），
+    另有姓名、年级、学分不一致和文件内重复的行
+    """
+    first = write_workbook(tmp_path / '1.xlsx', ['学号', '姓名', '年级', '高等数学 【4.0】', '体育 【1.0】'],
+                           [[2021001, '张三', 2021, 80, 90],
+                            [2021002, '李四', 2022, 70, None],
+                            [2021002, '李四', 2022, 75, None]])
+    second = write_workbook(tmp_path / '2.xlsx', ['学号', '姓名', '年级', '线性 代数 【3.0】', '体育 【1.5】'],
+                            [['2021001.0', '张三', 2021, 85, 95],
+                             [2021002, '李 四', 2023, 60, 60]])
+    third = write_workbook(tmp_path / '3.xlsx', ['学号', '姓名', '年级', '线性代数 【3.0】'],
+                           [['２０２１００１', '张三', 2021, 88],
+                            [' 2021003 ', '王五', 2021, 66]])
+    main_path = write_main_courses(tmp_path / 'main.xlsx', ['高等数学', '线性代数'])
+    return [first, second, third], main_path
+
+
+@pytest.mark.parametrize('engine', [ENGINE_ROWS, ENGINE_VECTORIZED])
+def test_merge_across_files(semester_files, engine):
+    grade_paths, main_path = semester_files
+    analyzer, results = analyze(grade_paths, main_path, engine=engine)
+
+    # 合并后的学号取首次出现的写法
+    keys = results['学号'].map(canonical_student_id)
+    assert sorted(keys) == ['2021001', '2021002', '2021003']
+    first = results[keys == '2021001'].iloc[0]
+    assert first['学号'] == 2021001
+    # 三个学期的课程都计入同一学生（各学期的同名课程分别计入）
+    assert first['修读课程数'] == 5
+    assert first['姓名'] == '张三'
+
+    report = analyzer.merge_report
+    counts = {key: value for key, value in report.items() if key != 'examples'}
+    assert counts == {
+        'files': 3, 'student_rows': 7, 'students': 3,
+        # 2021001 / 2021001.0 / '２０２１００１'；文件2的学号列读取为浮点数，2021002 也有两种写法
+        'merged_ids': 2,
+        'name_conflicts': 1,      # 姓名只去除首尾空白后比较，'李 四' 与 '李四' 不同
+        'level_conflicts': 1,     # 2021002 的年级 2022 / 2023
+        'duplicate_rows': 1,      # 文件1中重复的 2021002
+        'course_columns': 5, 'course_variants': 1,   # '线性 代数' / '线性代数'
+        'credit_conflicts': 1,    # 体育 1.0 / 1.5
+        'duplicate_courses': 0,
+    }
+    examples = report['examples']
+    assert {item['key']: len(item['values']) for item in examples['merged_ids']} == {'2021001': 3, '2021002': 2}
+    assert examples['level_conflicts'] == [{'key': '2021002', 'levels': [2022, 2023]}]
+    assert examples['duplicate_rows'] == [{'key': '2021002', 'file': 1, 'extra_rows': 1}]
+    assert len(describe(report)) == 6
+
+
+def test_merge_report_empty():
+    report = merge_report([])
+    assert report['files'] == 0 and report['students'] == 0
+    assert describe(report) == []
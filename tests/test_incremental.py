@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# @File    : test_incremental.py
+# @Time    : 2026/10/18
+# 增量处理：追加、移除、替换成绩文件后的结果与对同一文件列表完整分析一致
+
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from file_cache import ParsedFileCache
+from grade_analyzer import GradeAnalyzer
+from ranking import strip_ranks
+from synthetic import course_names, write_grade_workbook, write_main_course_workbook
+
+
+@pytest.fixture(scope='module')
+def files(tmp_path_factory):
+    """学生部分重叠的成绩文件A-D、内容不同的B2，以及主要课程列表"""
+    out_dir = tmp_path_factory.mktemp('incremental')
+    levels = [2021, 2022, 2023, 2024] * 25
+    specs = {'A': (0, 1), 'B': (50, 2), 'B2': (50, 3), 'C': (100, 4), 'D': (150, 5)}
+    paths = {}
+    for name, (offset, seed) in specs.items():
+        paths[name] = str(out_dir / f'{name}.xlsx')
+        write_grade_workbook(paths[name], course_names(20, offset=seed * 5), levels, id_start=20210000 + offset,
+                             text_ratio=0.3, blank_ratio=0.5, seed=seed)
+    paths['main'] = str(out_dir / 'main.xlsx')
+    write_main_course_workbook(paths['main'], course_names(12, offset=5))
+    return paths
+
+
+def make_analyzer(cache_dir, main_path):
+    analyzer = GradeAnalyzer(file_cache=ParsedFileCache(str(cache_dir), max_bytes=10 ** 9))
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.load_main_courses(main_path)
+    return analyzer
+
+
+def run(analyzer, method, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return getattr(analyzer, method)(*args)
+
+
+@pytest.mark.parametrize('before, after', [
+    (['A', 'B'], ['A', 'B', 'C']),          # 追加
+    (['A', 'B', 'C'], ['A', 'B']),          # 移除最后一个
+    (['A', 'B', 'C'], ['A', 'C']),          # 移除中间的文件
+    (['A', 'B', 'C'], ['A', 'B2', 'C']),    # 替换
+    (['A', 'B'], ['D', 'A', 'B']),          # 在前面追加
+    (['A', 'B', 'C'], ['D', 'B', 'C']),     # 同时移除和追加
+])
+def test_matches_full_analysis(tmp_path, files, before, after):
+    analyzer = make_analyzer(tmp_path, files['main'])
+    before_paths = [files[name] for name in before]
+    after_paths = [files[name] for name in after]
+    base_results = run(analyzer, 'process_combined_data', before_paths)
+    base_hashes = [analyzer.file_hash(path) for path in before_paths]
+
+    incremental = run(analyzer, 'process_incremental', after_paths, base_hashes, base_results)
+    incremental_report = analyzer.merge_report
+    full = run(analyzer, 'process_combined_data', after_paths)
+
+    assert incremental is not None
+    pd.testing.assert_frame_equal(incremental, full, check_exact=True)
+    assert incremental_report == analyzer.merge_report
+
+
+@pytest.mark.parametrize('before, after', [
+    (['A', 'B'], ['B', 'A']),               # 保留的文件顺序改变
+    (['A', 'B'], ['A', 'A']),               # 重复的文件
+])
+def test_unsupported_changes_return_none(tmp_path, files, before, after):
+    analyzer = make_analyzer(tmp_path, files['main'])
+    before_paths = [files[name] for name in before]
+    base_results = run(analyzer, 'process_combined_data', before_paths)
+    base_hashes = [analyzer.file_hash(path) for path in before_paths]
+    assert run(analyzer, 'process_incremental', [files[name] for name in after], base_hashes, base_results) is None
+
+
+def test_removed_file_not_cached(tmp_path, files):
+    analyzer = make_analyzer(tmp_path / 'first', files['main'])
+    base_paths = [files['A'], files['B']]
+    base_results = run(analyzer, 'process_combined_data', base_paths)
+    base_hashes = [analyzer.file_hash(path) for path in base_paths]
+    # 新的解析缓存中没有被移除文件B的解析结果
+    other = make_analyzer(tmp_path / 'second', files['main'])
+    assert run(other, 'process_incremental', [files['A']], base_hashes, base_results) is None
+
+
+def analysis_table(web_app, info):
+    return strip_ranks(web_app.analysis_result_cache.peek(info['result_id'])[0])
+
+
+def test_app_incremental_and_settings_fallback(web_app, files, monkeypatch):
+    main_path = files['main']
+    with contextlib.redirect_stdout(io.StringIO()):
+        base = web_app.run_analysis([files['A'], files['B']], main_path)
+        appended = web_app.run_analysis([files['A'], files['B'], files['C']], main_path,
+                                        base_result_id=base['result_id'])
+        # 分析设置改变（其他课程门数）后不能在之前的结果上增量处理
+        monkeypatch.setattr(web_app, 'OTHER_COURSE_LIMIT', 2)
+        changed = web_app.run_analysis([files['A'], files['B'], files['C'], files['D']], main_path,
+                                       base_result_id=appended['result_id'])
+    assert appended['incremental'] and not changed['incremental']
+
+    expected = GradeAnalyzer(other_course_limit=2)
+    run(expected, 'load_main_courses', main_path)
+    expected_df = run(expected, 'process_combined_data', [files[name] for name in 'ABCD'])
+    pd.testing.assert_frame_equal(analysis_table(web_app, changed).reset_index(drop=True),
+                                  expected_df.reset_index(drop=True), check_exact=True)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# @File    : test_main_courses.py
+# @Time    : 2026/10/18
+# 主要课程列表加载与匹配
+
+import pytest
+from openpyxl import Workbook
+
+from grade_analyzer import GradeAnalyzer, MainCourseMatcher
+
+
+def write_main_courses(path, cells):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['主要课程'])
+    for cell in cells:
+        sheet.append([cell])
+    workbook.save(path)
+    return str(path)
+
+
+def test_matcher_substring():
+    matcher = MainCourseMatcher(['高等数学', '数学'])
+    assert matcher.is_main_course('高等数学（1）')
+    assert matcher.is_main_course('离散数学')
+    assert not matcher.is_main_course('大学英语')
+    assert MainCourseMatcher([]).classify(['高等数学']).tolist() == [False]
+
+
+def test_matcher_empty_name_matches_everything():
+    # 与原始实现相同：'' in course_name 恒为真
+    matcher = MainCourseMatcher(['高等数学', ''])
+    assert matcher.classify(['高等数学', '大学英语', '体育']).tolist() == [True, True, True]
+
+
+@pytest.mark.parametrize('excel_engine', ['openpyxl', 'calamine'])
+def test_load_ignores_blank_cells(tmp_path, capsys, excel_engine):
+    if excel_engine == 'calamine':
+        pytest.importorskip('python_calamine')
+    path = write_main_courses(tmp_path / 'main.xlsx', [' 高等数学 ', '   ', None, '线性代数', ' '])
+    analyzer = GradeAnalyzer(excel_engine=excel_engine)
+    analyzer.load_main_courses(path)
+
+    assert analyzer.main_courses == ['高等数学', '线性代数']
+    output = capsys.readouterr().out
+    # calamine将只有空白的单元格读取为空值，openpyxl读取为空白文本，清理后忽略
+    if excel_engine == 'openpyxl':
+        assert '2 个空白单元格' in output
+    assert '成功加载 2 门主要课程' in output
+    assert analyzer._matcher.classify(['高等数学', '大学英语']).tolist() == [True, False]
+
+
+@pytest.mark.parametrize('cells', [['高等数学'], []])
+def test_load_without_blank_cells(tmp_path, capsys, cells):
+    analyzer = GradeAnalyzer()
+    analyzer.load_main_courses(write_main_courses(tmp_path / 'main.xlsx', cells))
+    assert analyzer.main_courses == cells
+    assert '空白单元格' not in capsys.readouterr().out
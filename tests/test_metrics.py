@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# @File    : test_metrics.py
+# @Time    : 2026/10/18
+# 性能指标与性能分析
+
+import os
+import threading
+
+from metrics import Counter, profiled
+
+
+def test_counter_labels():
+    counter = Counter('requests_total', '请求数', labelnames=('status',))
+    counter.inc(status=200)
+    counter.inc(2, status=200)
+    counter.inc(status=429)
+    assert counter.value(status=200) == 3
+    assert counter.render()[-1] == 'requests_total{status="429"} 1.0'
+
+
+def test_profiled_allows_one_profile_at_a_time(tmp_path):
+    first_path = str(tmp_path / 'first.prof')
+    second_path = str(tmp_path / 'second.prof')
+    inner = []
+    with profiled(first_path) as profiler:
+        assert profiler is not None
+        thread = threading.Thread(target=lambda: inner.append(profiled(second_path).__enter__()))
+        thread.start()
+        thread.join()
+    assert inner == [None]
+    assert os.path.exists(first_path) and not os.path.exists(second_path)
+
+    # 前一个性能分析结束后可以再次分析
+    with profiled(second_path) as profiler:
+        assert profiler is not None
+    assert os.path.exists(second_path)
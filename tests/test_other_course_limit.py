@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# @File    : test_other_course_limit.py
+# @Time    : 2026/10/18
+# 其他课程门数：结果与原始实现（固定取4门）一致，其他门数下课程选择和汇总正确
+
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_GRADE_FILE, SAMPLE_MAIN_COURSE_FILE, analyze
+from grade_analyzer import ENGINE_ROWS, ENGINE_VECTORIZED, GradeAnalyzer
+from reference import RESULT_COLUMNS, by_student, reference_analysis, reference_main_courses
+
+
+@pytest.fixture(scope='module', params=['samples', 'synthetic'])
+def dataset(request, synthetic_dataset):
+    if request.param == 'samples':
+        return [SAMPLE_GRADE_FILE], SAMPLE_MAIN_COURSE_FILE
+    return synthetic_dataset
+
+
+@pytest.mark.parametrize('engine', [ENGINE_ROWS, ENGINE_VECTORIZED])
+@pytest.mark.parametrize('limit', [0, 2, 4, 7])
+def test_matches_reference(dataset, engine, limit):
+    grade_paths, main_path = dataset
+    analyzer, results = analyze(grade_paths, main_path, engine=engine, other_course_limit=limit)
+    expected = reference_analysis(grade_paths, reference_main_courses(main_path), limit)
+
+    assert results.columns.tolist() == RESULT_COLUMNS
+    pd.testing.assert_frame_equal(by_student(results), by_student(expected), check_dtype=False)
+
+    assert other_course_counts(results).max() <= limit
+    if limit == 0:
+        assert not results['课程详情'].str.contains('[其他课程]', regex=False).any()
+
+
+def other_course_counts(results):
+    """每个学生计入的其他课程门数"""
+    return results['课程详情'].str.split('; ').map(lambda items: sum(item.endswith('[其他课程]') for item in items))
+
+
+def test_limits_differ(synthetic_dataset):
+    grade_paths, main_path = synthetic_dataset
+    course_counts = []
+    for limit in (0, 2, 4, 7):
+        results = analyze(grade_paths, main_path, other_course_limit=limit)[1]
+        # 合成数据中每个学生都有足够多的其他课程
+        assert (other_course_counts(results) == limit).all()
+        course_counts.append(results['修读课程数'].sum())
+    assert course_counts == sorted(course_counts) and len(set(course_counts)) == 4
+
+
+@pytest.mark.parametrize('limit', [-1, 1.5, True, '4'])
+def test_invalid_limit(limit):
+    with pytest.raises(ValueError):
+        GradeAnalyzer(other_course_limit=limit)
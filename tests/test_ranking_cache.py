@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# @File    : test_ranking_cache.py
+# @Time    : 2026/10/18
+# 缓存的分析结果早于排名统计或统计定义变化后，重新计算的排名统计写回缓存和结果表存储
+
+import contextlib
+import io
+
+from conftest import SAMPLE_GRADE_FILE, SAMPLE_MAIN_COURSE_FILE
+from ranking import RANK_COLUMNS, STATS_VERSION, strip_ranks
+from result_store import ResultStore
+
+OLD_STATS = {'version': 's0'}
+
+
+def make_outdated(web_app, result_id):
+    """模拟统计定义变化之前保存的分析结果：缓存中没有排名列，结果表存储中为旧版本统计"""
+    results_df, result_info = web_app.analysis_result_cache.peek(result_id)
+    web_app.analysis_result_cache.put(result_id, strip_ranks(results_df), dict(result_info, stats=None))
+    web_app.result_store.put(result_id, strip_ranks(results_df), OLD_STATS)
+    assert web_app.result_store.get(result_id).stats_version == 's0'
+
+
+def assert_current(web_app, result_id):
+    results_df, result_info = web_app.analysis_result_cache.peek(result_id)
+    assert set(RANK_COLUMNS) <= set(results_df.columns)
+    assert result_info['stats']['version'] == STATS_VERSION
+    table = web_app.result_store.get(result_id)
+    assert table.stats_version == STATS_VERSION
+    assert set(RANK_COLUMNS) <= set(table.df.columns)
+
+
+def run(web_app):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return web_app.run_analysis([SAMPLE_GRADE_FILE], SAMPLE_MAIN_COURSE_FILE)
+
+
+def test_cache_hit_writes_back_ranks(web_app):
+    result_id = run(web_app)['result_id']
+    make_outdated(web_app, result_id)
+
+    rerun = run(web_app)
+    assert rerun['cached'] and 'rank' in rerun['timings']
+    assert_current(web_app, result_id)
+    # 之后的命中不再重新计算
+    assert 'rank' not in run(web_app)['timings']
+
+
+def test_load_result_table_refreshes_outdated_table(web_app):
+    result_id = run(web_app)['result_id']
+    make_outdated(web_app, result_id)
+
+    table = web_app.load_result_table({'result_id': result_id})
+    assert table.stats_version == STATS_VERSION
+    assert_current(web_app, result_id)
+    assert web_app.load_result_table({'result_id': result_id}) is table
+
+
+def test_result_store_replaces_table_with_other_stats_version(tmp_path, web_app):
+    store = ResultStore(str(tmp_path))
+    results_df = web_app.analysis_result_cache.peek(run(web_app)['result_id'])[0]
+    stats = {'version': STATS_VERSION}
+    old = store.put('r', results_df, OLD_STATS)
+    current = store.put('r', results_df, stats)
+    assert current is not old and current.stats_version == STATS_VERSION
+    assert store.put('r', results_df, stats) is current
+    # 从磁盘重新加载时也是新版本
+    assert ResultStore(str(tmp_path)).get('r').stats_version == STATS_VERSION
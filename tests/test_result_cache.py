@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# @File    : test_result_cache.py
+# @Time    : 2026/10/18
+# 分析结果缓存
+
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import corrupt_file
+from result_cache import AnalysisResultCache
+
+
+def test_peek_does_not_count(tmp_path):
+    cache = AnalysisResultCache(str(tmp_path), memory_capacity=1)
+    df = pd.DataFrame({'学号': [1, 2], '学分加权平均分': [90.0, 80.0]})
+    cache.put('a', df, {'timestamp': 't'})
+    cache.put('b', df, {'timestamp': 't'})
+
+    # 'a' 已被挤出内存，peek从磁盘读取
+    for fingerprint in ('a', 'b', 'missing'):
+        cache.peek(fingerprint)
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['disk_hits'], stats['misses']) == (0, 0, 0)
+
+    found, meta = cache.peek('a')
+    pd.testing.assert_frame_equal(found, df)
+    assert meta['timestamp'] == 't'
+
+    cache.get('b')
+    cache.get('missing')
+    stats = cache.stats()
+    assert (stats['memory_hits'] + stats['disk_hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+
+
+@pytest.mark.parametrize('mode', ['truncated', 'flipped', 'garbage'])
+def test_corrupt_disk_entry_is_a_miss(tmp_path, mode):
+    cache = AnalysisResultCache(str(tmp_path), memory_capacity=1)
+    df = pd.DataFrame({'学号': [1, 2], '学分加权平均分': [90.0, 80.0]})
+    cache.put('a', df, {'timestamp': 't'})
+    cache.put('b', df, {'timestamp': 't'})
+    path = cache._path('a')
+    corrupt_file(path, mode)
+
+    assert cache.get('a') is None
+    assert cache.stats()['misses'] == 1
+    assert not os.path.exists(path)
+    assert cache.get('b') is not None
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# @File    : test_result_store.py
+# @Time    : 2026/10/18
+# 结果表存储：损坏的结果表文件
+
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_GRADE_FILE, SAMPLE_MAIN_COURSE_FILE, corrupt_file
+from result_store import ResultStore
+
+
+@pytest.mark.parametrize('mode', ['truncated', 'flipped', 'garbage'])
+def test_corrupt_table_file(tmp_path, mode):
+    df = pd.DataFrame({'学号': [1, 2], '姓名': ['张三', '李四'], '学分加权平均分': [90.0, 80.0]})
+    ResultStore(str(tmp_path)).put('r', df)
+    store = ResultStore(str(tmp_path))
+    path = store._path('r')
+    corrupt_file(path, mode)
+
+    assert store.get('r') is None
+    assert not os.path.exists(path)
+    assert store.put('r', df).df.equals(df)
+
+
+def test_load_result_table_rebuilds_corrupt_table(web_app):
+    with contextlib.redirect_stdout(io.StringIO()):
+        result_id = web_app.run_analysis([SAMPLE_GRADE_FILE], SAMPLE_MAIN_COURSE_FILE)['result_id']
+    store = web_app.result_store
+    expected = store.get(result_id).df
+    # 移出内存后损坏磁盘文件，从分析结果缓存重建
+    with store._lock:
+        store._tables.pop(result_id)
+    corrupt_file(store._path(result_id), 'truncated')
+
+    table = web_app.load_result_table({'result_id': result_id})
+    pd.testing.assert_frame_equal(table.df, expected)
+    assert store.get(result_id) is table
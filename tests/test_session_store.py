@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# @File    : test_session_store.py
+# @Time    : 2026/10/18
+# 服务端会话存储
+
+import pytest
+
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'))
+
+
+def test_get_returns_independent_copy(store):
+    store.put('sid', {'uploaded_files': [{'filename': 'a.xlsx'}], 'analysis_results': {'result_id': 'r1'}})
+
+    # 请求中就地修改后未保存（例如请求中途失败）
+    data = store.get('sid')
+    data['uploaded_files'].append({'filename': 'b.xlsx'})
+    data['analysis_results']['result_id'] = 'r2'
+
+    assert store.get('sid') == {'uploaded_files': [{'filename': 'a.xlsx'}], 'analysis_results': {'result_id': 'r1'}}
+    assert store.get('sid') is not store.get('sid')
+
+
+def test_put_copies(store):
+    data = {'uploaded_files': []}
+    store.put('sid', data)
+    data['uploaded_files'].append('x')
+    assert store.get('sid') == {'uploaded_files': []}
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# @File    : test_storage.py
+# @Time    : 2026/10/18
+# 存储清理
+
+import fcntl
+import os
+import time
+
+import pytest
+
+from storage import SWEEP_LOCK_FILE, StorageManager
+
+
+@pytest.fixture
+def storage(tmp_path):
+    upload_dir, results_dir = tmp_path / 'uploads', tmp_path / 'results'
+    (results_dir / 'tables').mkdir(parents=True)
+    manager = StorageManager(str(upload_dir), str(results_dir), ttl=100, sweep_interval=0)
+    old = time.time() - 1000
+    for session_id, refs in (('expired', []), ('active', ['kept'])):
+        session_dir = upload_dir / session_id
+        session_dir.mkdir(parents=True)
+        (session_dir / 'grades.xlsx').write_bytes(b'x' * 10)
+        manager.touch(session_id, refs)
+    os.utime(upload_dir / 'expired', (old, old))
+    for result_id in ('kept', 'unused'):
+        path = results_dir / 'tables' / f'{result_id}.npz'
+        path.write_bytes(b'x' * 10)
+        os.utime(path, (old, old))
+    return manager, upload_dir, results_dir
+
+
+def test_ttl_sweep_keeps_referenced_results(storage):
+    manager, upload_dir, results_dir = storage
+    stats = manager.sweep()
+    assert sorted(os.listdir(upload_dir)) == [SWEEP_LOCK_FILE, 'active']
+    assert os.listdir(results_dir / 'tables') == ['kept.npz']
+    assert stats['sessions'] == 1 and stats['protected_results'] == 1
+
+
+def test_sweep_skipped_while_another_process_sweeps(storage):
+    manager, upload_dir, results_dir = storage
+    # 另一个打开的文件持有锁，与其他进程持有锁的效果相同
+    with open(upload_dir / SWEEP_LOCK_FILE, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        assert manager.sweep() is None
+        assert (upload_dir / 'expired').exists() and (results_dir / 'tables' / 'unused.npz').exists()
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    assert manager.sweep() is not None
+    assert not (upload_dir / 'expired').exists()
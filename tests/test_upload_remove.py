@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# @File    : test_upload_remove.py
+# @Time    : 2026/10/18
+# 移除、替换已上传的成绩文件：分析任务进行中时拒绝，与追加文件使用相同的准入控制
+
+import threading
+import time
+
+import pytest
+from openpyxl import Workbook
+
+from conftest import SAMPLE_GRADE_FILE, SAMPLE_MAIN_COURSE_FILE
+
+PREFIX = '/zongce'
+
+
+def write_grade_file(path):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['学号', '姓名', '年级', '高等数学 【4.0】'])
+    sheet.append([2099001, '张三', 2021, 90])
+    workbook.save(path)
+    return str(path)
+
+
+def upload(client, *grade_paths):
+    files = {'grade_files': [open(path, 'rb') for path in grade_paths],
+             'main_course_file': open(SAMPLE_MAIN_COURSE_FILE, 'rb')}
+    response = client.post(f'{PREFIX}/upload', data=files, content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def wait_finished(client, job_id):
+    for _ in range(200):
+        status = client.get(f'{PREFIX}/jobs/{job_id}').get_json()['status']
+        if status not in ('queued', 'running'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError('任务未结束')
+
+
+@pytest.fixture
+def blocked_analysis(web_app, monkeypatch):
+    """分析在release被设置前一直运行"""
+    release = threading.Event()
+    run_analysis = web_app.run_analysis
+
+    def blocked(*args, **kwargs):
+        release.wait(10)
+        return run_analysis(*args, **kwargs)
+
+    monkeypatch.setattr(web_app, 'run_analysis', blocked)
+    yield release
+    release.set()
+
+
+def test_remove_and_replace_rejected_while_job_active(web_app, blocked_analysis, tmp_path):
+    client = web_app.app.test_client()
+    extra = write_grade_file(tmp_path / 'extra.xlsx')
+    uploaded = upload(client, SAMPLE_GRADE_FILE, extra)
+    grade_names = uploaded['files'][:2]
+
+    job = client.post(f'{PREFIX}/analyze').get_json()
+    response = client.post(f'{PREFIX}/upload/remove', json={'filename': grade_names[1]})
+    assert response.status_code == 409
+    with open(extra, 'rb') as f:
+        response = client.post(f'{PREFIX}/upload/append', data={'grade_files': [f], 'replace': grade_names[1]},
+                               content_type='multipart/form-data')
+    assert response.status_code == 409
+
+    # 任务使用的文件都还在，分析包含两个文件的全部学生
+    blocked_analysis.set()
+    assert wait_finished(client, job['job_id']) == 'succeeded'
+    result = client.get(f"{PREFIX}/jobs/{job['job_id']}").get_json()['result']
+    assert result['student_count'] == web_app.run_analysis([SAMPLE_GRADE_FILE], SAMPLE_MAIN_COURSE_FILE)[
+        'student_count'] + 1
+
+    response = client.post(f'{PREFIX}/upload/remove', json={'filename': grade_names[1]})
+    assert response.status_code == 200
+    assert grade_names[1] not in response.get_json()['files']
+
+
+def test_remove_uses_upload_admission(web_app, tmp_path):
+    client = web_app.app.test_client()
+    uploaded = upload(client, SAMPLE_GRADE_FILE, write_grade_file(tmp_path / 'extra.xlsx'))
+
+    # 同一会话已有上传在处理时，移除请求同样返回429
+    with web_app.upload_gate.admit(uploaded['session_id']):
+        response = client.post(f'{PREFIX}/upload/remove', json={'filename': uploaded['files'][1]})
+    assert response.status_code == 429 and response.get_json()['reason'] == 'session'
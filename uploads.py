@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# @File    : uploads.py
+# @Time    : 2026/10/18
+# 上传文件处理：表单解析时将上传文件分块写入磁盘，同一遍计算SHA-256并限制单文件大小；
+# 保存后对Excel文件做快速结构检查，使无效文件在上传阶段即被拒绝
+
+import hashlib
+import os
+import tempfile
+import zipfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from excel_reader import read_header, resolve_engine
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+# .xls（OLE2复合文档）的文件头
+OLE2_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+
+class FileTooLarge(RequestEntityTooLarge):
+    """单个上传文件超过大小上限"""
+
+    def __init__(self, max_bytes):
+        super().__init__(f'单个文件不能超过 {max_bytes / 1024 / 1024:.0f}MB')
+
+
+class HashingFileStream:
+    """
+    上传文件的落盘流：Werkzeug解析表单时逐块写入临时文件，同时计算SHA-256和字节数，
+    超过单文件上限时立即中止请求；未被move_to取走的临时文件在关闭时删除
+    """
+
+    def __init__(self, upload_dir, max_bytes=None):
+        os.makedirs(upload_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=upload_dir, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self._moved = False
+        self.size = 0
+        self.max_bytes = max_bytes
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            # 表单解析中止后该文件不会出现在request.files中，需在此删除临时文件
+            self.close()
+            raise FileTooLarge(self.max_bytes)
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # read、readline、seek等操作交给临时文件
+        return getattr(self._file, name)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def move_to(self, dest_path):
+        """将临时文件移动到目标路径"""
+        self._file.close()
+        os.replace(self.path, dest_path)
+        self._moved = True
+
+    def close(self):
+        self._file.close()
+        if not self._moved:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class UploadRequest(Request):
+    """使用HashingFileStream接收上传文件的请求类，临时目录和单文件上限取自应用配置"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFileStream(current_app.config['UPLOAD_TMP_FOLDER'],
+                                 current_app.config.get('MAX_FILE_SIZE'))
+
+
+def store_upload(file, dest_path, max_bytes=None, chunk_size=1024 * 1024):
+    """
+    将上传文件保存到dest_path，返回 (SHA-256, 字节数)
+    由UploadRequest接收的文件直接移动临时文件；其他情况分块复制并计算哈希
+    """
+    stream = file.stream
+    if isinstance(stream, HashingFileStream):
+        stream.move_to(dest_path)
+        return stream.sha256, stream.size
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise FileTooLarge(max_bytes)
+                digest.update(chunk)
+                f.write(chunk)
+    except Exception:
+        os.remove(dest_path)
+        raise
+    return digest.hexdigest(), size
+
+
+def check_excel_structure(file_path, required_column, exact=False):
+    """
+    快速检查Excel文件结构：xlsx须为包含工作簿的zip文件（只读取zip中央目录），
+    xls须有OLE2文件头，表头须包含required_column（exact为True时要求列名完全一致）
+    返回错误信息，通过检查时返回None
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.xlsx':
+        try:
+            with zipfile.ZipFile(file_path) as zf:
+                names = set(zf.namelist())
+        except zipfile.BadZipFile:
+            return '不是有效的xlsx文件'
+        if 'xl/workbook.xml' not in names:
+            return '不是有效的xlsx文件（缺少工作簿）'
+    elif ext == '.xls':
+        with open(file_path, 'rb') as f:
+            if f.read(len(OLE2_MAGIC)) != OLE2_MAGIC:
+                return '不是有效的xls文件'
+
+    try:
+        with pd.ExcelFile(file_path, engine=resolve_engine()) as excel_file:
+            header = read_header(excel_file)
+    except ImportError:
+        # 缺少对应的读取后端时跳过表头检查
+        return None
+    except Exception as e:
+        return f'无法读取Excel文件: {e}'
+
+    if header is None:
+        return '工作表为空'
+    if exact:
+        found = required_column in header
+    else:
+        found = any(required_column in str(col) for col in header)
+    if not found:
+        return f'表头中找不到"{required_column}"列'
+    return None
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# @File    : wsgi.py
+# @Time    : 2026/10/18
+# WSGI入口：gunicorn -c gunicorn.conf.py wsgi:app（或其他WSGI服务器），导入时预先加载耗时的模块
+
+from serve import load_application
+
+app = load_application()